@@ -1,176 +1,146 @@
-import csv
+import argparse
+from array import array
 import sys
 
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+from muttfuzz import results
 
-import scipy
-import scipy.stats
 
-def main():
-    matplotlib.rcParams['pdf.fonttype'] = 42
-    matplotlib.rcParams['ps.fonttype'] = 42
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', metavar='filename', type=str, nargs='+',
+                        help='results files saved with --save_results; runs are grouped by the part of the name before the first "."')
+    parser.add_argument('--no_plots', action='store_true',
+                        help='only print the text report, do not produce boxplots (skips importing matplotlib)')
 
-    files = sys.argv[1:]
+    parsed_args = parser.parse_args(sys.argv[1:])
+    return (parsed_args, parser)
 
-    roots = {}
 
-    all_mutants = {}
-    ever_unkilled = {}
-    never_unkilled = {}
+def load_results(files):
+    """
+    Stream all results files once into typed columns.  Returns the root names, the mutant
+    names, and arrays giving, for every row, its root, mutant, time, and return code.
+    """
+    # Like scipy and matplotlib, only needed for analysis, so not a dependency of muttfuzz itself
+    import numpy as np #pylint: disable=C0415
 
-    max_unkilled = 0.0
+    root_ids = {}
+    mutant_ids = {}
+    row_root = array('i')
+    row_mutant = array('i')
+    row_time = array('d')
+    row_code = array('i')
 
     for f in files:
         root = f.split(".")[0]
-        if root not in roots:
-            roots[root] = []
-        with open(f) as fr:
-            rows = csv.reader(fr)
-            for row in rows:
-                roots[root].append(row)
-                all_mutants[row[0]] = True
-                if int(row[2]) == 0:
-                    ever_unkilled[row[0]] = True
-                    max_unkilled = max(max_unkilled, float(row[1]))
-
-    for r, data in roots.items():
-        for row in data:
-            if row[0] not in ever_unkilled:
-                never_unkilled[row[0]] = True
-
-    print("THERE ARE", len(all_mutants.keys()), "MUTANTS")
-    print()
+        r = root_ids.setdefault(root, len(root_ids))
+        for row in results.read_results(f):
+            if row["status"] not in results.EVALUATED:
+                continue # unreachable, pruned, or invalid mutants were never fuzzed
+            row_root.append(r)
+            row_mutant.append(mutant_ids.setdefault(row["mutant"], len(mutant_ids)))
+            row_time.append(float(row["time"]))
+            row_code.append(int(row["returncode"]))
 
-    print("NOTE: ALL UNKILLED MUTANTS WILL BE ASSIGNED THE MAXIMUM TIME FOR AN UNKILLED MUTANT")
-    print()
+    return (list(root_ids), list(mutant_ids),
+            np.frombuffer(row_root, dtype=np.intc), np.frombuffer(row_mutant, dtype=np.intc),
+            np.frombuffer(row_time, dtype=np.double), np.frombuffer(row_code, dtype=np.intc))
 
-    cap_max = {}
-    for r, data in roots.items():
-        new_data = []
-        for row in data:
-            new_row = list(row)
-            if int(row[2]) == 0:
-                if (max_unkilled - float(row[1])) > (max_unkilled * 0.1):
-                    print("WARNING: REPLACING DATA POINT FOR UNKILLED MUTANT WITH MORE THAN 10% DIFFERENCE")
-                    print("ORIGINAL VALUE:", float(row[1]), "REPLACED WITH", max_unkilled)
-                new_row[1] = max_unkilled
-            new_data.append(new_row)
-        cap_max[r] = new_data
-    roots = cap_max
 
-    graph = []
-    label = []
+def report(roots, root_of, times, killed, subset):
+    """Print statistics for each root over the rows in subset, returning the per-root time arrays."""
+    import numpy as np #pylint: disable=C0415
 
-    for r, data in roots.items():
-        d_t = list(map(lambda x:float(x[1]), data))
+    graph = []
+    for r, root in enumerate(roots):
+        in_root = subset & (root_of == r)
+        d_t = times[in_root]
         graph.append(d_t)
-        label.append(r)
-        d_m = list(map(lambda x:int(x[2]), data))
-        print (r, "# DATA POINTS:", len(d_t))
-        score = len(list(filter(lambda x: x != 0, d_m))) / len(list(d_m))
-        print(r, "MEAN:", round(scipy.mean(d_t), 2), "MEDIAN:", round(scipy.median(d_t), 2),
-              "RANGE: [" + str(round(min(d_t), 2)) + " - " + str(round(max(d_t), 2)) + "]")
-        print(r, "MUTATION SCORE:", round(score, 2))
+        print (root, "# DATA POINTS:", len(d_t))
+        if len(d_t) == 0:
+            print()
+            continue
+        score = np.count_nonzero(killed[in_root]) / len(d_t)
+        print(root, "MEAN:", round(float(np.mean(d_t)), 2), "MEDIAN:", round(float(np.median(d_t)), 2),
+              "RANGE: [" + str(round(float(d_t.min()), 2)) + " - " + str(round(float(d_t.max()), 2)) + "]")
+        print(root, "MUTATION SCORE:", round(score, 2))
         print()
 
-    for r1, data1 in roots.items():
-        d_t_1 = list(map(lambda x:float(x[1]), data1))
-        for r2, data2 in roots.items():
-            if r1 < r2:
-                d_t_2 = list(map(lambda x:float(x[1]), data2))
+    import scipy.stats #pylint: disable=C0415
+
+    for r1, root1 in enumerate(roots):
+        for r2, root2 in enumerate(roots):
+            if root1 < root2:
                 try:
-                    print("Mann-Whitney U:", scipy.stats.mannwhitneyu(d_t_1, d_t_2))
+                    print("Mann-Whitney U:", scipy.stats.mannwhitneyu(graph[r1], graph[r2]))
                 except ValueError:
                     pass
+    return graph
+
 
-    f1 = plt.figure()
+def save_boxplot(graph, roots, filename):
+    import matplotlib #pylint: disable=C0415
+    matplotlib.rcParams['pdf.fonttype'] = 42
+    matplotlib.rcParams['ps.fonttype'] = 42
+    import matplotlib.pyplot as plt #pylint: disable=C0415
+    from matplotlib.backends.backend_pdf import PdfPages #pylint: disable=C0415
+
+    f = plt.figure()
     plt.ylabel("Time(s)")
-    plt.boxplot(graph, labels=label)
-    pp = PdfPages("all.pdf")
-    pp.savefig(f1)
+    plt.boxplot(graph)
+    plt.xticks(range(1, len(roots) + 1), roots)
+    pp = PdfPages(filename)
+    pp.savefig(f)
     pp.close()
-    print("SAVED GRAPH OF ALL DATA TO all.pdf")
+    plt.close(f)
 
-    print()
-    print("STATISTICS OVER ONLY MUTANTS EVER UNKILLED")
-    print("THERE ARE", len(ever_unkilled.keys()), "SUCH MUTANTS")
-    print()
 
-    graph = []
-    label = []
-
-    for r, data in roots.items():
-        data_f = list(filter(lambda x: x[0] in ever_unkilled, data))
-        d_t = list(map(lambda x:float(x[1]), data_f))
-        graph.append(d_t)
-        label.append(r)
-        d_m = list(map(lambda x:int(x[2]), data_f))
-        print (r, "# DATA POINTS:", len(d_t))
-        score = len(list(filter(lambda x: x != 0, d_m))) / len(list(d_m))
-        print(r, "MEAN:", round(scipy.mean(d_t), 2), "MEDIAN:", round(scipy.median(d_t), 2),
-              "RANGE: [" + str(round(min(d_t), 2)) + " - " + str(round(max(d_t), 2)) + "]")
-        print(r, "MUTATION SCORE:", round(score, 2))
-        print()
+def main():
+    import numpy as np #pylint: disable=C0415
 
-    for r1, data1 in roots.items():
-        data1_f = list(filter(lambda x: x[0] in ever_unkilled, data1))
-        d_t_1 = list(map(lambda x:float(x[1]), data1_f))
-        for r2, data2 in roots.items():
-            if r1 < r2:
-                data2_f = list(filter(lambda x: x[0] in ever_unkilled, data2))
-                d_t_2 = list(map(lambda x:float(x[1]), data2_f))
-                try:
-                    print("Mann-Whitney U:", scipy.stats.mannwhitneyu(d_t_1, d_t_2))
-                except ValueError:
-                    pass
+    parsed_args, _ = parse_args()
 
-    f2 = plt.figure()
-    plt.ylabel("Time(s)")
-    plt.boxplot(graph, labels=label)
-    pp = PdfPages("unkilled.pdf")
-    pp.savefig(f2)
-    pp.close()
-    print("SAVED GRAPH OF DATA OVER EVER-UNKILLED MUTANTS TO unkilled.pdf")
+    (roots, mutants, root_of, mutant_of, times, codes) = load_results(parsed_args.files)
 
-    print()
-    print("STATISTICS OVER ONLY MUTANTS NEVER UNKILLED")
-    print("THERE ARE", len(never_unkilled.keys()), "SUCH MUTANTS")
-    print()
+    killed = codes != 0
+    unkilled = ~killed
 
-    graph = []
-    label = []
+    ever_unkilled = np.zeros(len(mutants), dtype=bool)
+    ever_unkilled[mutant_of[unkilled]] = True
+    row_ever_unkilled = ever_unkilled[mutant_of]
 
-    for r, data in roots.items():
-        data_f = list(filter(lambda x: x[0] in never_unkilled, data))
-        d_t = list(map(lambda x:float(x[1]), data_f))
-        graph.append(d_t)
-        label.append(r)
-        d_m = list(map(lambda x:int(x[2]), data_f))
-        print (r, "# DATA POINTS:", len(d_t))
-        score = len(list(filter(lambda x: x != 0, d_m))) / len(list(d_m))
-        print(r, "MEAN:", round(scipy.mean(d_t), 2), "MEDIAN:", round(scipy.median(d_t), 2),
-              "RANGE: [" + str(round(min(d_t), 2)) + " - " + str(round(max(d_t), 2)) + "]")
-        print(r, "MUTATION SCORE:", round(score, 2))
-        print()
+    print("THERE ARE", len(mutants), "MUTANTS")
+    print()
 
-    for r1, data1 in roots.items():
-        data1_f = list(filter(lambda x: x[0] in never_unkilled, data1))
-        d_t_1 = list(map(lambda x:float(x[1]), data1_f))
-        for r2, data2 in roots.items():
-            if r1 < r2:
-                data2_f = list(filter(lambda x: x[0] in never_unkilled, data2))
-                d_t_2 = list(map(lambda x:float(x[1]), data2_f))
-                try:
-                    print("Mann-Whitney U:", scipy.stats.mannwhitneyu(d_t_1, d_t_2))
-                except ValueError:
-                    pass
+    print("NOTE: ALL UNKILLED MUTANTS WILL BE ASSIGNED THE MAXIMUM TIME FOR AN UNKILLED MUTANT")
+    print()
 
-    f2 = plt.figure()
-    plt.ylabel("Time(s)")
-    plt.boxplot(graph, labels=label)
-    pp = PdfPages("alwayskilled.pdf")
-    pp.savefig(f2)
-    pp.close()
-    print("SAVED GRAPH OF DATA OVER NEVER-UNKILLED MUTANTS TO alwayskilled.pdf")
+    if np.any(unkilled):
+        max_unkilled = float(times[unkilled].max())
+        for t in times[unkilled & ((max_unkilled - times) > (max_unkilled * 0.1))]:
+            print("WARNING: REPLACING DATA POINT FOR UNKILLED MUTANT WITH MORE THAN 10% DIFFERENCE")
+            print("ORIGINAL VALUE:", float(t), "REPLACED WITH", max_unkilled)
+        times = np.where(unkilled, max_unkilled, times)
+
+    ever_count = int(np.count_nonzero(ever_unkilled))
+    subsets = [(np.ones(len(times), dtype=bool), None, 0, "all.pdf",
+                "SAVED GRAPH OF ALL DATA TO all.pdf"),
+               (row_ever_unkilled, "EVER UNKILLED", ever_count, "unkilled.pdf",
+                "SAVED GRAPH OF DATA OVER EVER-UNKILLED MUTANTS TO unkilled.pdf"),
+               (~row_ever_unkilled, "NEVER UNKILLED", len(mutants) - ever_count, "alwayskilled.pdf",
+                "SAVED GRAPH OF DATA OVER NEVER-UNKILLED MUTANTS TO alwayskilled.pdf")]
+
+    for (subset, name, count, filename, saved_message) in subsets:
+        if name is not None:
+            print()
+            print("STATISTICS OVER ONLY MUTANTS", name)
+            print("THERE ARE", count, "SUCH MUTANTS")
+            print()
+        graph = report(roots, root_of, times, killed, subset)
+        if not parsed_args.no_plots:
+            save_boxplot(graph, roots, filename)
+            print(saved_message)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import ctypes
+from collections import namedtuple
+import json
+import os
+import signal
+import threading
+
+from muttfuzz import checkpoint
+from muttfuzz import elf
+
+PTRACE_TRACEME = 0
+PTRACE_PEEKDATA = 2
+PTRACE_POKEDATA = 5
+PTRACE_CONT = 7
+PTRACE_GETREGS = 12
+PTRACE_SETREGS = 13
+PTRACE_SETOPTIONS = 0x4200
+PTRACE_GETEVENTMSG = 0x4201
+
+PTRACE_O_TRACEFORK = 0x02
+PTRACE_O_TRACEVFORK = 0x04
+PTRACE_O_TRACECLONE = 0x08
+PTRACE_O_TRACEEXEC = 0x10
+PTRACE_O_EXITKILL = 0x100000
+
+PTRACE_EVENT_FORK = 1
+PTRACE_EVENT_VFORK = 2
+PTRACE_EVENT_CLONE = 3
+PTRACE_EVENT_EXEC = 4
+
+WALL = 0x40000000
+
+INT3 = 0xCC
+
+ZF = 1 << 6
+SF = 1 << 7
+OF = 1 << 11
+
+REG_NAMES = ["r15", "r14", "r13", "r12", "rbp", "rbx", "r11", "r10", "r9", "r8", "rax", "rcx", "rdx", "rsi", "rdi",
+             "orig_rax", "rip", "cs", "eflags", "rsp", "ss", "fs_base", "gs_base", "ds", "es", "fs", "gs"]
+
+
+class UserRegs(ctypes.Structure): #pylint: disable=too-few-public-methods
+    """struct user_regs_struct from <sys/user.h>, as PTRACE_GETREGS and PTRACE_SETREGS use it."""
+    _fields_ = [(name, ctypes.c_ulonglong) for name in REG_NAMES]
+
+
+LIBC = ctypes.CDLL(None, use_errno=True)
+LIBC.ptrace.argtypes = [ctypes.c_long, ctypes.c_long, ctypes.c_void_p, ctypes.c_void_p]
+LIBC.ptrace.restype = ctypes.c_long
+
+
+def ptrace(request, pid, addr=None, data=None):
+    ctypes.set_errno(0)
+    r = LIBC.ptrace(request, pid, addr, data)
+    if (r == -1) and (ctypes.get_errno() != 0):
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+    return r
+
+
+def taken(opcode, eflags):
+    # The same conditions the CPU is about to evaluate
+    zf = (eflags & ZF) != 0
+    lt = ((eflags & SF) != 0) != ((eflags & OF) != 0)
+    return {"je": zf, "jne": not zf, "jl": lt, "jge": not lt, "jle": zf or lt, "jg": (not zf) and (not lt)}[opcode]
+
+
+def jump_target(address, hexdata):
+    if hexdata[0] == 0x0F:
+        displacement = int.from_bytes(hexdata[2:6], "little", signed=True)
+    else:
+        displacement = int.from_bytes(hexdata[1:2], "little", signed=True)
+    return address + len(hexdata) + displacement
+
+
+# The traced executable: its real path, how it is laid out in memory, and its candidate jumps
+Image = namedtuple("Image", ["path", "segments", "base", "jumps"])
+
+
+class AddressSpace: #pylint: disable=too-few-public-methods
+    """The breakpoints currently in one traced process's memory, shared by all its threads."""
+
+    def __init__(self, breakpoints=None):
+        self.breakpoints = dict(breakpoints) if breakpoints is not None else {}
+
+
+class Tracer:
+    """
+    Runs a command under ptrace, with an int3 on every candidate jump of the executable in any
+    process it (or its children) exec.  At each hit the jump's condition is decided from the
+    flags and rip set accordingly, so breakpoints never need to be removed and re-inserted;
+    a breakpoint is only removed for good once its jump has been seen max_hits times.
+    """
+
+    def __init__(self, executable, jumps, max_hits=256):
+        segments = elf.read_segments(executable)
+        self.image = Image(os.path.realpath(executable), segments, elf.load_base(segments) & ~0xFFF, jumps)
+        self.max_hits = max_hits
+        self.counts = {}
+        self.spaces = {}
+        self.new_tracees = {}
+        self.tracees = set()
+        self.timed_out = False
+
+    def runtime_breakpoints(self, pid):
+        load_bias = None
+        with open("/proc/" + str(pid) + "/maps", 'r') as f:
+            for line in f:
+                fields = line.split()
+                if (len(fields) >= 6) and (fields[5] == self.image.path) and (int(fields[2], 16) == 0):
+                    load_bias = int(fields[0].split("-")[0], 16) - self.image.base
+                    break
+        if load_bias is None:
+            return {}
+        breakpoints = {}
+        for (loc, jump) in self.image.jumps.items():
+            vaddr = elf.offset_to_vaddr(self.image.segments, loc)
+            if vaddr is not None:
+                breakpoints[vaddr + load_bias] = (loc, jump["opcode"], jump["hexdata"])
+        return breakpoints
+
+    def poke_byte(self, pid, address, value):
+        word = ptrace(PTRACE_PEEKDATA, pid, address) & 0xFFFFFFFFFFFFFFFF
+        old = word & 0xFF
+        word = (word & ~0xFF) | value
+        ptrace(PTRACE_POKEDATA, pid, address, word)
+        return old
+
+    def insert_breakpoints(self, pid):
+        space = AddressSpace()
+        self.spaces[pid] = space
+        try:
+            if not os.path.samefile(os.readlink("/proc/" + str(pid) + "/exe"), self.image.path):
+                return
+        except OSError:
+            return
+        for (address, info) in self.runtime_breakpoints(pid).items():
+            if sum(self.counts.get(info[0], (0, 0))) >= self.max_hits:
+                continue
+            self.poke_byte(pid, address, INT3)
+            space.breakpoints[address] = info
+
+    def hit(self, pid, regs):
+        space = self.spaces.get(pid)
+        address = regs.rip - 1
+        if (space is None) or (address not in space.breakpoints):
+            return False
+        (loc, opcode, hexdata) = space.breakpoints[address]
+        (t, nt) = self.counts.get(loc, (0, 0))
+        if taken(opcode, regs.eflags):
+            regs.rip = jump_target(address, hexdata)
+            t += 1
+        else:
+            regs.rip = address + len(hexdata)
+            nt += 1
+        self.counts[loc] = (t, nt)
+        ptrace(PTRACE_SETREGS, pid, None, ctypes.addressof(regs))
+        if (t + nt) >= self.max_hits:
+            # Put the real jump back; the hit count is enough to know its bias
+            self.poke_byte(pid, address, hexdata[0])
+            del space.breakpoints[address]
+        return True
+
+    def kill_all(self):
+        for tracee in list(self.tracees):
+            try:
+                os.kill(tracee, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def time_out(self):
+        self.timed_out = True
+        self.kill_all()
+
+    def run(self, cmd, timeout):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                LIBC.ptrace(PTRACE_TRACEME, 0, None, None)
+                dnull = os.open(os.devnull, os.O_RDWR)
+                os.dup2(dnull, 1)
+                os.dup2(dnull, 2)
+                os.execv("/bin/sh", ["sh", "-c", cmd])
+            finally:
+                os._exit(127)
+        self.tracees.add(pid)
+        options = (PTRACE_O_TRACEFORK | PTRACE_O_TRACEVFORK | PTRACE_O_TRACECLONE | PTRACE_O_TRACEEXEC |
+                   PTRACE_O_EXITKILL)
+        timer = threading.Timer(timeout, self.time_out)
+        timer.start()
+        first_stop = True
+        try:
+            while self.tracees:
+                try:
+                    (stopped, status) = os.waitpid(-1, WALL)
+                except ChildProcessError:
+                    break
+                if os.WIFEXITED(status) or os.WIFSIGNALED(status):
+                    self.tracees.discard(stopped)
+                    self.spaces.pop(stopped, None)
+                    continue
+                if not os.WIFSTOPPED(status):
+                    continue
+                self.tracees.add(stopped)
+                sig = os.WSTOPSIG(status)
+                event = status >> 16
+                deliver = 0
+                if first_stop and (stopped == pid):
+                    # the post-exec SIGTRAP of the shell, before any options are set
+                    first_stop = False
+                    ptrace(PTRACE_SETOPTIONS, pid, None, options)
+                    self.insert_breakpoints(pid)
+                elif event in [PTRACE_EVENT_FORK, PTRACE_EVENT_VFORK, PTRACE_EVENT_CLONE]:
+                    message = ctypes.c_ulong()
+                    ptrace(PTRACE_GETEVENTMSG, stopped, None, ctypes.addressof(message))
+                    child = message.value
+                    parent_space = self.spaces.setdefault(stopped, AddressSpace())
+                    if event == PTRACE_EVENT_CLONE:
+                        self.spaces[child] = parent_space
+                    else:
+                        self.spaces[child] = AddressSpace(parent_space.breakpoints)
+                    self.tracees.add(child)
+                    if self.new_tracees.pop(child, False):
+                        ptrace(PTRACE_CONT, child, None, 0)
+                elif event == PTRACE_EVENT_EXEC:
+                    self.insert_breakpoints(stopped)
+                elif stopped not in self.spaces:
+                    # a new child reporting in before its parent's fork event; hold it until then
+                    self.new_tracees[stopped] = True
+                    continue
+                elif sig == signal.SIGTRAP:
+                    regs = UserRegs()
+                    ptrace(PTRACE_GETREGS, stopped, None, ctypes.addressof(regs))
+                    if not self.hit(stopped, regs):
+                        deliver = sig
+                elif sig != signal.SIGSTOP:
+                    deliver = sig
+                try:
+                    ptrace(PTRACE_CONT, stopped, None, deliver)
+                except OSError:
+                    pass # killed in the meantime
+        finally:
+            timer.cancel()
+            self.kill_all()
+        if self.timed_out:
+            print("BRANCH PROFILING TIMED OUT AFTER", timeout, "SECONDS, USING PARTIAL PROFILE")
+        return self.counts
+
+
+def load_profile(filename, executable_code):
+    if (filename is None) or (not os.path.exists(filename)):
+        return None
+    with open(filename, 'r') as f:
+        profile = json.load(f)
+    if profile.get("executable_hash") != checkpoint.code_hash(executable_code):
+        print("BRANCH PROFILE", filename, "IS FOR A DIFFERENT EXECUTABLE, PROFILING AGAIN")
+        return None
+    return {int(loc): tuple(counts) for (loc, counts) in profile["counts"].items()}
+
+
+def save_profile(filename, executable_code, counts):
+    profile = {"executable_hash": checkpoint.code_hash(executable_code),
+               "counts": {str(loc): list(c) for (loc, c) in counts.items()}}
+    checkpoint.atomic_write(filename, json.dumps(profile).encode("utf-8"))
+
+
+def get_profile(executable, executable_code, jumps, cmd, timeout, filename=None):
+    """Taken and not-taken counts for each jump location, from the cached profile if it matches."""
+    counts = load_profile(filename, executable_code)
+    if counts is not None:
+        print("READ BRANCH PROFILE FOR", len(counts), "JUMPS FROM", filename)
+        return counts
+    if cmd is None:
+        return {}
+    print("PROFILING BRANCH BIAS...")
+    counts = Tracer(executable, jumps).run(cmd, timeout)
+    if filename is not None:
+        save_profile(filename, executable_code, counts)
+    return counts
+
+
+def bias(counts):
+    (t, nt) = counts
+    return max(t, nt) / float(t + nt)
+
+
+def cumulative_weights(jumps, counts, bias_weight=4.0):
+    """
+    Selection weights, in jumps.keys() order: a jump that always went the same way weighs
+    1 + bias_weight, a perfectly balanced (or never executed) jump weighs 1.
+    """
+    cum_weights = []
+    total = 0.0
+    for loc in jumps.keys():
+        if (loc in counts) and (sum(counts[loc]) > 0):
+            total += 1.0 + bias_weight * ((2.0 * bias(counts[loc])) - 1.0)
+        else:
+            total += 1.0
+        cum_weights.append(total)
+    return cum_weights
+
+
+def summarize(counts):
+    executed = [c for c in counts.values() if sum(c) > 0]
+    one_way = len([c for c in executed if 0 in c])
+    print("PROFILED", len(executed), "EXECUTED JUMPS:", one_way, "ALWAYS WENT ONE WAY,",
+          len(executed) - one_way, "WENT BOTH WAYS")
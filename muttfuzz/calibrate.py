@@ -0,0 +1,102 @@
+import collections
+import statistics
+import time
+
+DEFAULT_RUNS = 3
+DEFAULT_MULTIPLIER = 5.0
+MIN_TIMEOUT = 0.25
+
+# Calibration runs are allowed far longer than a check, so a slow corpus isn't mistaken for a hang
+CALIBRATION_CAP = 60.0
+CAP_MULTIPLIER = 10.0
+
+
+class CheckTimer:
+    """
+    The timeout for one kind of check (e.g., the reachability probes), as multiplier times its
+    baseline: the median time the check takes on the original executable, measured by
+    calibrate(), or the longest of the last few check runs that finished cleanly, if that is
+    longer (the corpus can grow between calibrations).  Until calibrated, or if every
+    calibration run hung, the configured timeout is used.
+    """
+
+    def __init__(self, name, configured, multiplier=DEFAULT_MULTIPLIER, minimum=MIN_TIMEOUT, window=20):
+        self.name = name
+        self.configured = configured
+        self.multiplier = multiplier
+        self.minimum = minimum
+        self.baseline = None
+        self.recent = collections.deque(maxlen=window)
+
+    def timeout(self):
+        if self.baseline is None:
+            return self.configured
+        return round(max(self.minimum, self.multiplier * max([self.baseline] + list(self.recent))), 2)
+
+    def calibrate(self, run, runs=DEFAULT_RUNS):
+        """
+        Time run() (which returns True if it hung) runs times, each allowed the calibration cap;
+        returns the new timeout.
+        """
+        cap = self.calibration_cap()
+        durations = []
+        hangs = 0
+        for _ in range(runs):
+            start = time.time()
+            if run(cap):
+                hangs += 1
+            else:
+                durations.append(time.time() - start)
+        if durations:
+            self.baseline = statistics.median(durations)
+            self.recent.clear()
+            print("CALIBRATED", self.name.upper(), "CHECK: MEDIAN", round(self.baseline, 3), "SECONDS OVER", len(durations),
+                  "RUNS ON THE ORIGINAL, TIMEOUT NOW", self.timeout(), "SECONDS")
+        if hangs > 0:
+            print("WARNING:", hangs, "OF", runs, self.name.upper(), "CHECK CALIBRATION RUNS HUNG FOR", cap, "SECONDS" +
+                  ("; KEEPING TIMEOUT OF " + str(self.timeout()) + " SECONDS" if not durations else ""))
+        return self.timeout()
+
+    def calibration_cap(self):
+        return max(CALIBRATION_CAP, CAP_MULTIPLIER * self.timeout())
+
+    def observe(self, duration):
+        # A check that finished by itself (not a hang, and not stopped early by a probe)
+        if self.baseline is not None:
+            self.recent.append(duration)
+
+
+class Calibration:
+    """
+    The timers for the reachability and prune checks, and when they are due to be calibrated:
+    first when the campaign starts mutating, then every few mutants, as the corpus grows.
+    """
+
+    def __init__(self, reach_timeout, prune_timeout, multiplier=DEFAULT_MULTIPLIER, enabled=False, runs=DEFAULT_RUNS,
+                 every=50):
+        # Until (unless) calibrated, these are just the configured timeouts
+        self.timers = {"reach": CheckTimer("reachability", reach_timeout, multiplier),
+                       "prune": CheckTimer("prune", prune_timeout, multiplier)}
+        self.enabled = enabled
+        self.runs = runs
+        self.every = every
+        self.calibrated_at = None
+
+    def timeout(self, name):
+        return self.timers[name].timeout()
+
+    def timeouts(self):
+        return {name: timer.timeout() for (name, timer) in self.timers.items()}
+
+    def due(self, mutant_no):
+        if not self.enabled:
+            return False
+        if self.calibrated_at is None:
+            return True
+        return 0 < self.every <= mutant_no - self.calibrated_at
+
+    def calibrate(self, mutant_no, runs):
+        """Calibrate the timer for each check named in runs, timing its run(cap) on the original."""
+        self.calibrated_at = mutant_no
+        for (name, run) in runs.items():
+            self.timers[name].calibrate(run, self.runs)
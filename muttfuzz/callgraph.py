@@ -0,0 +1,146 @@
+import re
+
+from muttfuzz import mutate
+
+# objdump annotates direct targets and RIP-relative addresses: "401136 <foo>", "# 404010 <bar+0x8>"
+TARGET = re.compile(r"([0-9a-f]+) <([^<>]+)>$")
+IMMEDIATE = re.compile(r"\$0x([0-9a-f]+)")
+OFFSET = re.compile(r"[+-]0x[0-9a-f]+$")
+
+PREFIXES = ["bnd", "notrack", "rex.W", "data16", "cs", "ds"]
+
+DEFAULT_ENTRIES = ["main", "LLVMFuzzerTestOneInput", "LLVMFuzzerInitialize"]
+
+
+def bare_name(function_name):
+    """foo, for an objdump function name like <foo(int)>."""
+    return mutate.sans_arguments(function_name.strip("<>"))
+
+
+class CallGraph:
+    """
+    The static call graph of an executable, collected while disassembling it: for each
+    function, the functions it calls (or tail-jumps to) directly, the functions whose address
+    it takes (by a RIP-relative reference, or an immediate equal to a function's address), and
+    whether it makes indirect calls.  Function names are objdump's, as in function_map.
+    """
+
+    def __init__(self):
+        self.starts = {}
+        self.calls = {}
+        self.refs = {}
+        self.immediates = {}
+        self.indirect = set()
+        self.current = None
+
+    def enter(self, function_name, address):
+        # Start of a function in the disassembly; None for code that isn't the start of one
+        self.current = function_name
+        if function_name is not None:
+            self.starts[function_name] = address
+            self.calls.setdefault(function_name, set())
+            self.refs.setdefault(function_name, set())
+            self.immediates.setdefault(function_name, set())
+
+    def add_instruction(self, instruction):
+        if self.current is None:
+            return
+        parts = instruction.split(None, 1)
+        while parts and (parts[0] in PREFIXES) and (len(parts) > 1):
+            parts = parts[1].split(None, 1)
+        if not parts:
+            return
+        opcode = parts[0]
+        operands = parts[1].split(" (File Offset")[0].strip() if len(parts) > 1 else ""
+        if opcode.startswith("call") or opcode.startswith("jmp"):
+            if operands.startswith("*"):
+                if opcode.startswith("call"):
+                    self.indirect.add(self.current)
+                return
+            m = TARGET.search(operands)
+            if m is not None:
+                callee = "<" + OFFSET.sub("", m.group(2)) + ">"
+                if callee != self.current:
+                    self.calls[self.current].add(callee)
+            return
+        if "#" in operands:
+            m = TARGET.search(operands)
+            if (m is not None) and (not OFFSET.search(m.group(2))):
+                self.refs[self.current].add("<" + m.group(2) + ">")
+        for value in IMMEDIATE.findall(operands.split("#")[0]):
+            self.immediates[self.current].add(int(value, 16))
+
+    def entry(self, function_name):
+        """Everything known about one function's calls, to carry over to a rebuild."""
+        return (sorted(self.calls[function_name]), sorted(self.refs[function_name]),
+                sorted(self.immediates[function_name]), function_name in self.indirect)
+
+    def carry(self, function_name, address, entry):
+        # A function from an earlier analysis, not disassembled again
+        (calls, refs, immediates, indirect) = entry
+        self.starts[function_name] = address
+        self.calls[function_name] = set(calls)
+        self.refs[function_name] = set(refs)
+        self.immediates[function_name] = set(immediates)
+        if indirect:
+            self.indirect.add(function_name)
+
+    def address_taken(self, data_pointers=()):
+        """For each function, the functions whose address it takes; and the functions whose address is in data."""
+        by_address = {address: name for (name, address) in self.starts.items()}
+        taken = {}
+        for function_name in self.starts:
+            names = {name for name in self.refs[function_name] if name in self.starts}
+            names.update(by_address[value] for value in self.immediates[function_name] if value in by_address)
+            taken[function_name] = names
+        in_data = {by_address[value] for value in data_pointers if value in by_address}
+        return (taken, in_data)
+
+    def reachable(self, entries, data_pointers=(), conservative=False):
+        """
+        Functions reachable from any function named in entries (by bare name), or None if there
+        is no such function.  Taking a function's address counts as (maybe) calling it.  When
+        conservative, once a reachable function makes an indirect call, every function whose
+        address is taken anywhere, in code or in data, is reachable too.
+        """
+        roots = [name for name in self.starts if bare_name(name) in entries]
+        if not roots:
+            return None
+        (taken, in_data) = self.address_taken(data_pointers)
+        reached = set(roots)
+        work = list(roots)
+        widened = False
+        while work:
+            function_name = work.pop()
+            callees = set(self.calls.get(function_name, ())) | taken.get(function_name, set())
+            if conservative and (not widened) and (function_name in self.indirect):
+                widened = True
+                callees |= in_data
+                for names in taken.values():
+                    callees |= names
+            for callee in callees:
+                if callee not in reached:
+                    reached.add(callee)
+                    work.append(callee)
+        return reached
+
+
+def exclude_unreachable(graph, entries, data_pointers, function_map, unreach_cache, conservative=False, verbose=False):
+    """Put the functions the call graph shows can't be reached from the entry symbols in the unreachable cache."""
+    reachable = graph.reachable(entries, data_pointers, conservative)
+    if reachable is None:
+        print("NO ENTRY SYMBOL", ", ".join(entries), "IN THE CALL GRAPH, SKIPPING STATIC REACHABILITY")
+        return
+    unreachable = [function for function in function_map if function not in reachable]
+    if len(unreachable) == len(function_map):
+        print("NO FUNCTION WITH MUTABLE JUMPS IS STATICALLY REACHABLE, SKIPPING STATIC REACHABILITY")
+        return
+    for function in unreachable:
+        unreach_cache[function] = True
+    print("STATIC CALL GRAPH OF", len(graph.starts), "FUNCTIONS:", len(unreachable), "OF",
+          len(function_map), "FUNCTIONS WITH MUTABLE JUMPS (" +
+          str(sum(len(function_map[function]) for function in unreachable)), "JUMPS) ARE UNREACHABLE FROM",
+          ", ".join(entries) + ("" if conservative else " (NOT COUNTING FUNCTION POINTERS IN DATA)"))
+    if verbose:
+        for function in unreachable:
+            print("STATICALLY UNREACHABLE:", function)
@@ -0,0 +1,152 @@
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import pickle
+import signal
+import time
+
+
+class CallTimeout(Exception):
+    """A call did not finish in time, and the process running it was killed."""
+
+
+class CallError(Exception):
+    """A call raised an exception, or the process running it died."""
+
+
+def serve(conn, pool_conn):
+    # Persistent worker: run each (function, args) sent until the pool closes the pipe (or dies)
+    pool_conn.close() # the fork's copy of the pool's end, which would keep the pipe open after the pool is gone
+    os.setsid()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            request = conn.recv_bytes()
+        except EOFError:
+            return
+        try:
+            (func, args) = pickle.loads(request)
+        except Exception as e: #pylint: disable=W0703
+            # e.g., a function defined in __main__ after this worker was forked
+            conn.send(("unpicklable", repr(e)))
+            continue
+        try:
+            conn.send(("ok", func(*args)))
+        except Exception as e: #pylint: disable=W0703
+            conn.send(("error", repr(e)))
+
+
+def serve_once(conn, func, args):
+    # Fork-per-call fallback, for lambdas, closures, and other callables that can't be pickled
+    os.setsid()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        conn.send(("ok", func(*args)))
+    except Exception as e: #pylint: disable=W0703
+        conn.send(("error", repr(e)))
+
+
+class Worker:
+    """One forked process running calls for a CallPool: persistent, or (given func) for just that call."""
+
+    def __init__(self, context, func=None, args=()):
+        (self.conn, child_conn) = context.Pipe()
+        self.one_shot = func is not None
+        if self.one_shot:
+            self.process = context.Process(target=serve_once, args=(child_conn, func, args), daemon=True)
+        else:
+            self.process = context.Process(target=serve, args=(child_conn, self.conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        # The call may have started its own subprocesses, so kill the whole process group
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            self.process.kill() # not yet its own process group leader
+        self.process.join()
+        self.conn.close()
+
+    def exit_status(self):
+        # Negative for a signal, as for subprocess return codes
+        self.process.join()
+        return self.process.exitcode
+
+
+class CallPool:
+    """
+    A pool of persistent forked worker processes for running Python callables with float
+    timeouts; a call that runs over its time is killed (along with anything it started) and
+    its worker replaced.  Callables that can't be pickled are run in a fresh fork instead.
+    Calls run in another process, so their side effects on the caller's memory are lost.
+    """
+
+    def __init__(self, processes=1):
+        self.context = multiprocessing.get_context("fork")
+        self.processes = processes
+        self.idle = []
+
+    def start(self, func, args):
+        try:
+            payload = pickle.dumps((func, args))
+        except Exception: #pylint: disable=W0703
+            return Worker(self.context, func, args)
+        worker = self.idle.pop() if self.idle else Worker(self.context)
+        worker.conn.send_bytes(payload)
+        return worker
+
+    def run_many(self, calls, timeout):
+        """
+        Run a list of (function, args) calls, up to processes at a time, each with timeout seconds;
+        returns a list of outcomes, each ("ok", value), ("error", message), ("died", exit status) or ("timeout", None).
+        """
+        results = {} # by call index, filled in as calls finish
+        pending = list(enumerate(calls))
+        running = {}
+        while pending or running:
+            while pending and (len(running) < self.processes):
+                (i, (func, args)) = pending.pop(0)
+                worker = self.start(func, args)
+                running[worker.conn] = (i, func, args, worker, time.monotonic() + timeout)
+            next_deadline = min(deadline for (_, _, _, _, deadline) in running.values())
+            for conn in wait(list(running), max(0.0, next_deadline - time.monotonic())):
+                (i, func, args, worker, deadline) = running.pop(conn)
+                try:
+                    outcome = conn.recv()
+                except EOFError:
+                    results[i] = ("died", worker.exit_status())
+                    worker.kill()
+                    continue
+                if outcome[0] == "unpicklable":
+                    self.idle.append(worker)
+                    worker = Worker(self.context, func, args)
+                    running[worker.conn] = (i, func, args, worker, deadline)
+                    continue
+                results[i] = outcome
+                if worker.one_shot:
+                    worker.kill()
+                else:
+                    self.idle.append(worker)
+            now = time.monotonic()
+            for conn in [c for (c, (_, _, _, _, deadline)) in running.items() if deadline <= now]:
+                (i, _, _, worker, _) = running.pop(conn)
+                worker.kill()
+                results[i] = ("timeout", None)
+        return [results[i] for i in range(len(calls))]
+
+    def run(self, func, timeout, args=()):
+        """Run one call, returning its value; raises CallTimeout or CallError if it doesn't return in time."""
+        (status, value) = self.run_many([(func, args)], timeout)[0]
+        if status == "timeout":
+            raise CallTimeout("call took more than " + str(timeout) + " seconds")
+        if status == "died":
+            raise CallError("process running call died with exit status " + str(value))
+        if status == "error":
+            raise CallError(value)
+        return value
+
+    def close(self):
+        for worker in self.idle:
+            worker.kill()
+        self.idle = []
@@ -0,0 +1,264 @@
+from array import array
+import bisect
+from collections import namedtuple
+
+# Kinds of control transfer instruction
+CONDITIONAL = 0
+DIRECT_JUMP = 1
+INDIRECT_JUMP = 2
+NO_RETURN = 3
+
+PREFIXES = ["bnd", "notrack", "rep", "repz", "repnz", "cs", "ds"]
+ENDS = ["ret", "retq", "retl", "hlt", "ud2", "iret", "iretq"]
+# Most instructions can be passed over without splitting them up
+STARTS = tuple(PREFIXES + ENDS + ["j", "loop"])
+
+
+def control_kind(opcode, operands):
+    """The kind of control transfer an instruction is, or None for any other instruction (including calls)."""
+    if opcode in ENDS:
+        return NO_RETURN
+    if opcode in ["jmp", "jmpq"]:
+        return INDIRECT_JUMP if operands.startswith("*") else DIRECT_JUMP
+    if (opcode[0] == "j") or opcode.startswith("loop"):
+        return CONDITIONAL
+    return None
+
+
+class FunctionCFG:
+    """
+    Basic blocks of one function and their dominator tree.  Blocks are numbered in address
+    order; the function's entry, any block other functions jump into (e.g., from a .cold
+    part), and any block nothing in the function jumps or falls into (e.g., an exception
+    landing pad) are children of a virtual root, so they dominate nothing they aren't sure to.
+    """
+
+    def __init__(self, starts, successors, entries):
+        self.starts = starts
+        count = len(starts)
+        root = count
+        preds = [[] for _ in range(count + 1)]
+        for (block, block_succs) in enumerate(successors):
+            for succ in block_succs:
+                preds[succ].append(block)
+        entries = sorted(set(entries).union(block for block in range(count) if not preds[block]))
+        for block in entries:
+            preds[block].append(root)
+        succs = successors + [entries]
+        # Reverse postorder from the root, iteratively (functions can be huge)
+        order = []
+        seen = [False] * (count + 1)
+        stack = [(root, iter(succs[root]))]
+        seen[root] = True
+        while stack:
+            (block, children) = stack[-1]
+            for child in children:
+                if not seen[child]:
+                    seen[child] = True
+                    stack.append((child, iter(succs[child])))
+                    break
+            else:
+                order.append(block)
+                stack.pop()
+        order.reverse()
+        number = [None] * (count + 1)
+        for (i, block) in enumerate(order):
+            number[block] = i
+        # Cooper, Harvey and Kennedy's "simple, fast dominance algorithm"
+        idom = [None] * (count + 1)
+        idom[root] = root
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new_idom = None
+                for pred in preds[block]:
+                    if idom[pred] is None:
+                        continue
+                    if new_idom is None:
+                        new_idom = pred
+                        continue
+                    (a, b) = (pred, new_idom)
+                    while a != b:
+                        while number[a] > number[b]:
+                            a = idom[a]
+                        while number[b] > number[a]:
+                            b = idom[b]
+                    new_idom = a
+                if idom[block] != new_idom:
+                    idom[block] = new_idom
+                    changed = True
+        self.idom = idom[:count]
+        self.children = [[] for _ in range(count)]
+        for (block, parent) in enumerate(self.idom):
+            if (parent is not None) and (parent != root):
+                self.children[parent].append(block)
+        self.root = root
+
+    def block_of(self, address):
+        return bisect.bisect_right(self.starts, address) - 1
+
+    def dominators(self, block):
+        """The blocks that dominate block, including itself; none for a block the CFG can't reach."""
+        if self.idom[block] is None:
+            return []
+        result = []
+        while block != self.root:
+            result.append(block)
+            block = self.idom[block]
+        return result
+
+    def dominated(self, block):
+        """The blocks block strictly dominates."""
+        result = []
+        work = list(self.children[block])
+        while work:
+            child = work.pop()
+            result.append(child)
+            work.extend(self.children[child])
+        return result
+
+
+# Parallel arrays, sorted by address once disassembly is done: where each function starts (and
+# its file offset - address), and each control transfer instruction's address, size, kind and target
+Functions = namedtuple("Functions", ["starts", "names", "deltas"])
+Instructions = namedtuple("Instructions", ["addresses", "sizes", "kinds", "targets"])
+
+
+class ControlFlow:
+    """
+    Control transfer instructions of every function, collected while disassembling, from
+    which the CFG of a function with mutable jumps is built the first time it is needed.  If
+    a jump was reached, every jump ending a block that dominates it was reached too; if it
+    wasn't, no jump in a block it dominates was.  Functions with indirect jumps (e.g., switch
+    tables), whose successors aren't known, get no CFG.
+    """
+
+    def __init__(self):
+        self.functions = Functions(array('q'), [], array('q'))
+        self.instructions = Instructions(array('q'), array('b'), array('b'), array('q'))
+        self.current = None
+        self.cfgs = {}
+        self.entries = None
+
+    def enter(self, function_name, address, delta):
+        # None for code that isn't the start of a function
+        self.current = function_name
+        if function_name is not None:
+            self.functions.starts.append(address)
+            self.functions.names.append(function_name)
+            self.functions.deltas.append(delta)
+
+    def add_instruction(self, address, hexdata, instruction):
+        if (self.current is None) or (not instruction.startswith(STARTS)):
+            return
+        parts = instruction.split(None, 1)
+        while parts and (parts[0] in PREFIXES) and (len(parts) > 1):
+            parts = parts[1].split(None, 1)
+        if not parts:
+            return
+        operands = parts[1].strip() if len(parts) > 1 else ""
+        kind = control_kind(parts[0], operands)
+        if kind is None:
+            return
+        target = -1
+        if kind in [CONDITIONAL, DIRECT_JUMP]:
+            try:
+                target = int(operands.split()[0], 16)
+            except (IndexError, ValueError):
+                return
+        self.instructions.addresses.append(address)
+        self.instructions.sizes.append(len(hexdata.split()))
+        self.instructions.kinds.append(kind)
+        self.instructions.targets.append(target)
+
+    def finish(self):
+        """Sort everything by address, once all of the disassembly is read."""
+        functions = sorted(zip(*self.functions))
+        self.functions = Functions(array('q', [f[0] for f in functions]), [f[1] for f in functions],
+                                   array('q', [f[2] for f in functions]))
+        insts = sorted(zip(*self.instructions))
+        self.instructions = Instructions(array('q', [i[0] for i in insts]), array('b', [i[1] for i in insts]),
+                                         array('b', [i[2] for i in insts]), array('q', [i[3] for i in insts]))
+
+    def function_index(self, address):
+        return bisect.bisect_right(self.functions.starts, address) - 1
+
+    def function_range(self, index):
+        starts = self.functions.starts
+        start = starts[index]
+        end = starts[index + 1] if index + 1 < len(starts) else (1 << 62)
+        return (start, end)
+
+    def external_entries(self):
+        # Targets of jumps from other functions into the middle of a function
+        if self.entries is None:
+            self.entries = set()
+            starts = set(self.functions.starts)
+            insts = self.instructions
+            for (address, kind, target) in zip(insts.addresses, insts.kinds, insts.targets):
+                if (kind in [CONDITIONAL, DIRECT_JUMP]) and (target not in starts):
+                    if self.function_index(address) != self.function_index(target):
+                        self.entries.add(target)
+        return self.entries
+
+    def cfg(self, function_name):
+        if function_name in self.cfgs:
+            return self.cfgs[function_name]
+        self.cfgs[function_name] = None
+        if function_name not in self.functions.names:
+            return None
+        index = self.functions.names.index(function_name)
+        (start, end) = self.function_range(index)
+        insts = self.instructions
+        first = bisect.bisect_left(insts.addresses, start)
+        last = bisect.bisect_left(insts.addresses, end)
+        if first == last:
+            return None # not disassembled this time (carried over), or no control flow to speak of
+        leaders = {start}
+        entries = {target for target in self.external_entries() if start < target < end}
+        leaders.update(entries)
+        for i in range(first, last):
+            if insts.kinds[i] == INDIRECT_JUMP:
+                return None
+            if start <= insts.targets[i] < end:
+                leaders.add(insts.targets[i])
+            if insts.addresses[i] + insts.sizes[i] < end:
+                leaders.add(insts.addresses[i] + insts.sizes[i])
+        starts = sorted(leaders)
+        successors = [[] for _ in starts]
+        i = first
+        for (block, block_start) in enumerate(starts):
+            block_end = starts[block + 1] if block + 1 < len(starts) else end
+            while (i < last) and (insts.addresses[i] < block_start):
+                i += 1
+            fallthrough = [block + 1] if block + 1 < len(starts) else []
+            if (i < last) and (insts.addresses[i] < block_end):
+                kind = insts.kinds[i]
+                target = insts.targets[i]
+                inside = [bisect.bisect_left(starts, target)] if start <= target < end else []
+                if kind == CONDITIONAL:
+                    successors[block] = inside + fallthrough
+                elif kind == DIRECT_JUMP:
+                    successors[block] = inside
+            else:
+                successors[block] = fallthrough
+        roots = [0] + [bisect.bisect_left(starts, target) for target in sorted(entries)]
+        self.cfgs[function_name] = FunctionCFG(starts, successors, roots)
+        return self.cfgs[function_name]
+
+    def implied(self, function_name, function_locs, loc, reached):
+        """
+        The other mutable jumps (of function_locs, all in function_name) that a reachability
+        verdict for the jump at loc implies the same verdict for.
+        """
+        cfg = self.cfg(function_name)
+        if cfg is None:
+            return []
+        delta = self.functions.deltas[self.functions.names.index(function_name)]
+        block = cfg.block_of(loc - delta)
+        if block < 0:
+            return []
+        blocks = set(cfg.dominators(block) if reached else cfg.dominated(block))
+        blocks.discard(block)
+        return [other for other in function_locs if cfg.block_of(other - delta) in blocks]
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import pickle
+import random
+import sys
+import time
+
+CHECKPOINT_VERSION = 1
+
+
+def code_hash(code):
+    return hashlib.sha256(code).hexdigest()
+
+
+def atomic_write(filename, data):
+    # Write to a temporary file, make it durable, then rename over the old version
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+    dir_fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class Checkpointer:
+    """
+    Periodically saves the full state of a campaign, along with a pristine copy of the
+    executable (in <checkpoint>.original), so that a preempted campaign can be resumed.
+    """
+
+    def __init__(self, filename, executable_code, interval=300.0):
+        self.filename = filename
+        self.original_filename = filename + ".original"
+        self.executable_code = executable_code
+        self.executable_hash = code_hash(executable_code)
+        self.interval = interval
+        self.last_save = time.time()
+        self.original_saved = False
+
+    def due(self):
+        return (time.time() - self.last_save) >= self.interval
+
+    def save(self, state):
+        if not self.original_saved:
+            atomic_write(self.original_filename, bytes(self.executable_code))
+            self.original_saved = True
+        state = dict(state)
+        state["version"] = CHECKPOINT_VERSION
+        state["executable_hash"] = self.executable_hash
+        state["random_state"] = random.getstate()
+        atomic_write(self.filename, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        self.last_save = time.time()
+        print("SAVED CHECKPOINT TO", self.filename)
+
+
+def load_checkpoint(filename):
+    with open(filename, 'rb') as f:
+        state = pickle.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        print("CHECKPOINT", filename, "IS FROM AN INCOMPATIBLE VERSION OF MUTTFUZZ")
+        sys.exit(1)
+    return state
+
+
+def verify_executable(executable, state, filename):
+    """
+    Make sure the executable on disk is the pristine original the checkpoint was made with;
+    a campaign preempted in the middle of a mutant leaves the mutant in place.
+    """
+    with open(executable, 'rb') as f:
+        code = f.read()
+    if code_hash(code) == state["executable_hash"]:
+        return
+    original_filename = filename + ".original"
+    if os.path.exists(original_filename):
+        with open(original_filename, 'rb') as f:
+            original_code = f.read()
+        if code_hash(original_code) == state["executable_hash"]:
+            print("EXECUTABLE ON DISK IS NOT THE ORIGINAL (PROBABLY A MUTANT LEFT BY THE PREEMPTED RUN), RESTORING IT")
+            with open(executable + ".muttfuzz_restore", 'wb') as f:
+                f.write(original_code)
+            os.chmod(executable + ".muttfuzz_restore", os.stat(executable).st_mode)
+            os.rename(executable + ".muttfuzz_restore", executable)
+            return
+    print("EXECUTABLE", executable, "DOES NOT MATCH THE ONE CHECKPOINTED IN", filename + ", CANNOT RESUME")
+    sys.exit(1)
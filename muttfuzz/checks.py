@@ -0,0 +1,209 @@
+import os
+import shutil
+import time
+
+from muttfuzz import commands
+from muttfuzz import meta_mutant as meta_executable
+from muttfuzz import parallel as parallel_fuzzing
+
+
+def rejection(mutant):
+    """The status recorded for a mutant that won't be fuzzed, saying why."""
+    if not mutant.valid:
+        return "invalid"
+    if "hang" in mutant.times:
+        return "hung"
+    return "pruned" if "prune" in mutant.times else "unreachable"
+
+
+class MutantChecks:
+    """
+    The reachability and prune checks of a campaign's mutants: of the mutant in place of the
+    executable, or of one staged in its own files and checked in the background while another
+    mutant is fuzzed.  Verdicts go in the campaign's caches, and timeouts come from its calibration.
+    """
+
+    def __init__(self, campaign):
+        self.campaign = campaign
+
+    def reachability(self, mutant):
+        campaign = self.campaign
+        config = campaign.config
+        knowledge = campaign.knowledge
+        files = campaign.helpers.files
+        # Staged mutants are checked in the background, so the caches are only touched holding the lock, never while a probe runs
+        lock = campaign.helpers.lock
+        if config.verbose:
+            print()
+            print("=" * 40)
+            print("CHECKING REACHABILITY")
+        start_check = time.time()
+        reachable = True
+        # First check the funciton itself is reachable
+        with lock:
+            cached = tuple(mutant.functions) in knowledge.reach_cache
+        if cached:
+            print("SKIPPING FUNCTION REACHABILITY, IN CACHE")
+            r = 1
+        else:
+            r = self.probe(mutant, files.func_reach, "func_reachability_executable")
+            if self.hung("FUNCTION REACHABILITY"):
+                r = None
+        with lock:
+            if r == 0:
+                print("FUNCTION ITSELF IS NOT REACHABLE (RETURN CODE 0)")
+                reachable = False
+                if not config.no_unreach_cache:
+                    for function in mutant.functions:
+                        knowledge.mark_unreachable(function, config.unreach_cache_file)
+            elif r is not None: # None is no verdict (a hang), so the mutant is kept and nothing is cached
+                knowledge.reach_cache[tuple(mutant.functions)] = True
+                cached = tuple(mutant.locs) in knowledge.reach_cache
+        if r not in [None, 0]:
+            if cached:
+                print("SKIPPING JUMP REACHABILITY,  IN CACHE")
+                r = 1
+            else:
+                start_probe = time.time()
+                r = self.probe(mutant, files.reach, "reachability_executable")
+                if self.hung("JUMP REACHABILITY"):
+                    r = None
+                elif r == 0:
+                    # The whole check ran, never stopped by the probe: a measure of how long checks take now
+                    with lock:
+                        campaign.helpers.calibration.timers["reach"].observe(time.time() - start_probe)
+            with lock:
+                if r == 0:
+                    print("MUTANT IS NOT REACHABLE (RETURN CODE 0)")
+                    if not config.no_unreach_cache:
+                        for loc in mutant.locs:
+                            knowledge.unreach_cache[loc] = True # No file caching for location reachability
+                        self.propagate(mutant, False)
+                    reachable = False
+                elif r is not None:
+                    knowledge.reach_cache[tuple(mutant.locs)] = True
+                    if len(mutant.locs) == 1:
+                        # With more than one jump, only one of them need have been reached
+                        self.propagate(mutant, True)
+        if r is not None: # a hang says nothing about coverage, either
+            with lock:
+                coverage = knowledge.coverage
+                coverage.record(mutant.functions, r != 0)
+                for function in mutant.functions:
+                    print(function + ":", str(coverage.percent(function)) + "% COVERAGE")
+                print ("RUNNING COVERAGE ESTIMATE OVER", int(coverage.total), "MUTANTS:", str(coverage.percent()) + "%")
+        if (mutant.staged is None) and (campaign.analysis.meta is not None):
+            campaign.analysis.meta.replaced() # probes put the original back
+        mutant.times["reach"] = round(time.time() - start_check, 2)
+        return reachable
+
+    def propagate(self, mutant, reached):
+        analysis = self.campaign.analysis
+        if analysis.control_flow is not None:
+            self.campaign.knowledge.propagate(analysis.control_flow, analysis.function_map, mutant, reached)
+
+    def hung(self, check):
+        # A probe that timed out says nothing either way about reachability
+        if commands.last_killed_by() != "timeout":
+            return False
+        print(check, "CHECK HUNG FOR", self.campaign.helpers.calibration.timeout("reach"),
+              "SECONDS: KEEPING THE MUTANT, CACHING NOTHING")
+        return True
+
+    def prune_hung(self, mutant):
+        # A mutant that hangs on the prune check is pruned, but recorded as hung, not as failing the check
+        if commands.last_killed_by() != "timeout":
+            return False
+        mutant.times["hang"] = mutant.times["prune"]
+        print("MUTANT #" + str(mutant.number), "HUNG IN THE PRUNING CHECK FOR", self.campaign.helpers.calibration.timeout("prune"),
+              "SECONDS")
+        return True
+
+    def probe(self, mutant, probe_filename, staged_name):
+        campaign = self.campaign
+        config = campaign.config
+        timeout = campaign.helpers.calibration.timeout("reach")
+        if mutant.staged is None:
+            return commands.run_probe(probe_filename, config.executable, campaign.analysis.code,
+                                      parallel_fuzzing.expand_cmd(config.reachability_check_cmd, executable=config.executable),
+                                      timeout, config.verbose, log_filename=campaign.helpers.files.log)
+        # A staged probe is run where it is, leaving the executable being fuzzed alone
+        return commands.silent_run_with_timeout(parallel_fuzzing.expand_cmd(config.reachability_check_cmd,
+                                                                            executable=os.path.join(mutant.staged, staged_name)),
+                                                timeout, config.verbose, log_filename=campaign.helpers.files.validate_log)
+
+    def prune(self, mutant):
+        campaign = self.campaign
+        config = campaign.config
+        analysis = campaign.analysis
+        if mutant.staged is not None:
+            # Already checked in the background
+            commands.install_executable(os.path.join(mutant.staged, "executable"), config.executable)
+            shutil.rmtree(mutant.staged, ignore_errors=True)
+            return True
+        start_prune = time.time()
+        if analysis.meta is not None:
+            analysis.meta.install()
+            os.environ[meta_executable.MUTANT_VARIABLE] = meta_executable.mutant_ids(analysis.jumps, analysis.function_reach,
+                                                                                    mutant.metadata)
+        else:
+            commands.install_executable(campaign.helpers.files.new, config.executable)
+        if config.prune_mutant_cmd is None:
+            mutant.times["prune"] = round(time.time() - start_prune, 2)
+            return True
+        if config.verbose:
+            print()
+            print("=" * 40)
+            print("PRUNING MUTANT...")
+        r = commands.silent_run_with_timeout(parallel_fuzzing.expand_cmd(config.prune_mutant_cmd, executable=config.executable),
+                                             campaign.helpers.calibration.timeout("prune"), config.verbose,
+                                             log_filename=campaign.helpers.files.log)
+        mutant.times["prune"] = round(time.time() - start_prune, 2)
+        if self.prune_hung(mutant):
+            return False
+        if r != 0:
+            print("PRUNING CHECK FAILED WITH RETURN CODE", r)
+            return False
+        return True
+
+    def staged(self, mutant):
+        """The reachability and prune checks for a mutant staged in the background; returns whether to fuzz it."""
+        campaign = self.campaign
+        config = campaign.config
+        ok = mutant.valid
+        if config.reachability_check_cmd is not None:
+            ok = self.reachability(mutant) and ok
+        if ok and (config.prune_mutant_cmd is not None):
+            start_prune = time.time()
+            r = commands.silent_run_with_timeout(parallel_fuzzing.expand_cmd(config.prune_mutant_cmd,
+                                                                             executable=os.path.join(mutant.staged, "executable")),
+                                                 campaign.helpers.calibration.timeout("prune"), config.verbose,
+                                                 log_filename=campaign.helpers.files.validate_log)
+            mutant.times["prune"] = round(time.time() - start_prune, 2)
+            if self.prune_hung(mutant):
+                ok = False
+            elif r != 0:
+                print("PRUNING CHECK OF MUTANT #" + str(mutant.number), "FAILED WITH RETURN CODE", r)
+                ok = False
+        if not ok:
+            campaign.record_result(mutant, rejection(mutant))
+        else:
+            print("MUTANT #" + str(mutant.number), "PASSED ITS CHECKS, READY TO FUZZ")
+        return ok
+
+    def calibration_run(self, cmd, cap):
+        # Returns True if the check hung even given cap seconds
+        campaign = self.campaign
+        config = campaign.config
+        if campaign.validator is not None:
+            # The executable may be a mutant being fuzzed right now; checks use {executable}, so give them a copy
+            filename = campaign.helpers.workspace.path("calibration_executable")
+            with open(filename, 'wb') as f:
+                f.write(campaign.analysis.code)
+            os.chmod(filename, os.stat(config.executable).st_mode)
+        else:
+            campaign.restore_original()
+            filename = config.executable
+        commands.silent_run_with_timeout(parallel_fuzzing.expand_cmd(cmd, executable=filename), cap, config.verbose,
+                                         log_filename=campaign.helpers.files.log)
+        return commands.last_killed_by() == "timeout"
@@ -0,0 +1,144 @@
+import errno
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from muttfuzz import callpool
+from muttfuzz import limits as resource_limits
+
+
+CALL_POOL = None
+
+# Resource limits for every command run, set by a campaign
+LIMITER = None
+
+# What (a timeout, or a resource limit) stopped the last command run in this thread, if anything
+RUN_INFO = threading.local()
+
+
+def call_pool():
+    # One pool of worker processes for all callables, started on first use
+    global CALL_POOL #pylint: disable=W0603
+    if CALL_POOL is None:
+        CALL_POOL = callpool.CallPool()
+    return CALL_POOL
+
+
+def set_limits(limits):
+    """Run every command under limits (a limits.Limits), or without any, if None."""
+    global LIMITER #pylint: disable=W0603
+    LIMITER = resource_limits.Limiter(limits) if limits is not None else None
+    if LIMITER is not None:
+        print("LIMITING EVERY RUN TO", LIMITER.describe())
+
+
+def last_killed_by():
+    """"timeout", a limit name (limits.MEMORY, ...), or None, for the last command run by this thread."""
+    return getattr(RUN_INFO, "killed_by", None)
+
+
+def install_executable(filename, executable):
+    # rename avoids hitting a busy executable
+    try:
+        os.rename(filename, executable)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Staged on another filesystem (e.g., a tmpfs workspace): copy alongside, then rename
+        shutil.copyfile(filename, executable + ".muttfuzz_install")
+        os.rename(executable + ".muttfuzz_install", executable)
+        os.remove(filename)
+    subprocess.check_call(['chmod', '+x', executable])
+
+
+def restore_executable(executable, executable_code, restore_filename=None):
+    # We do this because it could still be busy if fuzzer hasn't shut down yet
+    if restore_filename is None:
+        restore_filename = executable + ".muttfuzz_restore"
+    with open(restore_filename, 'wb') as f:
+        f.write(executable_code)
+    install_executable(restore_filename, executable)
+
+
+def run_probe(probe_filename, executable, executable_code, cmd, timeout, verbose, restore_filename=None, log_filename=None,
+              stop=None):
+    # Run a check against a probe (e.g., HALT-instrumented) executable, then put the original back
+    install_executable(probe_filename, executable)
+    r = silent_run_with_timeout(cmd, timeout, verbose, log_filename=log_filename, stop=stop)
+    restore_executable(executable, executable_code, restore_filename)
+    return r
+
+
+def silent_run_with_timeout(cmd, timeout, verbose, zero_timeout=False, log_filename=None, stop=None):
+    # Allow functions instead of commands, for use as a library from a script; stderr goes to log_filename, if given
+    # Setting stop (a threading.Event) from another thread cuts a command short, as a timeout would
+    if verbose:
+        print("*" * 30)
+    RUN_INFO.killed_by = None
+    if callable(cmd):
+        try:
+            if verbose:
+                print("CALLING FUNCTION", cmd)
+            return call_pool().run(cmd, timeout)
+        except callpool.CallTimeout:
+            print("ABORTED WITH TIMEOUT")
+            RUN_INFO.killed_by = "timeout"
+            if zero_timeout:
+                return 0
+            return 1 # non-zero return code may be interpreted as failure/crash/timeout
+        except callpool.CallError as e:
+            # An exception, or the worker dying, fails the check (or kills the mutant) like a crash
+            print("CALL FAILED:", e)
+            return 1
+    dnull = open(os.devnull, 'w')
+    if verbose:
+        print("EXECUTING", cmd)
+    start_P = time.time()
+    timed_out = False
+    limiter = LIMITER
+    run = limiter.start() if limiter is not None else None
+    cmd_errors_out = ""
+    P = None
+    try:
+        with (open(log_filename, 'w+') if log_filename is not None else tempfile.TemporaryFile('w+')) as cmd_errors:
+            P = subprocess.Popen(cmd, shell=True, preexec_fn=limiter.preexec(run) if limiter is not None else os.setsid,
+                                 stdout=dnull, stderr=cmd_errors)
+            while (P.poll() is None) and ((time.time() - start_P) < timeout) and not ((stop is not None) and stop.is_set()):
+                time.sleep(min(0.5, timeout / 10.0)) # Allow for small timeouts
+            if P.poll() is None:
+                print("KILLING SUBPROCESS DUE TO TIMEOUT" if (stop is None) or (not stop.is_set()) else "KILLING SUBPROCESS, STOPPED")
+                os.killpg(os.getpgid(P.pid), signal.SIGTERM)
+                P.wait()
+                timed_out = True
+            cmd_errors.seek(0)
+            try:
+                cmd_errors_out = cmd_errors.read()
+            except: #pylint: disable=W0702
+                cmd_errors_out = "ERROR READING OUTPUT"
+        if verbose and len(cmd_errors_out) > 0:
+            print("OUTPUT (TRUNCATED TO LAST 20 LINES):")
+            print("\n".join(cmd_errors_out.split("\n")[-20:]))
+    finally:
+        # P is None if the command couldn't be started at all
+        if (P is not None) and (P.poll() is None):
+            print("KILLING SUBPROCESS DUE TO TIMEOUT")
+            os.killpg(os.getpgid(P.pid), signal.SIGTERM)
+            P.wait()
+            timed_out = True
+        if limiter is not None:
+            RUN_INFO.killed_by = limiter.killed_by(run, P.returncode if P is not None else None, cmd_errors_out)
+    if timed_out:
+        RUN_INFO.killed_by = "timeout"
+    elif RUN_INFO.killed_by is not None:
+        print("KILLED BY", RUN_INFO.killed_by.upper().replace("_", " "), "LIMIT")
+    if verbose:
+        if not timed_out:
+            print("COMPLETED IN", round(time.time() - start_P, 2), "SECONDS")
+        print("*" * 30)
+    if timed_out and zero_timeout:
+        return 0
+    return P.returncode
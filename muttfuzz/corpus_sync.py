@@ -0,0 +1,145 @@
+import errno
+import glob
+import hashlib
+import os
+import shutil
+
+LAYOUTS = ["auto", "afl", "libfuzzer"]
+
+# libFuzzer writes crashing (and leaking, slow, out-of-memory) inputs as artifacts named by kind
+LIBFUZZER_ARTIFACTS = ["crash-", "leak-", "timeout-", "oom-"]
+
+# Files fuzzers keep next to their inputs that are not inputs
+NOT_INPUTS = ["README.txt"]
+
+
+class AFLLayout:
+    """AFL: output/queue and output/crashes*; AFL++ puts them a level down, in output/<name>/."""
+
+    name = "afl"
+
+    def __init__(self, output):
+        self.output = output
+
+    def queue_dirs(self):
+        return sorted(glob.glob(os.path.join(self.output, "queue")) + glob.glob(os.path.join(self.output, "*", "queue")))
+
+    def corpus_dir(self):
+        queues = self.queue_dirs()
+        return queues[0] if queues else os.path.join(self.output, "queue")
+
+    def crash_files(self):
+        dirs = sorted(glob.glob(os.path.join(self.output, "crashes*")) + glob.glob(os.path.join(self.output, "*", "crashes*")))
+        return [f for d in dirs for f in sorted(glob.glob(os.path.join(d, "*")))]
+
+
+class LibFuzzerLayout:
+    """libFuzzer: the corpus directory itself, with crash artifacts in artifacts (default the corpus, too)."""
+
+    name = "libfuzzer"
+
+    def __init__(self, output, artifacts=None):
+        self.output = output
+        self.artifacts = artifacts if artifacts is not None else output
+
+    def queue_dirs(self):
+        return [self.output]
+
+    def corpus_dir(self):
+        return self.output
+
+    def crash_files(self):
+        return sorted(f for prefix in LIBFUZZER_ARTIFACTS for f in glob.glob(os.path.join(self.artifacts, prefix + "*")))
+
+
+def layout_of(output, layout="auto", artifacts=None):
+    # An AFL output directory has a queue; anything else is taken to be a libFuzzer corpus
+    if layout == "auto":
+        layout = "afl" if AFLLayout(output).queue_dirs() else "libfuzzer"
+    if layout == "afl":
+        return AFLLayout(output)
+    return LibFuzzerLayout(output, artifacts)
+
+
+def content_hash(filename):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def link_or_copy(source, dest):
+    try:
+        os.link(source, dest)
+    except OSError as e:
+        if e.errno not in [errno.EXDEV, errno.EPERM, errno.EMLINK]:
+            raise
+        shutil.copy(source, dest)
+
+
+class CorpusSync:
+    """
+    Brings new inputs into the corpus of one fuzzer output directory (its queue, for AFL):
+    its own crashes (which may only crash a mutant, and are worth exploring from), and the
+    queue entries and crashes of other outputs.  Inputs are hardlinked (or copied, across
+    filesystems), and only if no input with the same content is in the corpus already.
+    Every file looked at is remembered, so each sync only hashes new files.
+    """
+
+    def __init__(self, output, layout="auto", artifacts=None):
+        self.output = output
+        self.layout_name = layout
+        self.artifacts = artifacts
+        self.hashes = set()
+        self.seen = set()
+
+    def layout(self):
+        # Decided again each time, since AFL only makes its queue once it starts
+        return layout_of(self.output, self.layout_name, self.artifacts)
+
+    def scan_corpus(self, corpus):
+        # Inputs the fuzzer added itself (or that were synced before) are never brought in again
+        for filename in sorted(glob.glob(os.path.join(corpus, "*"))):
+            if (filename not in self.seen) and os.path.isfile(filename):
+                self.seen.add(filename)
+                self.hashes.add(content_hash(filename))
+
+    def sync(self, sources=(), crash_prefix="crash_"):
+        """
+        Bring in this output's new crashes, with crash_prefix on their names, and new inputs
+        from sources, a list of (CorpusSync, queue prefix, crash prefix) for other outputs.
+        Returns how many inputs were added.
+        """
+        layout = self.layout()
+        corpus = layout.corpus_dir()
+        os.makedirs(corpus, exist_ok=True)
+        self.scan_corpus(corpus)
+        sources = [(self, None, crash_prefix)] + list(sources)
+        # Entries another output got by syncing are taken from where they came from, not passed along
+        synced = tuple(p for (_, queue_prefix, prefix) in sources for p in [queue_prefix, prefix] if p)
+        added = 0
+        for (source, queue_prefix, prefix) in sources:
+            source_layout = source.layout()
+            files = [(f, prefix) for f in source_layout.crash_files()]
+            if queue_prefix is not None:
+                files = [(f, queue_prefix) for d in source_layout.queue_dirs()
+                         for f in sorted(glob.glob(os.path.join(d, "*")))
+                         if not os.path.basename(f).startswith(synced)] + files
+            for (filename, name_prefix) in files:
+                if (filename in self.seen) or (os.path.basename(filename) in NOT_INPUTS) or (not os.path.isfile(filename)):
+                    continue
+                self.seen.add(filename)
+                digest = content_hash(filename)
+                if digest in self.hashes:
+                    continue
+                name = name_prefix + os.path.basename(filename)
+                if os.path.lexists(os.path.join(corpus, name)):
+                    name = name_prefix + digest
+                    if os.path.lexists(os.path.join(corpus, name)):
+                        continue
+                link_or_copy(filename, os.path.join(corpus, name))
+                self.seen.add(os.path.join(corpus, name))
+                self.hashes.add(digest)
+                added += 1
+        return added
@@ -0,0 +1,251 @@
+import bisect
+import gzip
+import json
+import os
+import struct
+
+from muttfuzz import elf
+
+SANCOV_MAGIC_64 = 0xC0BFFFFFFFFFFF64
+SANCOV_MAGIC_32 = 0xC0BFFFFFFFFFFF32
+
+
+class LineCoverage:
+    """Execution counts by source file and line, merged from any number of reports."""
+
+    def __init__(self):
+        self.counts = {}
+        self.by_basename = {}
+
+    def add(self, filename, line, count):
+        if filename not in self.counts:
+            self.counts[filename] = {}
+            self.by_basename.setdefault(os.path.basename(filename), []).append(filename)
+        lines = self.counts[filename]
+        lines[line] = max(count, lines.get(line, 0))
+
+    def find_file(self, filename):
+        # Reports and debug info often disagree about relative vs. absolute paths, so match the longest suffix
+        if filename in self.counts:
+            return filename
+        best = None
+        best_len = 0
+        for candidate in self.by_basename.get(os.path.basename(filename), []):
+            common = os.path.commonprefix([filename[::-1], candidate[::-1]])
+            if len(common) > best_len:
+                best = candidate
+                best_len = len(common)
+        return best
+
+    def line_count(self, filename, line):
+        """Execution count for a line, or None if the coverage data says nothing about it."""
+        found = self.find_file(filename)
+        if found is None:
+            return None
+        return self.counts[found].get(line)
+
+
+def read_lcov(filename, coverage):
+    current = None
+    with open(filename, 'r', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("SF:"):
+                current = line[3:]
+            elif line.startswith("DA:") and (current is not None):
+                fields = line[3:].split(",")
+                coverage.add(current, int(fields[0]), int(float(fields[1])))
+            elif line == "end_of_record":
+                current = None
+
+
+def read_llvm_json(data, coverage):
+    # llvm-cov export: each segment is [line, col, count, has_count, is_region_entry, (is_gap_region)]
+    for export in data["data"]:
+        for file_data in export["files"]:
+            segments = file_data["segments"]
+            for i, segment in enumerate(segments):
+                (line, _, count, has_count) = segment[:4]
+                if (not has_count) or ((len(segment) > 5) and segment[5]):
+                    continue
+                end_line = segments[i + 1][0] if (i + 1) < len(segments) else line
+                for covered_line in range(line, max(line, end_line) + 1):
+                    coverage.add(file_data["filename"], covered_line, count)
+
+
+def read_gcov_json(data, coverage):
+    for file_data in data["files"]:
+        for line in file_data["lines"]:
+            coverage.add(file_data["file"], line["line_number"], line["count"])
+
+
+def read_gcov(filename, coverage):
+    source = filename[:-len(".gcov")]
+    with open(filename, 'r', errors='replace') as f:
+        for line in f:
+            fields = line.split(":", 2)
+            if len(fields) < 3:
+                continue
+            count = fields[0].strip().rstrip("*")
+            try:
+                line_no = int(fields[1])
+            except ValueError:
+                continue
+            if line_no == 0:
+                if fields[2].startswith("Source:"):
+                    source = fields[2][len("Source:"):].strip()
+                continue
+            if count == "-":
+                continue
+            if count in ["#####", "====="]:
+                coverage.add(source, line_no, 0)
+            else:
+                try:
+                    coverage.add(source, line_no, int(count))
+                except ValueError:
+                    pass
+
+
+def read_json_report(filename, coverage):
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, 'rt') as f:
+        data = json.load(f)
+    if "data" in data:
+        read_llvm_json(data, coverage)
+    elif "files" in data:
+        read_gcov_json(data, coverage)
+    else:
+        raise ValueError(filename + " is neither llvm-cov nor gcov JSON")
+
+
+def read_pcs(filename):
+    """Read a set of PCs, either a binary .sancov file or text with one hex PC per line."""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if len(data) >= 8:
+        (magic,) = struct.unpack_from("<Q", data, 0)
+        if magic == SANCOV_MAGIC_64:
+            return set(struct.unpack_from("<" + str((len(data) - 8) // 8) + "Q", data, 8))
+        if magic == SANCOV_MAGIC_32:
+            return set(struct.unpack_from("<" + str((len(data) - 8) // 4) + "I", data, 8))
+    pcs = set()
+    for line in data.decode("utf-8", errors="replace").split("\n"):
+        line = line.strip()
+        if line:
+            pcs.add(int(line, 16))
+    return pcs
+
+
+def split_source(source):
+    # objdump -l source lines look like "/path/file.c:12" or "/path/file.c:12 (discriminator 3)"
+    source = source.split(" (discriminator")[0].strip()
+    if ":" not in source:
+        return (None, None)
+    (filename, line) = source.rsplit(":", 1)
+    try:
+        return (filename, int(line))
+    except ValueError:
+        return (None, None)
+
+
+def seed_from_lines(jumps, function_map, coverage, unreach_cache, reach_cache, no_unreach_cache=False):
+    reached = 0
+    unreached = 0
+    for function, locs in function_map.items():
+        counts = []
+        for loc in locs:
+            (filename, line) = split_source(jumps[loc]["source"])
+            count = coverage.line_count(filename, line) if filename is not None else None
+            counts.append(count)
+            if count is None:
+                continue
+            if count > 0:
+                reach_cache[(function,)] = True
+                reach_cache[(loc,)] = True
+                reached += 1
+            elif not no_unreach_cache:
+                unreach_cache[loc] = True
+                unreached += 1
+        # Only when every jump in a function is known never to execute is the function itself settled
+        if counts and (not no_unreach_cache) and all(c == 0 for c in counts):
+            unreach_cache[function] = True
+    return (reached, unreached)
+
+
+def seed_from_pcs(executable, function_map, function_reach, covered_pcs, all_pcs,
+                  unreach_cache, reach_cache, no_unreach_cache=False):
+    """
+    SanitizerCoverage PCs are offsets from the module base; a function is reached if any covered
+    PC falls inside it, and (given the full PC table) unreachable if none of its PCs are covered.
+    Given the PC table, a jump is also reached if the last instrumented PC before it in its
+    function was covered.
+    """
+    segments = elf.read_segments(executable)
+    base = elf.load_base(segments)
+
+    def to_offsets(pcs):
+        offsets = []
+        for pc in pcs:
+            offset = elf.vaddr_to_offset(segments, pc if pc >= base else pc + base)
+            if offset is not None:
+                offsets.append(offset)
+        return sorted(offsets)
+
+    covered = to_offsets(covered_pcs)
+    covered_set = set(covered)
+    instrumented = to_offsets(all_pcs) if all_pcs is not None else []
+
+    starts = sorted((loc, function) for (function, loc) in function_reach.items())
+    start_locs = [loc for (loc, _) in starts]
+    reached = 0
+    unreached_functions = 0
+    for function, locs in function_map.items():
+        start = function_reach[function]
+        i = bisect.bisect_right(start_locs, start)
+        end = start_locs[i] if i < len(start_locs) else float("inf")
+        lo = bisect.bisect_left(covered, start)
+        if (lo < len(covered)) and (covered[lo] < end):
+            reach_cache[(function,)] = True
+            for loc in locs:
+                j = bisect.bisect_right(instrumented, loc) - 1
+                if (j >= 0) and (instrumented[j] >= start) and (instrumented[j] in covered_set):
+                    reach_cache[(loc,)] = True
+                    reached += 1
+        elif all_pcs is not None:
+            lo = bisect.bisect_left(instrumented, start)
+            if (lo < len(instrumented)) and (instrumented[lo] < end) and (not no_unreach_cache):
+                unreach_cache[function] = True
+                unreached_functions += 1
+    return (reached, unreached_functions)
+
+
+def seed_caches(executable, jumps, function_map, function_reach, coverage_files, unreach_cache, reach_cache,
+                sancov_pcs=None, no_unreach_cache=False):
+    """
+    Pre-fill the reachability caches from existing coverage reports: lcov tracefiles (.info),
+    llvm-cov or gcov JSON exports (.json, .json.gz), gcov text output (.gcov), and
+    SanitizerCoverage PC dumps (.sancov, or anything else, read as hex PCs).
+    """
+    lines = LineCoverage()
+    covered_pcs = set()
+    for filename in coverage_files:
+        if filename.endswith(".info") or filename.endswith(".lcov"):
+            read_lcov(filename, lines)
+        elif filename.endswith(".json") or filename.endswith(".json.gz"):
+            read_json_report(filename, lines)
+        elif filename.endswith(".gcov"):
+            read_gcov(filename, lines)
+        else:
+            covered_pcs |= read_pcs(filename)
+    if lines.counts:
+        (reached, unreached) = seed_from_lines(jumps, function_map, lines, unreach_cache, reach_cache, no_unreach_cache)
+        print("LINE COVERAGE FOR", len(lines.counts), "FILES SHOWS", reached, "JUMPS REACHED AND", unreached, "NEVER REACHED")
+    if covered_pcs:
+        all_pcs = read_pcs(sancov_pcs) if sancov_pcs is not None else None
+        (reached, unreached) = seed_from_pcs(executable, function_map, function_reach, covered_pcs, all_pcs,
+                                             unreach_cache, reach_cache, no_unreach_cache)
+        print("SANITIZER COVERAGE FOR", len(covered_pcs), "PCS SHOWS", reached, "JUMPS REACHED AND",
+              unreached, "FUNCTIONS NEVER REACHED")
+    functions_reached = len([f for f in function_map if (f,) in reach_cache])
+    functions_unreached = len([f for f in function_map if f in unreach_cache])
+    print("COVERAGE DATA SETTLES REACHABILITY OF", functions_reached + functions_unreached, "OF", len(function_map), "FUNCTIONS")
@@ -0,0 +1,164 @@
+import argparse
+from collections import namedtuple
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+OBJECTS = "objects"
+SUFFIX = ".delta"
+
+# ioctl(dest, FICLONE, src) shares src's blocks with dest (btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+
+class DeltaStore:
+    """
+    Saved mutant executables, as patches against one copy of the original.  The original is
+    kept once under objects/, named by its SHA-256, and each mutant is a small JSON record of
+    that hash, the size and mode of the executable, and the bytes changed at each file offset
+    (with the original bytes there, so a patch is never applied to the wrong file).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.objects = os.path.join(directory, OBJECTS)
+        self.digest = None
+        self.code = None
+        self.mode = None
+
+    def add_original(self, code, mode=0o755):
+        """Store the executable everything is a patch against, if it isn't stored already; returns its hash."""
+        self.digest = hashlib.sha256(code).hexdigest()
+        self.code = code
+        self.mode = mode
+        filename = os.path.join(self.objects, self.digest)
+        if not os.path.exists(filename):
+            os.makedirs(self.objects, exist_ok=True)
+            tmp_filename = filename + ".tmp." + str(os.getpid())
+            with open(tmp_filename, 'wb') as f:
+                f.write(code)
+            os.chmod(tmp_filename, 0o444)
+            os.rename(tmp_filename, filename)
+        return self.digest
+
+    def save(self, filename, patches):
+        """Write the record for a mutant made by the (file offset, new bytes) patches, in order."""
+        record = {"original": self.digest,
+                  "size": len(self.code),
+                  "mode": self.mode,
+                  "patches": [[loc, bytes(data).hex(), bytes(self.code[loc:loc + len(data)]).hex()]
+                              for (loc, data) in patches]}
+        with open(filename, 'w') as f:
+            json.dump(record, f)
+
+
+def read_record(filename):
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def original_filename(record, store):
+    filename = os.path.join(store, OBJECTS, record["original"])
+    if not os.path.exists(filename):
+        raise ValueError("original executable " + record["original"] + " is not in " + store)
+    return filename
+
+
+def store_of(filename):
+    # By default, a record is next to the objects/ directory holding its original
+    return os.path.dirname(os.path.abspath(filename))
+
+
+def materialize(filename, store=None):
+    """The mutant executable a record describes, as a bytearray."""
+    record = read_record(filename)
+    with open(original_filename(record, store if store is not None else store_of(filename)), 'rb') as f:
+        code = bytearray(f.read())
+    verify(record, lambda loc, size: bytes(code[loc:loc + size]))
+    for (loc, data, _) in record["patches"]:
+        code[loc:loc + (len(data) // 2)] = bytes.fromhex(data)
+    return code
+
+
+def verify(record, read):
+    # Check every patch against the original before any is applied (patches can overlap, in higher-order mutants)
+    for (loc, _, old) in record["patches"]:
+        if read(loc, len(old) // 2) != bytes.fromhex(old):
+            raise ValueError("patch at " + str(loc) + " does not match the original executable")
+
+
+def clone(source, dest):
+    """Copy source to dest, sharing its blocks (a reflink) when the filesystem can; returns True if it did."""
+    with open(source, 'rb') as src:
+        with open(dest, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return True
+            except OSError:
+                shutil.copyfileobj(src, dst, 1 << 20)
+                return False
+
+
+def export(filename, path, store=None):
+    """
+    Write the mutant executable a record describes to path: a reflink of the stored original,
+    when possible, so only the pages holding patches are ever copied, then the patches in
+    place.  Returns True if the original was reflinked.
+    """
+    record = read_record(filename)
+    original = original_filename(record, store if store is not None else store_of(filename))
+    if os.path.exists(path):
+        os.unlink(path)
+    reflinked = clone(original, path)
+    with open(path, 'r+b') as f:
+
+        def read(loc, size):
+            f.seek(loc)
+            return f.read(size)
+
+        verify(record, read)
+        for (loc, data, _) in record["patches"]:
+            f.seek(loc)
+            f.write(bytes.fromhex(data))
+    os.chmod(path, record["mode"])
+    return reflinked
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('delta', metavar='filename', type=str, default=None,
+                        help='mutant delta record (e.g., killed_12.delta) saved with --save_deltas')
+    parser.add_argument('new_executable', metavar='filename', type=str, default=None,
+                        help='where to write the mutant executable')
+    parser.add_argument('--store', type=str, default=None,
+                        help='directory holding the objects/ store (default the directory of the record)')
+
+    parsed_args = parser.parse_args(sys.argv[1:])
+    return (parsed_args, parser)
+
+
+def make_config(pargs):
+    """
+    Process the raw arguments, returning a namedtuple object holding the
+    entire configuration, if everything parses correctly.
+    """
+    pdict = pargs.__dict__
+    # create a namedtuple object for fast attribute lookup
+    key_list = list(pdict.keys())
+    arg_list = [pdict[k] for k in key_list]
+    Config = namedtuple('Config', key_list)
+    nt_config = Config(*arg_list)
+    return nt_config
+
+def main():
+    parsed_args, _ = parse_args()
+    config = make_config(parsed_args)
+    reflinked = export(config.delta, config.new_executable, config.store)
+    print("WROTE", config.new_executable, "(REFLINKED ORIGINAL)" if reflinked else "(COPIED ORIGINAL)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,607 @@
+import argparse
+from collections import namedtuple
+import hashlib
+import json
+import os
+import random
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from muttfuzz import commands
+from muttfuzz import fuzzutil
+from muttfuzz import knowledge as campaign_knowledge
+from muttfuzz import mutate
+from muttfuzz import results as mutant_results
+from muttfuzz import targeting
+from muttfuzz import workspace
+
+
+class CoordinatorError(Exception):
+    """The coordinator could not handle a request, and sent back why."""
+
+
+def send_message(address, message, timeout=30.0):
+    """
+    Send one JSON message to the coordinator, and return its JSON reply.  A dropped connection
+    raises ConnectionError (an OSError, like failing to connect), and an error reply raises
+    CoordinatorError.
+    """
+    with socket.create_connection(address, timeout=timeout) as sock:
+        sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("coordinator closed the connection without replying")
+    reply = json.loads(line)
+    if reply.get("type") == "error":
+        raise CoordinatorError(reply.get("message", "unknown error"))
+    return reply
+
+
+def parse_address(address):
+    (host, port) = address.rsplit(":", 1)
+    return (host, int(port))
+
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    """One JSON request line, one JSON reply line, per connection."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            reply = self.server.coordinator.handle(json.loads(line))
+        except Exception as e: #pylint: disable=W0703
+            # Whatever went wrong, the worker gets a reply it can read, and the coordinator keeps serving
+            print("ERROR HANDLING REQUEST:", type(e).__name__ + ":", e)
+            reply = {"type": "error", "message": type(e).__name__ + ": " + str(e)}
+        self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+
+# How the coordinator hands out mutants, and what it does with their verdicts
+CoordinatorOptions = namedtuple("CoordinatorOptions", ["budget", "lease_time", "order", "score", "avoid_repeats",
+                                                       "repeat_retries", "stop_on_repeat", "unreach_cache_file",
+                                                       "no_unreach_cache", "save_mutants", "verbose"])
+
+# The executable every worker must have, and its mutable jumps
+Target = namedtuple("Target", ["executable_hash", "jumps", "function_map", "function_reach"])
+
+
+class Leases:
+    """
+    The mutants handed out to workers and still waiting for a verdict, each held until its
+    deadline.  A lease that runs out without a renewal or a verdict is queued to be handed out again.
+    """
+
+    def __init__(self, lease_time):
+        self.lease_time = lease_time
+        self.active = {} # mutant number -> lease
+        self.requeued = [] # leases that expired, to be handed out again
+        self.completed = set()
+        self.workers = set()
+
+    def expire(self):
+        now = time.time()
+        for mutant_no, lease in list(self.active.items()):
+            if now > lease["deadline"]:
+                print("LEASE ON MUTANT #" + str(mutant_no), "HELD BY", lease["worker"], "EXPIRED, WILL REASSIGN")
+                del self.active[mutant_no]
+                self.requeued.append(lease)
+
+    def grant(self, lease, worker):
+        lease["worker"] = worker
+        lease["deadline"] = time.time() + self.lease_time
+        self.active[lease["id"]] = lease
+
+    def renew(self, mutant_no, worker):
+        lease = self.active.get(mutant_no)
+        if (lease is None) or (lease["worker"] != worker):
+            return False
+        lease["deadline"] = time.time() + self.lease_time
+        return True
+
+    def settle(self, mutant_no):
+        """The lease on a mutant that now has a verdict, or None if it already had one."""
+        if mutant_no in self.completed:
+            return None
+        lease = self.active.pop(mutant_no, None)
+        if lease is None:
+            # Late verdict from a worker whose lease expired; fine if the mutant is still waiting
+            waiting = [l for l in self.requeued if l["id"] == mutant_no]
+            if not waiting:
+                return None
+            lease = waiting[0]
+            self.requeued.remove(lease)
+        self.completed.add(mutant_no)
+        return lease
+
+
+class Coordinator:
+    """
+    Owns mutant selection and all of the campaign's knowledge (visited mutants, reachability
+    caches, coverage and scores), handing out mutants as function-relative metadata to workers
+    under leases.  A mutant whose lease runs out without a renewal or a verdict is handed out again.
+    """
+
+    def __init__(self, executable, budget, jumps, function_map, function_reach,
+                 lease_time=120.0, order=1, score=False, avoid_repeats=False, repeat_retries=200,
+                 stop_on_repeat=False, unreach_cache_file=None, no_unreach_cache=False,
+                 save_mutants=None, verbose=False):
+        self.options = CoordinatorOptions(budget, lease_time, order, score, avoid_repeats, repeat_retries, stop_on_repeat,
+                                          unreach_cache_file, no_unreach_cache, save_mutants, verbose)
+        self.target = Target(hashlib.sha256(mutate.get_code(executable)).hexdigest(), jumps, function_map, function_reach)
+        self.lock = threading.Lock()
+        self.leases = Leases(lease_time)
+        # The phase is "mutants" while mutants are still being handed out
+        self.progress = fuzzutil.Progress()
+        self.progress.phase = "mutants"
+        self.progress.start = time.time()
+        self.knowledge = campaign_knowledge.Knowledge(coverage=True, score=score)
+        self.knowledge.track(function_map)
+        self.results = mutant_results.Results()
+
+        if (unreach_cache_file is not None) and os.path.exists(unreach_cache_file):
+            self.knowledge.read_unreachable(unreach_cache_file)
+
+    def handle(self, message):
+        with self.lock:
+            self.leases.expire()
+            kind = message["type"]
+            if kind == "hello":
+                self.leases.workers.add(message["worker"])
+                print("WORKER", message["worker"], "JOINED")
+                return {"type": "welcome", "executable_hash": self.target.executable_hash,
+                        "lease_time": self.options.lease_time}
+            if kind == "get":
+                return self.next_mutant(message["worker"])
+            if kind == "renew":
+                return {"type": "ok" if self.leases.renew(message["id"], message["worker"]) else "lost"}
+            if kind == "result":
+                self.record(message)
+                return {"type": "ok"}
+        return {"type": "error", "message": "unknown message type " + kind}
+
+    def generating(self):
+        return (self.progress.phase == "mutants") and (self.progress.elapsed() < self.options.budget)
+
+    def finished(self):
+        with self.lock:
+            self.leases.expire()
+            if (self.progress.phase == "mutants") and (not self.generating()):
+                print("BUDGET EXHAUSTED, NO MORE MUTANTS WILL BE HANDED OUT")
+                self.progress.phase = "final"
+            return (self.progress.phase != "mutants") and (not self.leases.active) and (not self.leases.requeued)
+
+    def next_mutant(self, worker):
+        leases = self.leases
+        if leases.requeued:
+            lease = leases.requeued.pop(0)
+        elif self.generating():
+            lease = self.new_mutant()
+            if lease is None:
+                return {"type": "wait", "delay": 1.0} if leases.active else {"type": "done"}
+        elif leases.active:
+            return {"type": "wait", "delay": 1.0}
+        else:
+            return {"type": "done"}
+        leases.grant(lease, worker)
+        print(round(self.progress.elapsed(), 2), "ELAPSED: MUTANT #" + str(lease["id"]), "ASSIGNED TO", worker)
+        return {"type": "mutant",
+                "id": lease["id"],
+                "metadata": lease["metadata"],
+                "function_reached": tuple(lease["functions"]) in self.knowledge.reach_cache,
+                "jump_reached": tuple(lease["locs"]) in self.knowledge.reach_cache,
+                "lease_time": self.options.lease_time}
+
+    def new_mutant(self):
+        options = self.options
+        self.progress.mutant_no += 1
+        (changes, metadata) = mutate.select_mutant(self.target.jumps, self.target.function_reach, order=options.order,
+                                                   avoid_repeats=options.avoid_repeats,
+                                                   repeat_retries=options.repeat_retries,
+                                                   visited_mutants=self.knowledge.visited_mutants,
+                                                   unreach_cache=self.knowledge.unreach_cache)
+        if options.stop_on_repeat and max(self.knowledge.visited_mutants.values()) > 1:
+            print("FORCED TO REPEAT A MUTANT, STOPPING ANALYSIS")
+            self.progress.phase = "final"
+            return None
+        if options.save_mutants is not None:
+            with open(self.metadata_filename("mutant", self.progress.mutant_no), "w") as f:
+                f.write(metadata)
+        return {"id": self.progress.mutant_no,
+                "metadata": metadata,
+                "functions": [function for (function, _, _) in changes],
+                "locs": [loc for (_, loc, _) in changes]}
+
+    def metadata_filename(self, kind, mutant_no):
+        return os.path.join(self.options.save_mutants, kind + "_" + str(mutant_no) + ".metadata")
+
+    def record(self, result):
+        options = self.options
+        knowledge = self.knowledge
+        mutant_no = result["id"]
+        lease = self.leases.settle(mutant_no)
+        if lease is None:
+            return
+        functions = lease["functions"]
+        locs = lease["locs"]
+        verdict = result["verdict"]
+        print("MUTANT #" + str(mutant_no), "FROM", result["worker"] + ":", verdict.upper(),
+              "TIMINGS:", result.get("timings", {}))
+
+        if result.get("reachability_checked") and (verdict != "invalid"):
+            if verdict == "function_unreachable":
+                if not options.no_unreach_cache:
+                    for function in functions:
+                        knowledge.mark_unreachable(function, options.unreach_cache_file)
+            elif verdict == "unreachable":
+                knowledge.reach_cache[tuple(functions)] = True
+                if not options.no_unreach_cache:
+                    for loc in locs:
+                        knowledge.unreach_cache[loc] = True
+            else:
+                knowledge.reach_cache[tuple(functions)] = True
+                knowledge.reach_cache[tuple(locs)] = True
+            knowledge.coverage.record(functions, verdict not in ["function_unreachable", "unreachable"])
+            print ("RUNNING COVERAGE ESTIMATE OVER", int(knowledge.coverage.total), "MUTANTS:",
+                   str(knowledge.coverage.percent()) + "%")
+
+        if verdict != "evaluated":
+            if options.save_mutants is not None:
+                # Don't keep unreachable mutants
+                os.remove(self.metadata_filename("mutant", mutant_no))
+            return
+
+        r = result["returncode"]
+        self.results.add(lease["metadata"].replace("\n", "::"), result["time"], r)
+        if options.score:
+            knowledge.score.record(functions, r != 0)
+            if options.save_mutants is not None:
+                os.rename(self.metadata_filename("mutant", mutant_no),
+                          self.metadata_filename("killed" if r != 0 else "survived", mutant_no))
+            print ("RUNNING MUTATION SCORE ON", int(knowledge.score.total), "MUTANTS:", str(knowledge.score.percent()) + "%")
+        sys.stdout.flush()
+
+    def run(self, host="127.0.0.1", port=0, port_file=None):
+        server = socketserver.ThreadingTCPServer((host, port), CoordinatorHandler)
+        server.daemon_threads = True
+        server.coordinator = self
+        (host, port) = server.server_address[:2]
+        print("COORDINATOR LISTENING ON", host + ":" + str(port))
+        if port_file is not None:
+            with open(port_file + ".tmp", 'w') as f:
+                f.write(str(port) + "\n")
+            os.rename(port_file + ".tmp", port_file)
+        sys.stdout.flush()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            self.progress.start = time.time()
+            while not self.finished():
+                time.sleep(0.5)
+            # Give waiting workers a chance to hear that the campaign is over
+            time.sleep(2.0)
+        finally:
+            server.shutdown()
+            server.server_close()
+        print("CAMPAIGN COMPLETED AFTER", round(self.progress.elapsed(), 2), "SECONDS USING", len(self.leases.workers), "WORKERS")
+
+
+def work(address, fuzzer_cmd, executable, time_per_mutant,
+         reachability_check_cmd=None, reachability_check_timeout=2.0,
+         prune_mutant_cmd=None, prune_mutant_timeout=2.0,
+         post_mutant_cmd=None, post_mutant_timeout=2.0,
+         no_timeout_kills=False, name=None, retries=10, verbose=False, workspace_dir=None):
+    """
+    Fetch mutants from the coordinator until it reports the campaign is done; each is
+    materialized, checked, and fuzzed locally, with the verdict and timings sent back.
+    """
+    if name is None:
+        name = socket.gethostname() + ":" + str(os.getpid())
+    executable_code = mutate.get_code(executable)
+    # The coordinator does all filtering, so here we need every jump, including library code
+    (executable_jumps, _, function_reach) = mutate.get_jumps(executable, mutate_standard_libraries=True)
+
+    try:
+        welcome = send_message(address, {"type": "hello", "worker": name})
+    except CoordinatorError as e:
+        print("COORDINATOR REFUSED WORKER:", e)
+        return 1
+    if welcome["executable_hash"] != hashlib.sha256(executable_code).hexdigest():
+        print("EXECUTABLE", executable, "DOES NOT MATCH THE COORDINATOR'S EXECUTABLE")
+        return 1
+    print("WORKER", name, "CONNECTED TO COORDINATOR AT", address[0] + ":" + str(address[1]))
+
+    staging = workspace.Workspace(workspace_dir, prefix=workspace.PREFIX + "worker_")
+
+    failures = 0
+    try:
+        while True:
+            sys.stdout.flush()
+            try:
+                descriptor = send_message(address, {"type": "get", "worker": name})
+                failures = 0
+            except (OSError, CoordinatorError) as e:
+                if isinstance(e, CoordinatorError):
+                    print("COORDINATOR ERROR:", e)
+                failures += 1
+                if failures > retries:
+                    print("LOST CONTACT WITH COORDINATOR, STOPPING")
+                    break
+                time.sleep(1.0)
+                continue
+            if descriptor["type"] == "done":
+                print("COORDINATOR REPORTS CAMPAIGN IS DONE")
+                break
+            if descriptor["type"] == "wait":
+                time.sleep(descriptor["delay"])
+                continue
+
+            print()
+            print("=" * 30, "MUTANT #" + str(descriptor["id"]), "=" * 30)
+            stop_renewing = threading.Event()
+            lost = threading.Event()
+            renewer = threading.Thread(target=renew_lease, daemon=True,
+                                       args=(address, name, descriptor["id"], descriptor["lease_time"] / 4.0, stop_renewing,
+                                             lost))
+            renewer.start()
+            try:
+                result = evaluate_descriptor(descriptor, fuzzer_cmd, executable, executable_code, executable_jumps,
+                                             function_reach, time_per_mutant, reachability_check_cmd,
+                                             reachability_check_timeout, prune_mutant_cmd, prune_mutant_timeout,
+                                             post_mutant_cmd, post_mutant_timeout, no_timeout_kills,
+                                             staging, verbose, lost)
+            finally:
+                stop_renewing.set()
+                renewer.join()
+            if lost.is_set():
+                # The mutant has been handed to another worker; a verdict from a run cut short would be wrong
+                print("LEASE ON MUTANT #" + str(descriptor["id"]), "WAS LOST, DROPPING ITS RESULT")
+                continue
+            result.update({"type": "result", "id": descriptor["id"], "worker": name})
+            print("VERDICT:", result["verdict"].upper())
+            for _ in range(retries):
+                try:
+                    send_message(address, result)
+                    break
+                except CoordinatorError as e:
+                    # Sending it again would fail the same way
+                    print("COORDINATOR COULD NOT RECORD THE VERDICT:", e)
+                    break
+                except OSError:
+                    time.sleep(1.0)
+    finally:
+        # always restore the original binary!
+        commands.restore_executable(executable, executable_code)
+        staging.cleanup()
+    return 0
+
+
+def renew_lease(address, name, mutant_no, interval, stop, lost):
+    # Sets lost, stopping the run, if the coordinator no longer thinks the mutant is ours
+    while not stop.wait(interval):
+        try:
+            reply = send_message(address, {"type": "renew", "worker": name, "id": mutant_no})
+        except (OSError, CoordinatorError):
+            continue
+        if reply.get("type") == "lost":
+            print("COORDINATOR REPORTS LEASE ON MUTANT #" + str(mutant_no), "IS LOST, STOPPING")
+            lost.set()
+            return
+
+
+def evaluate_descriptor(descriptor, fuzzer_cmd, executable, executable_code, executable_jumps, function_reach,
+                        time_per_mutant, reachability_check_cmd, reachability_check_timeout,
+                        prune_mutant_cmd, prune_mutant_timeout, post_mutant_cmd, post_mutant_timeout,
+                        no_timeout_kills, staging, verbose, stop=None):
+    """Evaluate the mutant a coordinator handed out; setting stop cuts every command short."""
+    timings = {}
+    log_filename = staging.path("cmd_errors.txt")
+    result = {"timings": timings, "reachability_checked": reachability_check_cmd is not None}
+    changes = mutate.metadata_changes(executable_jumps, function_reach, descriptor["metadata"])
+    if not changes:
+        result["verdict"] = "invalid"
+        return result
+    (new_code, reach_code, func_reach_code) = mutate.mutant_code(executable_code, function_reach, changes)
+
+    if reachability_check_cmd is not None:
+        checks = [("function_reached", func_reach_code, staging.path("func_reachability_executable"), "function_unreachable"),
+                  ("jump_reached", reach_code, staging.path("reachability_executable"), "unreachable")]
+        for (known, probe_code, probe_filename, verdict) in checks:
+            if descriptor[known]:
+                continue
+            start_check = time.time()
+            with open(probe_filename, 'wb') as f:
+                f.write(probe_code)
+            r = commands.run_probe(probe_filename, executable, executable_code, reachability_check_cmd,
+                                   reachability_check_timeout, verbose, log_filename=log_filename, stop=stop)
+            timings[verdict] = round(time.time() - start_check, 2)
+            if r == 0:
+                result["verdict"] = verdict
+                return result
+
+    with open(staging.path("new_executable"), 'wb') as f:
+        f.write(new_code)
+    commands.install_executable(staging.path("new_executable"), executable)
+    try:
+        if prune_mutant_cmd is not None:
+            start_check = time.time()
+            r = commands.silent_run_with_timeout(prune_mutant_cmd, prune_mutant_timeout, verbose, log_filename=log_filename,
+                                                 stop=stop)
+            timings["prune"] = round(time.time() - start_check, 2)
+            if r != 0:
+                result["verdict"] = "pruned"
+                return result
+
+        start_run = time.time()
+        r = commands.silent_run_with_timeout(fuzzer_cmd, time_per_mutant, verbose, zero_timeout=no_timeout_kills,
+                                             log_filename=log_filename, stop=stop)
+        result["time"] = round(time.time() - start_run, 2)
+        result["returncode"] = r
+        result["verdict"] = "evaluated"
+    finally:
+        commands.restore_executable(executable, executable_code)
+
+    if post_mutant_cmd is not None:
+        start_check = time.time()
+        commands.silent_run_with_timeout(post_mutant_cmd, post_mutant_timeout, verbose, log_filename=log_filename, stop=stop)
+        timings["post_mutant"] = round(time.time() - start_check, 2)
+    return result
+
+
+def make_config(pargs):
+    """
+    Process the raw arguments, returning a namedtuple object holding the
+    entire configuration, if everything parses correctly.
+    """
+    pdict = pargs.__dict__
+    # create a namedtuple object for fast attribute lookup
+    key_list = list(pdict.keys())
+    arg_list = [pdict[k] for k in key_list]
+    Config = namedtuple('Config', key_list)
+    nt_config = Config(*arg_list)
+    return nt_config
+
+
+def parse_coordinator_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('executable', metavar='filename', type=str, default=None,
+                        help='executable to be mutated (workers must have an identical copy)')
+    parser.add_argument('--host', type=str, default="127.0.0.1",
+                        help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=0,
+                        help='port to listen on (default 0, pick any free port)')
+    parser.add_argument('--port_file', metavar='filename', type=str, default=None,
+                        help='file to write the port actually used to')
+    parser.add_argument('--budget', type=int, default=3600,
+                        help='how long to hand out mutants, in seconds (default 3600)')
+    parser.add_argument('--lease_time', type=float, default=120.0,
+                        help='seconds without a renewal before a worker is considered lost (default 120)')
+    parser.add_argument('--only_mutate', type=str, default="",
+                        help='string with comma delimited list of function patterns to mutate (match by inclusion)')
+    parser.add_argument('--avoid_mutating', type=str, default="",
+                        help='string with comma delimited list of function patterns NOT to mutate (match by simple inclusion)')
+    parser.add_argument('--only_mutate_file', metavar='filename', type=str, default=None,
+                        help='file with a list of functions (one per line) that are to be mutated')
+    parser.add_argument('--avoid_mutating_file', metavar='filename', type=str, default=None,
+                        help='file with a list of functions not to mutate')
+    parser.add_argument('--source_only_mutate', type=str, default="",
+                        help='string with comma delimited list of patterns to check for in source location')
+    parser.add_argument('--source_avoid_mutating', type=str, default="",
+                        help='string with comma delimited list of patterns to check (and avoid) in source location')
+    parser.add_argument('--unreach_cache_file', metavar='filename', type=str, default=None,
+                        help='file for unreachability cache, created if does not exist, otherwise read')
+    parser.add_argument('--no_unreach_cache', action='store_true',
+                        help='do not make use of the unreachability cache (sometimes useful for fuzzing)')
+    parser.add_argument('--order', type=int, default=1,
+                        help='mutation order (default 1)')
+    parser.add_argument('-s', '--score', action='store_true',
+                        help='compute a mutation score, instead of fuzzing')
+    parser.add_argument('--avoid_repeats', action='store_true',
+                        help='avoid using the same mutant multiple times, if possible')
+    parser.add_argument('--repeat_retries', type=int, default=200,
+                        help='number of times to retry to avoid a repeat mutant (default 200)')
+    parser.add_argument('--stop_on_repeat', action='store_true',
+                        help='Terminate analysis if a mutant has to be repeated')
+    parser.add_argument('--save_mutants', type=str, default=None,
+                        help='directory in which to save generated mutant metadata')
+    parser.add_argument('--save_results', type=str, default=None,
+                        help='filename in which to save comma delimited mutation analysis results')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='more verbose output')
+    parser.add_argument('--skip_default_avoid', action='store_true',
+                        help='do not use the default list of function to skip (e.g. printf)')
+    parser.add_argument('--mutate_standard_libraries', action='store_true',
+                        help='allow mutation of C++ standard library and boost functions')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed for random generation (default None)')
+
+    parsed_args = parser.parse_args(sys.argv[1:])
+    return (parsed_args, parser)
+
+
+def parse_worker_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('coordinator', type=str, default=None,
+                        help='host:port of the coordinator')
+    parser.add_argument('fuzzer_cmd', type=str, default=None,
+                        help='command to run fuzzer on executable')
+    parser.add_argument('executable', metavar='filename', type=str, default=None,
+                        help='executable to be fuzzed/mutated')
+    parser.add_argument('--time_per_mutant', type=int, default=300,
+                        help='max time to fuzz each mutant in seconds (default 300)')
+    parser.add_argument('--reachability_check_cmd', type=str, default=None,
+                        help='command to check reachability; should return non-zero if some inputs crash')
+    parser.add_argument('--reachability_check_timeout', type=float, default=2.0,
+                        help='timeout for mutant check')
+    parser.add_argument('--prune_mutant_cmd', type=str, default=None,
+                        help='command to check mutants for validity/interest')
+    parser.add_argument('--prune_mutant_timeout', type=float, default=2.0,
+                        help='timeout for mutant check')
+    parser.add_argument('--post_mutant_cmd', type=str, default=None,
+                        help='command to run after each mutant (e.g., fuzz of original)')
+    parser.add_argument('--post_mutant_timeout', type=float, default=2.0,
+                        help='timeout for post-mutant command')
+    parser.add_argument('--no_timeout_kills', action='store_true',
+                        help='Timeout during mutant analysis will not be conuted as a mutant kill')
+    parser.add_argument('--name', type=str, default=None,
+                        help='name of this worker (default host:pid)')
+    parser.add_argument('--workspace_dir', type=str, default=None,
+                        help='directory (e.g., on a tmpfs) in which to make the private workspace (default system temp dir)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='more verbose fuzzing, with command outputs')
+
+    parsed_args = parser.parse_args(sys.argv[1:])
+    return (parsed_args, parser)
+
+
+def coordinator_main():
+    parsed_args, _ = parse_coordinator_args()
+    config = make_config(parsed_args)
+    if config.seed is not None:
+        random.seed(config.seed)
+
+    only_mutate = list(filter(None, config.only_mutate.replace(", ", ",").split(",")))
+    avoid_mutating = list(filter(None, config.avoid_mutating.replace(", ", ",").split(",")))
+    if not config.skip_default_avoid:
+        avoid_mutating.extend(fuzzutil.DEFAULT_AVOID_MUTATING)
+    fuzzutil.extend_from_file(only_mutate, config.only_mutate_file)
+    fuzzutil.extend_from_file(avoid_mutating, config.avoid_mutating_file)
+    (jumps, function_map, function_reach) = targeting.get_jumps(config.executable, only_mutate, avoid_mutating,
+                                                                 list(filter(None, config.source_only_mutate.replace(", ", ",").split(","))),
+                                                                 list(filter(None, config.source_avoid_mutating.replace(", ", ",").split(","))),
+                                                                 config.mutate_standard_libraries)
+    print("FOUND", len(jumps), "MUTABLE JUMPS IN", len(function_map), "FUNCTIONS")
+    if config.save_mutants is not None and not os.path.exists(config.save_mutants):
+        os.mkdir(config.save_mutants)
+
+    coordinator = Coordinator(config.executable, config.budget, jumps, function_map, function_reach,
+                              lease_time=config.lease_time, order=config.order, score=config.score,
+                              avoid_repeats=config.avoid_repeats, repeat_retries=config.repeat_retries,
+                              stop_on_repeat=config.stop_on_repeat, unreach_cache_file=config.unreach_cache_file,
+                              no_unreach_cache=config.no_unreach_cache, save_mutants=config.save_mutants,
+                              verbose=config.verbose)
+    coordinator.run(config.host, config.port, config.port_file)
+    found = coordinator.knowledge
+    coverage = found.coverage if found.coverage.total > 0 else None
+    campaign_knowledge.final_report(function_map, found.unreach_cache, found.visited_mutants, coordinator.results.rows,
+                                    coverage.functions if coverage is not None else None,
+                                    found.coverage.total, found.coverage.hits,
+                                    found.score.functions if found.score is not None else None,
+                                    found.score.total if found.score is not None else 0,
+                                    found.score.hits if found.score is not None else 0,
+                                    config.save_results, config.verbose, coordinator.results.stats)
+
+
+def worker_main():
+    parsed_args, _ = parse_worker_args()
+    config = make_config(parsed_args)
+    sys.exit(work(parse_address(config.coordinator), config.fuzzer_cmd, config.executable, config.time_per_mutant,
+                  config.reachability_check_cmd, config.reachability_check_timeout,
+                  config.prune_mutant_cmd, config.prune_mutant_timeout,
+                  config.post_mutant_cmd, config.post_mutant_timeout,
+                  config.no_timeout_kills, config.name, verbose=config.verbose, workspace_dir=config.workspace_dir))
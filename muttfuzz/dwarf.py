@@ -0,0 +1,233 @@
+import os
+import struct
+
+from muttfuzz import elf
+
+# Line number program opcodes (DWARF 2-5)
+DW_LNS_copy = 1
+DW_LNS_advance_pc = 2
+DW_LNS_advance_line = 3
+DW_LNS_set_file = 4
+DW_LNS_const_add_pc = 8
+DW_LNS_fixed_advance_pc = 9
+DW_LNE_end_sequence = 1
+DW_LNE_set_address = 2
+
+# Directory and file entry formats (DWARF 5)
+DW_LNCT_path = 1
+DW_LNCT_directory_index = 2
+DW_FORM_block = 0x09
+DW_FORM_data1 = 0x0b
+DW_FORM_data2 = 0x05
+DW_FORM_data4 = 0x06
+DW_FORM_data8 = 0x07
+DW_FORM_data16 = 0x1e
+DW_FORM_string = 0x08
+DW_FORM_strp = 0x0e
+DW_FORM_line_strp = 0x1f
+DW_FORM_udata = 0x0f
+FIXED_FORMS = {DW_FORM_data1: 1, DW_FORM_data2: 2, DW_FORM_data4: 4, DW_FORM_data8: 8, DW_FORM_data16: 16}
+
+
+def uleb(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return (result, pos)
+
+
+def sleb(data, pos):
+    (result, new_pos) = uleb(data, pos)
+    bits = 7 * (new_pos - pos)
+    if result & (1 << (bits - 1)):
+        result -= 1 << bits
+    return (result, new_pos)
+
+
+def cstring(data, pos):
+    end = data.index(b"\0", pos)
+    return (data[pos:end].decode("utf-8", errors="replace"), end + 1)
+
+
+def section_string(data, sections, section, offset):
+    # A string in one of the string sections DWARF 5 entries point into
+    if section not in sections:
+        return None
+    return cstring(data, sections[section][1] + offset)[0]
+
+
+def read_form(data, pos, form, offset_size, sections):
+    # (value, new position); the value is None for forms that can't be resolved here (e.g., strx)
+    if form == DW_FORM_string:
+        return cstring(data, pos)
+    if form in [DW_FORM_strp, DW_FORM_line_strp]:
+        (offset,) = struct.unpack_from("<I" if offset_size == 4 else "<Q", data, pos)
+        return (section_string(data, sections, ".debug_str" if form == DW_FORM_strp else ".debug_line_str", offset),
+                pos + offset_size)
+    if form == DW_FORM_udata:
+        return uleb(data, pos)
+    if form == DW_FORM_block:
+        (size, pos) = uleb(data, pos)
+        return (None, pos + size)
+    if form in FIXED_FORMS:
+        size = FIXED_FORMS[form]
+        return (int.from_bytes(data[pos:pos + size], "little"), pos + size)
+    raise ValueError("unsupported DWARF form " + hex(form))
+
+
+def read_entries(data, pos, offset_size, sections):
+    # A DWARF 5 directory or file name table: [(path, directory index)]
+    count = data[pos]
+    pos += 1
+    formats = []
+    for _ in range(count):
+        (content, pos) = uleb(data, pos)
+        (form, pos) = uleb(data, pos)
+        formats.append((content, form))
+    (entries_count, pos) = uleb(data, pos)
+    entries = []
+    for _ in range(entries_count):
+        path = None
+        directory = 0
+        for (content, form) in formats:
+            (value, pos) = read_form(data, pos, form, offset_size, sections)
+            if content == DW_LNCT_path:
+                path = value
+            elif content == DW_LNCT_directory_index:
+                directory = value
+        entries.append((path, directory))
+    return (entries, pos)
+
+
+def join(directory, path):
+    # None when the full path can't be known (e.g., relative to a compilation directory only .debug_info has)
+    if path is None:
+        return None
+    if os.path.isabs(path):
+        return path
+    if (directory is None) or (not os.path.isabs(directory)):
+        return None
+    return os.path.join(directory, path)
+
+
+def read_unit(data, pos, sections):
+    """Read one line number program; returns (its [(start, stop, source path)] ranges, the end of the unit)."""
+    (unit_length,) = struct.unpack_from("<I", data, pos)
+    pos += 4
+    offset_size = 4
+    if unit_length == 0xffffffff:
+        (unit_length,) = struct.unpack_from("<Q", data, pos)
+        pos += 8
+        offset_size = 8
+    end = pos + unit_length
+    (version,) = struct.unpack_from("<H", data, pos)
+    pos += 2
+    if version >= 5:
+        pos += 2 # address and segment selector sizes
+    header_length = int.from_bytes(data[pos:pos + offset_size], "little")
+    pos += offset_size
+    program = pos + header_length
+    min_inst_length = data[pos]
+    pos += 2 if version >= 4 else 1 # maximum operations per instruction, only for VLIW
+    pos += 1 # default_is_stmt
+    line_range = data[pos + 1] # after line_base: only files are followed, not line numbers
+    opcode_base = data[pos + 2]
+    opcode_lengths = [0] + list(data[pos + 3:pos + 3 + opcode_base - 1])
+    pos += 3 + opcode_base - 1
+    if version >= 5:
+        (directories, pos) = read_entries(data, pos, offset_size, sections)
+        (file_entries, pos) = read_entries(data, pos, offset_size, sections)
+        dirs = [join(directories[0][0], d) if i > 0 else d for (i, (d, _)) in enumerate(directories)]
+        files = [join(dirs[d] if d < len(dirs) else None, f) for (f, d) in file_entries]
+    else:
+        dirs = [None] # the compilation directory
+        while data[pos] != 0:
+            (directory, pos) = cstring(data, pos)
+            dirs.append(directory if os.path.isabs(directory) else None)
+        pos += 1
+        files = [None] # numbered from 1
+        while data[pos] != 0:
+            (name, pos) = cstring(data, pos)
+            (d, pos) = uleb(data, pos)
+            (_, pos) = uleb(data, pos)
+            (_, pos) = uleb(data, pos)
+            files.append(join(dirs[d] if d < len(dirs) else None, name))
+
+    def path(file_index):
+        return files[file_index] if file_index < len(files) else None
+
+    ranges = []
+    pos = program
+    address = 0
+    file_index = 1
+    # Runs of rows from the same file, rather than every row
+    run_start = None
+    run_file = None
+    while pos < end:
+        opcode = data[pos]
+        pos += 1
+        row = False
+        if opcode >= opcode_base:
+            address += ((opcode - opcode_base) // line_range) * min_inst_length
+            row = True
+        elif opcode == 0:
+            (size, pos) = uleb(data, pos)
+            sub = data[pos]
+            if sub == DW_LNE_end_sequence:
+                if run_start is not None:
+                    ranges.append((run_start, address, path(run_file)))
+                address = 0
+                file_index = 1
+                run_start = None
+            elif sub == DW_LNE_set_address:
+                address = int.from_bytes(data[pos + 1:pos + size], "little")
+            pos += size
+        elif opcode == DW_LNS_copy:
+            row = True
+        elif opcode == DW_LNS_advance_pc:
+            (advance, pos) = uleb(data, pos)
+            address += advance * min_inst_length
+        elif opcode == DW_LNS_advance_line:
+            (_, pos) = sleb(data, pos)
+        elif opcode == DW_LNS_set_file:
+            (file_index, pos) = uleb(data, pos)
+        elif opcode == DW_LNS_const_add_pc:
+            address += ((255 - opcode_base) // line_range) * min_inst_length
+        elif opcode == DW_LNS_fixed_advance_pc:
+            (advance,) = struct.unpack_from("<H", data, pos)
+            address += advance
+            pos += 2
+        else:
+            for _ in range(opcode_lengths[opcode]):
+                (_, pos) = uleb(data, pos)
+        if row and (file_index != run_file or run_start is None):
+            if run_start is not None:
+                ranges.append((run_start, address, path(run_file)))
+            run_start = address
+            run_file = file_index
+    return (ranges, end)
+
+
+def unit_ranges(filename):
+    """
+    Return, for each .debug_line line table of a 64-bit little-endian ELF file, its (start,
+    stop, source path) address ranges (the path is None where it can't be known in full), or
+    None if the file has no line tables.
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    sections = elf.read_sections(data)
+    if ".debug_line" not in sections:
+        return None
+    (_, offset, size, _, _) = sections[".debug_line"]
+    units = []
+    pos = offset
+    while pos < offset + size:
+        (ranges, pos) = read_unit(data, pos, sections)
+        units.append(ranges)
+    return units
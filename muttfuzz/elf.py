@@ -0,0 +1,139 @@
+from array import array
+import struct
+
+PT_LOAD = 1
+PT_NOTE = 4
+PF_X = 1
+PF_R = 4
+SHT_SYMTAB = 2
+SHT_RELA = 4
+SHT_DYNSYM = 11
+STT_FUNC = 2
+R_X86_64_RELATIVE = 8
+
+
+def read_segments(filename):
+    """
+    Return the loadable segments of a 64-bit little-endian ELF file, as a list of
+    (vaddr, offset, filesz, memsz, flags) tuples.
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(64)
+        if (len(header) < 64) or (header[:4] != b"\x7fELF") or (header[4] != 2) or (header[5] != 1):
+            raise ValueError(filename + " is not a 64-bit little-endian ELF file")
+        (phoff,) = struct.unpack_from("<Q", header, 0x20)
+        (phentsize, phnum) = struct.unpack_from("<HH", header, 0x36)
+        f.seek(phoff)
+        phdrs = f.read(phentsize * phnum)
+    segments = []
+    for i in range(phnum):
+        (p_type, p_flags, p_offset, p_vaddr, _, p_filesz, p_memsz, _) = struct.unpack_from("<IIQQQQQQ", phdrs, i * phentsize)
+        if p_type == PT_LOAD:
+            segments.append((p_vaddr, p_offset, p_filesz, p_memsz, p_flags))
+    return segments
+
+
+def offset_to_vaddr(segments, offset):
+    for (vaddr, seg_offset, filesz, _, _) in segments:
+        if seg_offset <= offset < seg_offset + filesz:
+            return vaddr + (offset - seg_offset)
+    return None
+
+
+def vaddr_to_offset(segments, address):
+    for (vaddr, seg_offset, filesz, _, _) in segments:
+        if vaddr <= address < vaddr + filesz:
+            return seg_offset + (address - vaddr)
+    return None
+
+
+def load_base(segments):
+    return min(vaddr for (vaddr, _, _, _, _) in segments)
+
+
+def read_sections(data):
+    """Return {section name: (sh_type, file offset, size, link, entsize)} for the ELF file held in data."""
+    (shoff,) = struct.unpack_from("<Q", data, 0x28)
+    (shentsize, shnum, shstrndx) = struct.unpack_from("<HHH", data, 0x3A)
+    headers = [struct.unpack_from("<IIQQQQIIQQ", data, shoff + (i * shentsize)) for i in range(shnum)]
+    if shstrndx >= len(headers):
+        return {}
+    names_offset = headers[shstrndx][4]
+    sections = {}
+    for (sh_name, sh_type, _, _, offset, size, link, _, _, entsize) in headers:
+        name = data[names_offset + sh_name:data.index(b"\0", names_offset + sh_name)].decode("utf-8", errors="replace")
+        sections[name] = (sh_type, offset, size, link, entsize)
+    return sections
+
+
+def function_symbols(filename, data=None):
+    """
+    Return (symbol name, address, size) for every sized function symbol defined in the .symtab
+    (or, for a stripped file, the .dynsym) of a 64-bit little-endian ELF file, aliases included.
+    """
+    if data is None:
+        with open(filename, 'rb') as f:
+            data = f.read()
+    (shoff,) = struct.unpack_from("<Q", data, 0x28)
+    (shentsize, shnum) = struct.unpack_from("<HH", data, 0x3A)
+    sections = [struct.unpack_from("<IIQQQQIIQQ", data, shoff + (i * shentsize)) for i in range(shnum)]
+    symtabs = [s for s in sections if s[1] == SHT_SYMTAB] or [s for s in sections if s[1] == SHT_DYNSYM]
+    symbols = []
+    for (_, _, _, _, offset, size, link, _, _, entsize) in symtabs:
+        strtab_offset = sections[link][4]
+        for pos in range(offset, offset + size, entsize):
+            (st_name, st_info, _, st_shndx, st_value, st_size) = struct.unpack_from("<IBBHQQ", data, pos)
+            if ((st_info & 0xF) != STT_FUNC) or (st_size == 0) or (st_shndx == 0):
+                continue
+            name = data[strtab_offset + st_name:data.index(b"\0", strtab_offset + st_name)].decode("utf-8", errors="replace")
+            symbols.append((name, st_value, st_size))
+    return symbols
+
+
+def read_functions(filename):
+    """
+    Return {symbol name: (file offset, size)} for the sized function symbols in the .symtab
+    (or, for a stripped file, the .dynsym) of a 64-bit little-endian ELF file.
+    """
+    segments = read_segments(filename)
+    functions = {}
+    for (name, address, size) in function_symbols(filename):
+        file_offset = vaddr_to_offset(segments, address)
+        if (file_offset is not None) and (name not in functions):
+            functions[name] = (file_offset, size)
+    return functions
+
+
+def read_data_pointers(filename):
+    """
+    Return the set of values in the data of a 64-bit little-endian ELF file that could be
+    pointers to its code: aligned 8-byte words in non-executable segments, and the addends of
+    relative relocations (which is where a position-independent executable's pointers are).
+    """
+    segments = read_segments(filename)
+    with open(filename, 'rb') as f:
+        data = f.read()
+    code = [(vaddr, vaddr + memsz) for (vaddr, _, _, memsz, flags) in segments if flags & PF_X]
+
+    def in_code(value):
+        return any(start <= value < stop for (start, stop) in code)
+
+    pointers = set()
+    for (vaddr, offset, filesz, _, flags) in segments:
+        if flags & PF_X:
+            continue
+        start = offset + ((-vaddr) % 8)
+        words = array('Q')
+        words.frombytes(data[start:start + (((offset + filesz) - start) // 8) * 8])
+        pointers.update(value for value in set(words) if in_code(value))
+    (shoff,) = struct.unpack_from("<Q", data, 0x28)
+    (shentsize, shnum) = struct.unpack_from("<HH", data, 0x3A)
+    for i in range(shnum):
+        (_, sh_type, _, _, offset, size, _, _, _, entsize) = struct.unpack_from("<IIQQQQIIQQ", data, shoff + (i * shentsize))
+        if (sh_type != SHT_RELA) or (entsize == 0):
+            continue
+        for pos in range(offset, offset + size, entsize):
+            (_, info, addend) = struct.unpack_from("<QQq", data, pos)
+            if ((info & 0xFFFFFFFF) == R_X86_64_RELATIVE) and in_code(addend):
+                pointers.add(addend)
+    return pointers
@@ -3,7 +3,12 @@ from collections import namedtuple
 import random
 import sys
 
+from muttfuzz import calibrate
+from muttfuzz import callgraph
+from muttfuzz import corpus_sync
 from muttfuzz import fuzzutil
+from muttfuzz import limits as resource_limits
+from muttfuzz import replay
 
 
 def parse_args():
@@ -74,16 +79,110 @@ def parse_args():
                         help='directory in which to save generated mutants/checks; no saving if not provided or empty')
     parser.add_argument('--save_executables', action='store_true',
                         help='Save full executables, not just metadata')
+    parser.add_argument('--save_deltas', action='store_true',
+                        help='save executables as patches against one stored copy of the original (restore with muttfuzz_export)')
     parser.add_argument('--use_saved_mutants', type=str, default=None,
                         help='instead of generating mutants, apply mutants in metadata format in given directory')
     parser.add_argument('--save_results', type=str, default=None,
-                        help='filename in which to save comma delimited mutation analysis results')
+                        help='file to append each mutant\'s result to as it is known (CSV, or JSON lines for a .jsonl name)')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='more verbose fuzzing, with command outputs')
     parser.add_argument('--skip_default_avoid', action='store_true',
                         help='do not use the default list of function to skip (e.g. printf)')
     parser.add_argument('--mutate_standard_libraries', action='store_true',
                         help='allow mutation of C++ standard library and boost functions')
+    parser.add_argument('--parallel', type=int, default=1,
+                        help='number of fuzzer instances to run at once, each on its own mutant (default 1); '
+                        'the fuzzer command must use {executable} and {output} (and may use {instance} and {cpu})')
+    parser.add_argument('--parallel_dir', type=str, default="muttfuzz_parallel",
+                        help='directory holding the staged executable and output of each parallel instance')
+    parser.add_argument('--pin_cpus', action='store_true',
+                        help='pin each parallel fuzzer instance to its own CPU')
+    parser.add_argument('--checkpoint', metavar='filename', type=str, default=None,
+                        help='file in which to periodically save the full campaign state')
+    parser.add_argument('--checkpoint_interval', type=float, default=300.0,
+                        help='minimum seconds between checkpoints (default 300)')
+    parser.add_argument('--resume', action='store_true',
+                        help='resume the campaign saved in --checkpoint, with its remaining budget')
+    parser.add_argument('--coverage_file', type=str, action='append', default=None,
+                        help='lcov .info, llvm-cov/gcov JSON, .gcov, or SanitizerCoverage PC file to seed reachability (repeatable)')
+    parser.add_argument('--sancov_pcs', type=str, default=None,
+                        help='all instrumented PCs (as hex PCs or .sancov), so uncovered functions count as unreachable')
+    parser.add_argument('--workspace_dir', type=str, default=None,
+                        help='directory (e.g., /dev/shm) in which to make the private campaign workspace (default system temp dir)')
+    parser.add_argument('--keep_workspace', action='store_true',
+                        help='keep the campaign workspace (staged mutants and command logs) after exit')
+    parser.add_argument('--bias_profile_cmd', type=str, default=None,
+                        help='command that runs the corpus, traced to find jumps that always go the same way, which are mutated more often')
+    parser.add_argument('--bias_profile_file', type=str, default=None,
+                        help='file caching the branch bias profile (reprofiled if the executable changes)')
+    parser.add_argument('--bias_profile_timeout', type=float, default=600.0,
+                        help='timeout for branch bias profiling (default 600)')
+    parser.add_argument('--bias_weight', type=float, default=4.0,
+                        help='extra selection weight of a jump that always goes one way, vs. a balanced one (default 4.0)')
+    parser.add_argument('--analysis_cache', type=str, default=None,
+                        help='file keeping analysis and results by function, reused for unchanged functions after a rebuild')
+    parser.add_argument('--triage_cmd', type=str, default=None,
+                        help='command running the original executable on one crashing input, {input}, to replay crashes from mutants')
+    parser.add_argument('--triage_crashes', type=str, action='append', default=None,
+                        help='glob for crashing inputs the fuzzer writes, e.g. "out/crashes*/id*" or "{output}/crash-*" (repeatable)')
+    parser.add_argument('--triage_dir', type=str, default="muttfuzz_triage",
+                        help='directory for collected crashing inputs, crash buckets, and triage.json (default muttfuzz_triage)')
+    parser.add_argument('--triage_timeout', type=float, default=10.0,
+                        help='timeout for replaying one crashing input (default 10)')
+    parser.add_argument('--triage_jobs', type=int, default=None,
+                        help='number of crashing inputs to replay at once (default number of CPUs)')
+    parser.add_argument('--triage_at_end', action='store_true',
+                        help='replay crashing inputs once, after all mutants, rather than after each mutant')
+    parser.add_argument('--kill_matrix', type=str, default=None,
+                        help='corpus directory; run the command (which must use {input}) on every input against every mutant')
+    parser.add_argument('--kill_matrix_file', type=str, default="kill_matrix.json",
+                        help='file for the mutant-by-input kill matrix (default kill_matrix.json)')
+    parser.add_argument('--kill_matrix_timeout', type=float, default=10.0,
+                        help='timeout for running one input against one mutant (default 10)')
+    parser.add_argument('--kill_matrix_jobs', type=int, default=None,
+                        help='number of inputs to run at once (default number of CPUs)')
+    parser.add_argument('--kill_matrix_early_stop', action='store_true',
+                        help='stop running inputs against a mutant once one kills it')
+    parser.add_argument('--meta_mutant', action='store_true',
+                        help='install one meta-mutant executable and select each mutant with MUTTFUZZ_MUTANT, not a new file')
+    parser.add_argument('--prevalidate', type=int, default=0,
+                        help='number of mutants to generate and check ahead, in the background (checks must use {executable})')
+    parser.add_argument('--static_reachability', action='store_true',
+                        help='never mutate functions the static call graph shows are unreachable from the entry symbols')
+    parser.add_argument('--entry_symbols', type=str, default=",".join(callgraph.DEFAULT_ENTRIES),
+                        help='comma delimited functions the call graph starts from (default main and libFuzzer entry points)')
+    parser.add_argument('--conservative_indirect_calls', action='store_true',
+                        help='assume indirect calls can reach every function whose address is taken, in code or data')
+    parser.add_argument('--no_dominator_propagation', action='store_true',
+                        help='do not extend each reachability verdict to the jumps that dominate (or are dominated by) it')
+    parser.add_argument('--memory_limit', type=str, default=None,
+                        help='memory limit for every command run, e.g. 2G (a cgroup v2 limit if possible, else RLIMIT_AS)')
+    parser.add_argument('--cpu_limit', type=int, default=None,
+                        help='CPU time limit, in seconds, for each process of every command run')
+    parser.add_argument('--pids_limit', type=int, default=None,
+                        help='limit on processes/threads for every command run (a cgroup v2 limit if possible, else RLIMIT_NPROC)')
+    parser.add_argument('--file_size_limit', type=str, default=None,
+                        help='largest file every command run may write, e.g. 100M')
+    parser.add_argument('--calibrate_timeouts', action='store_true',
+                        help='set reachability/prune timeouts from how long the checks take on the original executable')
+    parser.add_argument('--timeout_multiplier', type=float, default=calibrate.DEFAULT_MULTIPLIER,
+                        help='calibrated timeouts are this multiple of the median check time (default 5)')
+    parser.add_argument('--calibration_runs', type=int, default=calibrate.DEFAULT_RUNS,
+                        help='times to run each check on the original when calibrating (default 3)')
+    parser.add_argument('--recalibrate_every', type=int, default=50,
+                        help='calibrate again after this many mutants, as the corpus grows (default 50, 0 for never)')
+    parser.add_argument('--sync_corpus', type=str, default=None,
+                        help='fuzzer output directory into whose corpus new crashes are hardlinked after each mutant')
+    parser.add_argument('--sync_layout', type=str, default="auto", choices=corpus_sync.LAYOUTS,
+                        help='layout of fuzzer output directories: afl, libfuzzer, or auto (afl if there is a queue)')
+    parser.add_argument('--sync_artifacts', type=str, default=None,
+                        help='directory where libFuzzer writes crash artifacts (default the corpus; may use {output})')
+    parser.add_argument('--replay_order', type=str, default=None, choices=replay.ORDERS,
+                        help='order of mutants from --use_saved_mutants: grouped by function, or random '
+                        '(default grouped, or random with --score)')
+    parser.add_argument('--status_endpoint', type=str, default=None,
+                        help='serve live campaign status as JSON over HTTP on [HOST:]PORT, or unix:PATH for a Unix socket')
     parser.add_argument('--seed', type=int, default=None,
                         help='seed for random generation (default None)')
 
@@ -104,6 +203,11 @@ def make_config(pargs):
     nt_config = Config(*arg_list)
     return nt_config
 
+def make_limits(config):
+    limits = resource_limits.Limits(resource_limits.parse_size(config.memory_limit), config.cpu_limit, config.pids_limit,
+                                    resource_limits.parse_size(config.file_size_limit))
+    return limits if any(limit is not None for limit in limits) else None
+
 def main():
     parsed_args, _ = parse_args()
     config = make_config(parsed_args)
@@ -146,7 +250,49 @@ def main():
                                config.save_results,
                                config.verbose,
                                config.skip_default_avoid,
-                               config.mutate_standard_libraries)
+                               config.mutate_standard_libraries,
+                               config.parallel,
+                               config.parallel_dir,
+                               config.pin_cpus,
+                               config.checkpoint,
+                               config.checkpoint_interval,
+                               config.resume,
+                               config.coverage_file,
+                               config.sancov_pcs,
+                               config.workspace_dir,
+                               config.keep_workspace,
+                               config.bias_profile_cmd,
+                               config.bias_profile_file,
+                               config.bias_profile_timeout,
+                               config.bias_weight,
+                               config.analysis_cache,
+                               config.triage_cmd,
+                               config.triage_crashes,
+                               config.triage_dir,
+                               config.triage_timeout,
+                               config.triage_jobs,
+                               config.triage_at_end,
+                               config.kill_matrix,
+                               config.kill_matrix_file,
+                               config.kill_matrix_timeout,
+                               config.kill_matrix_jobs,
+                               config.kill_matrix_early_stop,
+                               config.meta_mutant,
+                               config.prevalidate,
+                               config.entry_symbols.split(",") if config.static_reachability else None,
+                               config.conservative_indirect_calls,
+                               config.no_dominator_propagation,
+                               config.save_deltas,
+                               make_limits(config),
+                               config.calibrate_timeouts,
+                               config.timeout_multiplier,
+                               config.calibration_runs,
+                               config.recalibrate_every,
+                               config.sync_corpus,
+                               config.sync_layout,
+                               config.sync_artifacts,
+                               config.replay_order,
+                               config.status_endpoint)
 
 
 
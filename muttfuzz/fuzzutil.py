@@ -1,94 +1,68 @@
+from collections import namedtuple
 from datetime import datetime
 import glob
+import inspect
 import os
+import queue
 import random
-import signal
+import shutil
 import subprocess
 import sys
+import threading
 import time
-from contextlib import contextmanager
 
+from muttfuzz import branch_bias
+from muttfuzz import calibrate as check_calibration
+from muttfuzz import callgraph
+from muttfuzz import cfg
+from muttfuzz import checkpoint as campaign_checkpoint
+from muttfuzz import checks as mutant_checks
+from muttfuzz import commands
+from muttfuzz import corpus_sync
+from muttfuzz import coverage
+from muttfuzz import delta_store
+from muttfuzz import elf
+from muttfuzz import incremental
+from muttfuzz import knowledge as campaign_knowledge
+from muttfuzz import kill_matrix as mutant_matrix
+from muttfuzz import meta_mutant as meta_executable
 from muttfuzz import mutate
+from muttfuzz import prevalidate as prevalidation
+from muttfuzz import replay as replay_planner
+from muttfuzz import results as mutant_results
+from muttfuzz import status as campaign_status
+from muttfuzz import targeting
+from muttfuzz import triage as crash_triage
+from muttfuzz import parallel as parallel_fuzzing
+from muttfuzz import workspace as campaign_workspace
+
+
+# Functions never worth mutating: fuzzer, sanitizer, and libc/runtime support code
+DEFAULT_AVOID_MUTATING = ["Fuzz", "fuzz",
+                          "asan", "Asan", "ubsan", "Ubsan", "sanitizer",
+                          "interceptor", "Interceptor", "interception", "Interception",
+                          "StrstrCheck", "PosixSpawnImpl", "unpoison", "ClearShadowMemoryForContextStack", "wrapped_",
+                          "CharCmpX", "CharCaseCmp", "write_iovec", "read_iovec", "real_clock_gettime", "write_hostent",
+                          "write_msghdr", "read_msghdr", "FixRealStrtolEndptr", "StrtolFixAndCheck", "read_pollfd",
+                          "write_pollfd", "write_mntent", "real_pthread_attr_getstack", "initialize_obstack",
+                          "MlockIsUnsupported", "WrappedCookie", "RealStrLen", "WrappedFunopen", "PoisonAlignedStackMemory",
+                          "PoisonMemory", "PoisonShadow", "FindBadAddress", "FixUnalignedStorage", "ShadowSegment",
+                          "isDerivedFromAtOffset", "findBaseAtOffset",
+                          "assert", "Assert",
+                          "printf", "scanf", "memcpy", "memset", "memcmp",
+                          "strncpy", "strcpy", "strnstr", "strstr", "strncmp", "strcmp",
+                          "operator new", "operator delete", "register_tm_clones", "_init", "_cxx_global",
+                          "_gnu_cxx", "dtors"]
+
+
+def extend_from_file(patterns, filename):
+    # Pattern files have one function or source pattern per line
+    if filename is not None:
+        with open(filename, 'r') as f:
+            for pattern in f:
+                patterns.append(pattern[:-1])
 
 
-class TimeoutException(Exception):
-    """"Exception thrown when timeouts occur"""
-
-
-@contextmanager
-def time_limit(seconds):
-    """Method to define a time limit before throwing exception"""
-
-    def signal_handler(signum, frame):
-        raise TimeoutException("Timed out!")
-
-    signal.signal(signal.SIGALRM, signal_handler)
-    signal.alarm(seconds)
-    try:
-        yield
-    finally:
-        signal.alarm(0)
-
-
-def restore_executable(executable, executable_code):
-    # We do this because it could still be busy if fuzzer hasn't shut down yet
-    with open("/tmp/restore_executable", 'wb') as f:
-        f.write(executable_code)
-    os.rename("/tmp/restore_executable", executable)
-    subprocess.check_call(['chmod', '+x', executable])
-
-
-def silent_run_with_timeout(cmd, timeout, verbose, zero_timeout=False):
-    # Allow functions instead of commands, for use as a library from a script
-    if verbose:
-        print("*" * 30)
-    if callable(cmd):
-        try:
-            if verbose:
-                print("CALLING FUNCTION", cmd)
-            with time_limit(timeout):
-                return cmd()
-        except TimeoutException:
-            print("ABORTED WITH TIMEOUT")
-            if zero_timeout:
-                return 0
-            return 1 # non-zero return code may be interpreted as failure/crash/timeout
-    dnull = open(os.devnull, 'w')
-    if verbose:
-        print("EXECUTING", cmd)
-    start_P = time.time()
-    timed_out = False
-    try:
-        with open("cmd_errors.txt", 'w') as cmd_errors:
-            P = subprocess.Popen(cmd, shell=True, preexec_fn=os.setsid,
-                                 stdout=dnull, stderr=cmd_errors)
-            while (P.poll() is None) and ((time.time() - start_P) < timeout):
-                time.sleep(min(0.5, timeout / 10.0)) # Allow for small timeouts
-            if P.poll() is None:
-                print("KILLING SUBPROCESS DUE TO TIMEOUT")
-                os.killpg(os.getpgid(P.pid), signal.SIGTERM)
-                timed_out = True
-        with open("cmd_errors.txt", 'r') as cmd_errors:
-            try:
-                cmd_errors_out = cmd_errors.read()
-            except: #pylint: disable=W0702
-                cmd_errors_out = "ERROR READING OUTPUT"
-        if verbose and len(cmd_errors_out) > 0:
-            print("OUTPUT (TRUNCATED TO LAST 20 LINES):")
-            print("\n".join(cmd_errors_out.split("\n")[-20:]))
-    finally:
-        if P.poll() is None:
-            print("KILLING SUBPROCESS DUE TO TIMEOUT")
-            os.killpg(os.getpgid(P.pid), signal.SIGTERM)
-            timed_out = True
-    if verbose:
-        if not timed_out:
-            print("COMPLETED IN", round(time.time() - start_P, 2), "SECONDS")
-        print("*" * 30)
-    if timed_out and zero_timeout:
-        return 0
-    return P.returncode
-
 def apply_mutant(base_executable, new_executable, metadata_file):
     executable_code = mutate.get_code(base_executable)
     (executable_jumps, _, function_reach) = mutate.get_jumps(base_executable)
@@ -96,388 +70,818 @@ def apply_mutant(base_executable, new_executable, metadata_file):
         metadata = f.read()
     mutate.apply_mutant_metadata(executable_code, executable_jumps, function_reach, metadata, new_executable)
 
-# all _cmd arguments can also be Python functions
-def fuzz_with_mutants(fuzzer_cmd, executable, budget, time_per_mutant, fraction_mutant,
-                      only_mutate=None,
-                      avoid_mutating=None,
-                      only_mutate_file=None,
-                      avoid_mutating_file=None,
-                      source_only_mutate=None,
-                      source_avoid_mutating=None,
-                      source_only_mutate_file=None,
-                      source_avoid_mutating_file=None,
-                      reachability_check_cmd=None,
-                      reachability_check_timeout=2.0,
-                      unreach_cache_file=None,
-                      no_unreach_cache=False,
-                      prune_mutant_cmd=None,
-                      prune_mutant_timeout=2.0,
-                      initial_fuzz_cmd=None,
-                      initial_budget=60,
-                      post_initial_cmd=None,
-                      post_mutant_cmd=None,
-                      post_mutant_timeout=2.0,
-                      status_cmd=None,
-                      order=1,
-                      score=False,
-                      avoid_repeats=False,
-                      repeat_retries=200,
-                      stop_on_repeat=False,
-                      no_timeout_kills=False,
-                      save_mutants=None,
-                      save_executables=False,
-                      use_saved_mutants=None,
-                      save_results=None,
-                      verbose=False,
-                      skip_default_avoid=False,
-                      mutate_standard_libraries=False):
-    if only_mutate is None:
-        only_mutate = []
-    if avoid_mutating is None:
-        avoid_mutating = []
-    if source_only_mutate is None:
-        source_only_mutate = []
-    if source_avoid_mutating is None:
-        source_avoid_mutating = []
-
-    print("*" * 80)
-    print("STARTING MUTTFUZZ WITH BUDGET", budget, "SECONDS")
+def run_parallel_batch(batch, fuzzer_cmd, time_per_mutant, results, executable, executable_code,
+                       post_mutant_cmd, post_mutant_timeout, status_cmd, verbose):
     print()
-    executable_code = mutate.get_code(executable)
-
-    if initial_fuzz_cmd is None:
-        initial_budget = 0
-
-    if not skip_default_avoid:
-        avoid_mutating.extend(["Fuzz", "fuzz",
-                               "asan", "Asan", "ubsan", "Ubsan", "sanitizer",
-                               "interceptor", "Interceptor", "interception", "Interception",
-                               "StrstrCheck", "PosixSpawnImpl", "unpoison", "ClearShadowMemoryForContextStack", "wrapped_",
-                               "CharCmpX", "CharCaseCmp", "write_iovec", "read_iovec", "real_clock_gettime", "write_hostent",
-                               "write_msghdr", "read_msghdr", "FixRealStrtolEndptr", "StrtolFixAndCheck", "read_pollfd",
-                               "write_pollfd", "write_mntent", "real_pthread_attr_getstack", "initialize_obstack",
-                               "MlockIsUnsupported", "WrappedCookie", "RealStrLen", "WrappedFunopen", "PoisonAlignedStackMemory",
-                               "PoisonMemory", "PoisonShadow", "FindBadAddress", "FixUnalignedStorage", "ShadowSegment",
-                               "isDerivedFromAtOffset", "findBaseAtOffset",
-                               "assert", "Assert",
-                               "printf", "scanf", "memcpy", "memset", "memcmp",
-                               "strncpy", "strcpy", "strnstr", "strstr", "strncmp", "strcmp",
-                               "operator new", "operator delete", "register_tm_clones", "_init", "_cxx_global",
-                               "_gnu_cxx", "dtors"])
-    start_analyze = time.time()
-
-    if only_mutate_file is not None:
-        with open(only_mutate_file, 'r') as f:
-            for function in f:
-                only_mutate.append(function[:-1])
-    if avoid_mutating_file is not None:
-        with open(avoid_mutating_file, 'r') as f:
-            for function in f:
-                avoid_mutating.append(function[:-1])
-
-    if source_only_mutate_file is not None:
-        with open(source_only_mutate_file, 'r') as f:
-            for source in f:
-                source_only_mutate.append(source[:-1])
-    if source_avoid_mutating_file is not None:
-        with open(source_avoid_mutating_file, 'r') as f:
-            for source in f:
-                source_avoid_mutating.append(source[:-1])
-
-    if use_saved_mutants is not None:
-        metadatas = []
-        for metadata_file in glob.glob(use_saved_mutants + "/*.metadata"):
-            with open(metadata_file, "r") as f:
-                metadatas.append(f.read())
-        if len(metadatas) < 1:
-            print("NO METADATA FILES FOUND!")
-            sys.exit(1)
-        random.shuffle(metadatas) # for avoid_repeats, just round robin
-
-    visited_mutants = {}
-    unreach_cache = {}
-    reach_cache = {} # Can only use effectively for order 1 mutants
-
-    if score:
-        if not avoid_repeats:
-            print("WARNING: SCORE ESTIMATION WITHOUT --avoid_repeats WILL REPEAT SAMPLES")
-        mutants_run = 0.0
-        mutants_killed = 0.0
-        fraction_mutant = 1.0 # No final fuzz for mutation score estimation!
-        function_score = {}
-
-    print("READ EXECUTABLE WITH", len(executable_code), "BYTES")
+    print("FUZZING", len(batch), "MUTANTS AT ONCE...")
     sys.stdout.flush()
-    (executable_jumps, function_map, function_reach) = mutate.get_jumps(executable, only_mutate, avoid_mutating,
-                                                                        source_only_mutate, source_avoid_mutating,
-                                                                        mutate_standard_libraries)
-    print("FOUND", len(executable_jumps), "MUTABLE JUMPS IN", len(function_map), "FUNCTIONS")
-    print("JUMPS BY FUNCTION:")
-    if reachability_check_cmd is not None:
-        function_coverage = {}
-    for function, function_jumps in function_map.items():
-        print(function, len(function_jumps))
-        if reachability_check_cmd is not None:
-            function_coverage[function] = (0.0, 0.0)
-        if score:
-            function_score[function] = (0.0, 0.0)
-    print()
-
-    if unreach_cache_file is not None:
-        if os.path.exists(unreach_cache_file):
-            print("READING UNREACHABLE FUNCTION CACHE")
-            with open(unreach_cache_file, 'r') as f:
-                for line in f:
-                    unreach_cache[line.split("\n")[0]] = True
-            print("READ", len(unreach_cache), "UNREACHABLE FUNCTIONS")
+    outcomes = parallel_fuzzing.run_instances(batch, fuzzer_cmd, time_per_mutant, verbose, commands.LIMITER)
+    for (instance, (r, run_time, killed_by)) in zip(batch, outcomes):
+        print("INSTANCE", instance.number, "FINISHED IN", run_time, "SECONDS WITH RETURN CODE", r,
+              ("(KILLED BY " + killed_by.upper().replace("_", " ") + " LIMIT)") if killed_by is not None else "")
+        results.add(instance.mutant_name, run_time, r)
+        results.write(instance.mutant_name, run_time, r, killed_by=killed_by)
+    print("RUNNING MEAN TIME FOR MUTANT EVALUATION:", round(results.stats.mean, 2), "SECONDS")
+    print("SYNCED", parallel_fuzzing.sync_instances(batch), "CORPUS ENTRIES BETWEEN INSTANCES")
+
+    if post_mutant_cmd is not None:
+        print("RUNNING POST-MUTANT COMMAND")
+        commands.silent_run_with_timeout(post_mutant_cmd, post_mutant_timeout, verbose)
+    if status_cmd is not None:
+        commands.restore_executable(executable, executable_code) # Might need for status
+        print("STATUS:")
+        subprocess.call(status_cmd, shell=True)
+
+
+def remove_saved(save_mutants, mutant_no):
+    subprocess.call("rm " + save_mutants + "/*_" + str(mutant_no) + ".*", shell=True)
+
+
+def rename_saved(save_mutants, mutant_no, status, executables=False, deltas=False):
+    # Saved executables are either whole, or patches in a delta store
+    suffixes = [".metadata"]
+    if deltas:
+        suffixes.append(delta_store.SUFFIX)
+    elif executables:
+        suffixes.append(".exe")
+    for suffix in suffixes:
+        os.rename(save_mutants + "/mutant_" + str(mutant_no) + suffix, save_mutants + "/" + status + "_" + str(mutant_no) + suffix)
+
+
+def discard_staged(mutant, save_mutants):
+    # A staged mutant that will never run
+    if save_mutants is not None:
+        remove_saved(save_mutants, mutant.number)
+    shutil.rmtree(mutant.staged, ignore_errors=True)
+
+
+# staged is the directory of a mutant checked in the background (None otherwise); times holds how long its checks took
+Mutant = namedtuple("Mutant", ["number", "functions", "locs", "metadata", "name", "valid", "staged", "times"])
+
+# What analyze() finds out about the executable, once; meta is a meta_mutant.Installer, with --meta_mutant
+Analysis = namedtuple("Analysis", ["code", "jumps", "function_map", "function_reach", "control_flow", "cum_weights", "meta",
+                                   "incremental", "delta_store"])
+
+# Where a campaign writes mutants, probes and command output, in its workspace
+Files = namedtuple("Files", ["new", "reach", "func_reach", "log", "validate_log"])
+
+# The parts of a campaign with their own state; triage, matrix, corpus_sync and instances are None unless asked for
+Helpers = namedtuple("Helpers", ["workspace", "files", "triage", "matrix", "corpus_sync", "calibration", "tracker", "checks",
+                                 "instances", "lock"])
+
+
+class Progress:
+    """How far a campaign has got: its phase, the mutants made, the saved mutants replayed, and the batch staged."""
+
+    def __init__(self):
+        self.phase = "initial"
+        self.mutant_no = 0
+        self.start = None
+        self.replay_plan = None
+        self.replay_dropped = 0
+        self.batch = []
+        self.checkpointer = None
+
+    def elapsed(self):
+        return time.time() - self.start if self.start is not None else 0.0
+
+    def state(self):
+        return {"elapsed": self.elapsed(),
+                "phase": self.phase,
+                "mutant_no": self.mutant_no,
+                "replay_plan": self.replay_plan}
+
+    def restore(self, resumed):
+        self.start = time.time() - resumed["elapsed"]
+        self.phase = resumed["phase"]
+        self.mutant_no = resumed["mutant_no"]
+        if self.replay_plan is not None:
+            self.replay_plan = resumed.get("replay_plan", self.replay_plan) # not in checkpoints from before planning
+            self.replay_dropped = self.replay_plan.dropped
+
+
+class Campaign:
+    """
+    A mutant fuzzing campaign.  run() carries out the whole campaign, as fuzz_with_mutants does;
+    scripts can instead drive it step by step with analyze(), next_mutant(), check_reachability(),
+    prune() and evaluate(), reusing one analysis of the executable and its caches throughout.
+    All _cmd arguments can also be Python functions, which run in a pool of worker processes.
+    """
+
+    # Every argument reaches self.config through locals()
+    #pylint: disable=W0613
+    def __init__(self, fuzzer_cmd, executable, budget, time_per_mutant, fraction_mutant,
+                 only_mutate=None,
+                 avoid_mutating=None,
+                 only_mutate_file=None,
+                 avoid_mutating_file=None,
+                 source_only_mutate=None,
+                 source_avoid_mutating=None,
+                 source_only_mutate_file=None,
+                 source_avoid_mutating_file=None,
+                 reachability_check_cmd=None,
+                 reachability_check_timeout=2.0,
+                 unreach_cache_file=None,
+                 no_unreach_cache=False,
+                 prune_mutant_cmd=None,
+                 prune_mutant_timeout=2.0,
+                 initial_fuzz_cmd=None,
+                 initial_budget=60,
+                 post_initial_cmd=None,
+                 post_mutant_cmd=None,
+                 post_mutant_timeout=2.0,
+                 status_cmd=None,
+                 order=1,
+                 score=False,
+                 avoid_repeats=False,
+                 repeat_retries=200,
+                 stop_on_repeat=False,
+                 no_timeout_kills=False,
+                 save_mutants=None,
+                 save_executables=False,
+                 use_saved_mutants=None,
+                 save_results=None,
+                 verbose=False,
+                 skip_default_avoid=False,
+                 mutate_standard_libraries=False,
+                 parallel=1,
+                 parallel_dir="muttfuzz_parallel",
+                 pin_cpus=False,
+                 checkpoint=None,
+                 checkpoint_interval=300.0,
+                 resume=False,
+                 coverage_files=None,
+                 sancov_pcs=None,
+                 workspace_dir=None,
+                 keep_workspace=False,
+                 bias_profile_cmd=None,
+                 bias_profile_file=None,
+                 bias_profile_timeout=600.0,
+                 bias_weight=4.0,
+                 analysis_cache=None,
+                 triage_cmd=None,
+                 triage_crashes=None,
+                 triage_dir="muttfuzz_triage",
+                 triage_timeout=10.0,
+                 triage_jobs=None,
+                 triage_at_end=False,
+                 kill_matrix=None,
+                 kill_matrix_file="kill_matrix.json",
+                 kill_matrix_timeout=10.0,
+                 kill_matrix_jobs=None,
+                 kill_matrix_early_stop=False,
+                 meta_mutant=False,
+                 prevalidate=0,
+                 static_reachability=None,
+                 conservative_indirect_calls=False,
+                 no_dominator_propagation=False,
+                 save_deltas=False,
+                 limits=None,
+                 calibrate_timeouts=False,
+                 timeout_multiplier=check_calibration.DEFAULT_MULTIPLIER,
+                 calibration_runs=check_calibration.DEFAULT_RUNS,
+                 recalibrate_every=50,
+                 sync_corpus=None,
+                 sync_layout="auto",
+                 sync_artifacts=None,
+                 replay_order=None,
+                 status_endpoint=None):
+        options = dict(locals())
+        del options["self"]
+        if kill_matrix is not None:
+            score = True # a kill matrix is a finer-grained mutation score
+        options.update(score=score,
+                       fraction_mutant=1.0 if score else fraction_mutant, # No final fuzz for mutation score estimation!
+                       initial_budget=initial_budget if initial_fuzz_cmd is not None else 0,
+                       # Grouping by function makes the caches hit, but a sample cut short by the budget would be biased
+                       replay_order=replay_order if replay_order is not None else ("random" if score else "grouped"))
+        for name in ["only_mutate", "avoid_mutating", "source_only_mutate", "source_avoid_mutating"]:
+            options[name] = list(options[name]) if options[name] is not None else []
+        self.config = CampaignConfig(**options)
+
+        if parallel > 1:
+            if score:
+                print("PARALLEL MODE IS ONLY FOR FUZZING, NOT MUTATION SCORE ESTIMATION")
+                sys.exit(1)
+            if callable(fuzzer_cmd) or ("{executable}" not in fuzzer_cmd):
+                print("IN PARALLEL MODE THE FUZZER COMMAND MUST USE {executable} (AND USUALLY {output}) FOR EACH INSTANCE")
+                sys.exit(1)
+
+        if meta_mutant:
+            if parallel > 1:
+                print("META-MUTANT MODE SELECTS ONE MUTANT AT A TIME, BY ENVIRONMENT, SO IT CAN'T RUN IN PARALLEL")
+                sys.exit(1)
+            if any(callable(cmd) for cmd in [fuzzer_cmd, prune_mutant_cmd, post_mutant_cmd]):
+                print("META-MUTANT MODE NEEDS SHELL COMMANDS, WHICH SEE THE MUTANT SELECTED IN THEIR ENVIRONMENT")
+                sys.exit(1)
+
+        if prevalidate > 0:
+            if (parallel > 1) or meta_mutant:
+                print("--prevalidate CAN'T BE COMBINED WITH --parallel OR --meta_mutant")
+                sys.exit(1)
+            for cmd in [reachability_check_cmd, prune_mutant_cmd]:
+                if (cmd is not None) and (callable(cmd) or ("{executable}" not in cmd)):
+                    print("WITH --prevalidate, THE REACHABILITY AND PRUNE COMMANDS MUST USE {executable}, SINCE MUTANTS ARE",
+                          "CHECKED AS STAGED COPIES WHILE THE EXECUTABLE IS BEING FUZZED")
+                    sys.exit(1)
+
+        if triage_cmd is not None:
+            if not triage_crashes:
+                print("TRIAGE NEEDS AT LEAST ONE --triage_crashes PATTERN FOR WHERE THE FUZZER PUTS CRASHES")
+                sys.exit(1)
+            if "{input}" not in triage_cmd:
+                print("THE TRIAGE COMMAND MUST USE {input} FOR THE CRASHING INPUT TO REPLAY")
+                sys.exit(1)
+            triage = crash_triage.Triage(triage_cmd, triage_crashes, triage_dir, triage_timeout, triage_jobs)
+        else:
+            triage = None
+
+        if kill_matrix is not None:
+            if callable(fuzzer_cmd) or ("{input}" not in fuzzer_cmd):
+                print("WITH --kill_matrix THE COMMAND MUST RUN ONE CORPUS INPUT, {input}")
+                sys.exit(1)
+            matrix = mutant_matrix.KillMatrix(kill_matrix, fuzzer_cmd, kill_matrix_file, kill_matrix_timeout,
+                                              kill_matrix_jobs, kill_matrix_early_stop, not no_timeout_kills)
+        else:
+            matrix = None
+
+
+        workspace = campaign_workspace.Workspace(workspace_dir, keep=keep_workspace)
+        reach_files = reachability_check_cmd is not None
+        self.helpers = Helpers(workspace=workspace,
+                               files=Files(workspace.path("new_executable"),
+                                           workspace.path("reachability_executable") if reach_files else None,
+                                           workspace.path("func_reachability_executable") if reach_files else None,
+                                           workspace.path("cmd_errors.txt"), workspace.path("validate_cmd_errors.txt")),
+                               triage=triage,
+                               matrix=matrix,
+                               corpus_sync=(corpus_sync.CorpusSync(sync_corpus, sync_layout, sync_artifacts)
+                                            if sync_corpus is not None else None),
+                               calibration=check_calibration.Calibration(
+                                   reachability_check_timeout, prune_mutant_timeout, timeout_multiplier,
+                                   calibrate_timeouts and ((reachability_check_cmd is not None) or (prune_mutant_cmd is not None)),
+                                   calibration_runs, recalibrate_every),
+                               tracker=campaign_status.Tracker(),
+                               checks=mutant_checks.MutantChecks(self),
+                               instances=(parallel_fuzzing.make_instances(parallel, parallel_dir, executable, pin_cpus, sync_layout,
+                                                                          sync_artifacts) if parallel > 1 else None),
+                               lock=threading.RLock()) # held by background validation while it changes caches
+        self.knowledge = campaign_knowledge.Knowledge(coverage=reachability_check_cmd is not None, score=score)
+        self.results = mutant_results.Results()
+        self.progress = Progress()
+        self.analysis = None # filled in once by analyze()
+        self.validator = None
+    #pylint: enable=W0613
+
+    def analyze(self):
+        """Read and disassemble the executable and set up the caches; later calls reuse the analysis."""
+        if self.analysis is not None:
+            return
+        config = self.config
+        knowledge = self.knowledge
+        code = mutate.get_code(config.executable)
+        if config.limits is not None:
+            commands.set_limits(config.limits)
+
+        if not config.skip_default_avoid:
+            config.avoid_mutating.extend(DEFAULT_AVOID_MUTATING)
+        start_analyze = time.time()
+
+        extend_from_file(config.only_mutate, config.only_mutate_file)
+        extend_from_file(config.avoid_mutating, config.avoid_mutating_file)
+        extend_from_file(config.source_only_mutate, config.source_only_mutate_file)
+        extend_from_file(config.source_avoid_mutating, config.source_avoid_mutating_file)
+
+        metadatas = None
+        if config.use_saved_mutants is not None:
+            metadatas = []
+            for metadata_file in sorted(glob.glob(config.use_saved_mutants + "/*.metadata")):
+                with open(metadata_file, "r") as f:
+                    metadatas.append(f.read())
+            if len(metadatas) < 1:
+                print("NO METADATA FILES FOUND!")
+                sys.exit(1)
+
+        if config.score and not config.avoid_repeats:
+            print("WARNING: SCORE ESTIMATION WITHOUT --avoid_repeats WILL REPEAT SAMPLES")
 
-    print()
-    print("INITIAL ANALYSIS OF EXECUTABLE TOOK", round(time.time() - start_analyze, 2), "SECONDS")
-
-    start_fuzz = time.time()
-    mutant_no = 0
-    analysis_data = []
-    try:
-        if initial_fuzz_cmd is not None:
-            print("=" * 10,
-                  datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S'),
-                  "=" * 10)
-            print("RUNNING INITIAL FUZZING...")
-            silent_run_with_timeout(initial_fuzz_cmd, initial_budget, verbose)
-            if status_cmd is not None:
-                print("INITIAL STATUS:")
-                subprocess.call(status_cmd, shell=True)
-            if post_initial_cmd is not None:
-                subprocess.call(post_initial_cmd, shell=True)
-
-        if reachability_check_cmd is not None:
-            func_reachability_filename = "/tmp/func_reachability_executable"
-            reachability_filename = "/tmp/reachability_executable"
-            reachability_checks = 0.0
-            reachability_hits = 0.0
+        print("READ EXECUTABLE WITH", len(code), "BYTES")
+        sys.stdout.flush()
+        call_graph = callgraph.CallGraph() if config.static_reachability is not None else None
+        control_flow = None
+        if (config.reachability_check_cmd is not None) and (not config.no_dominator_propagation):
+            control_flow = cfg.ControlFlow()
+        cache = None
+        if config.analysis_cache is not None:
+            cache = incremental.AnalysisCache(config.analysis_cache, config.executable, code,
+                                              (config.only_mutate, config.avoid_mutating, config.source_only_mutate,
+                                               config.source_avoid_mutating, config.mutate_standard_libraries))
+            (jumps, function_map, function_reach) = cache.get_jumps(call_graph, control_flow)
         else:
-            func_reachability_filename = None
-            reachability_filename = None
-        while ((time.time() - start_fuzz) - initial_budget) < (budget * fraction_mutant):
-            sys.stdout.flush() # Let's see output more regularly
+            (jumps, function_map, function_reach) = targeting.get_jumps(config.executable, config.only_mutate,
+                                                                         config.avoid_mutating, config.source_only_mutate,
+                                                                         config.source_avoid_mutating,
+                                                                         config.mutate_standard_libraries,
+                                                                         graph=call_graph, flow=control_flow)
+        print("FOUND", len(jumps), "MUTABLE JUMPS IN", len(function_map), "FUNCTIONS")
+        if metadatas is not None:
+            plan = replay_planner.ReplayPlan(metadatas, function_reach, config.replay_order)
+            self.progress.replay_plan = plan
+            print("REPLAYING", len(plan), "SAVED MUTANTS IN", plan.groups, "FUNCTION GROUPS,",
+                  config.replay_order.upper(), "ORDER (" + str(plan.duplicates), "DUPLICATES DROPPED)")
+        print("JUMPS BY FUNCTION:")
+        for function, function_jumps in function_map.items():
+            print(function, len(function_jumps))
+        knowledge.track(function_map)
+        print()
 
-            mutant_no += 1
-            print()
-            print()
-            print()
-            print("=" * 30,
-                  datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S'),
-                  "=" * 30)
-            if use_saved_mutants is None:
-                print(round(time.time() - start_fuzz, 2), "ELAPSED: GENERATING MUTANT #" + str(mutant_no))
-                # make a new mutant of the executable; rename avoids hitting a busy executable
-                (functions, locs, meta) = mutate.mutate_from(executable_code, executable_jumps, function_reach, "/tmp/new_executable",
-                                                             order=order, reachability_filename=reachability_filename,
-                                                             func_reachability_filename=func_reachability_filename,
-                                                             save_mutants=save_mutants, save_executables=save_executables, save_count=mutant_no,
-                                                             avoid_repeats=avoid_repeats, repeat_retries=repeat_retries,
-                                                             visited_mutants=visited_mutants, unreach_cache=unreach_cache)
-                if stop_on_repeat and max(visited_mutants.values()) > 1:
-                    print("FORCED TO REPEAT A MUTANT, STOPPING ANALYSIS")
-                    if save_mutants is not None:
-                        # Don't keep repeated mutants
-                        subprocess.call("rm " + save_mutants + "/*_" + str(mutant_no) + ".*", shell=True)
-                    break
-            else:
-                print(round(time.time() - start_fuzz, 2), "ELAPSED: APPLYING MUTANT #" + str(mutant_no))
-                if stop_on_repeat and ((mutant_no - 1) >= len(metadatas)):
-                    print("FORCED TO REPEAT A MUTANT, STOPPING ANALYSIS")
-                    break
-                if avoid_repeats:
-                    metadata = metadatas[(mutant_no - 1) % len(metadatas)]
-                else:
-                    metadata = random.choice(metadatas)
-                (functions, locs, meta) = mutate.apply_mutant_metadata(executable_code, executable_jumps, function_reach, metadata, "/tmp/new_executable",
-                                                                       visited_mutants)
-            mutant_ok = True
-            if not functions and not locs: # Can only happen if apply fails
-                mutant_ok = False
-            mutant_name = meta.replace("\n", "::")
-            if reachability_check_cmd is not None:
-                if verbose:
-                    print()
-                    print("=" * 40)
-                    print("CHECKING REACHABILITY")
-                reachability_checks += 1.0
-                # First check the funciton itself is reachable
-                if tuple(functions) in reach_cache:
-                    print("SKIPPING FUNCTION REACHABILITY, IN CACHE")
-                    r = 1
-                else:
-                    os.rename(func_reachability_filename, executable)
-                    subprocess.check_call(['chmod', '+x', executable])
-                    r = silent_run_with_timeout(reachability_check_cmd, reachability_check_timeout, verbose)
-                    restore_executable(executable, executable_code)
-                if r == 0:
-                    print("FUNCTION ITSELF IS NOT REACHABLE (RETURN CODE 0)")
-                    mutant_ok = False
-                    for function in functions:
-                        if not no_unreach_cache:
-                            unreach_cache[function] = True
-                            if unreach_cache_file is not None:
-                                with open(unreach_cache_file, 'a') as f:
-                                    f.write(function + "\n")
-                else:
-                    reach_cache[tuple(functions)] = True
-                    if tuple(locs) in reach_cache:
-                        print("SKIPPING JUMP REACHABILITY,  IN CACHE")
-                        r = 1
-                    else:
-                        os.rename(reachability_filename, executable)
-                        subprocess.check_call(['chmod', '+x', executable])
-                        r = silent_run_with_timeout(reachability_check_cmd, reachability_check_timeout, verbose)
-                        restore_executable(executable, executable_code)
-                    if r == 0:
-                        print("MUTANT IS NOT REACHABLE (RETURN CODE 0)")
-                        for loc in locs:
-                            if not no_unreach_cache:
-                                unreach_cache[loc] = True
-                                # No file caching for location reachability
-                        mutant_ok = False
-                    else:
-                        reach_cache[tuple(locs)] = True
-                        reachability_hits += 1.0
-                for function in functions:
-                    (hits, total) = function_coverage[function]
-                    if r == 0:
-                        function_coverage[function] = (hits, total + 1)
-                    else:
-                        function_coverage[function] = (hits + 1, total + 1)
-                    (hits, total) = function_coverage[function]
-                    print(function + ":", str(round((hits / total) * 100.0, 2)) + "% COVERAGE")
-                print ("RUNNING COVERAGE ESTIMATE OVER", int(reachability_checks), "MUTANTS:",
-                       str(round((reachability_hits / reachability_checks) * 100.0, 2)) + "%")
-            if mutant_ok:
-                os.rename("/tmp/new_executable", executable)
-                subprocess.check_call(['chmod', '+x', executable])
-                if prune_mutant_cmd is not None:
-                    if verbose:
-                        print()
-                        print("=" * 40)
-                        print("PRUNING MUTANT...")
-                    r = silent_run_with_timeout(prune_mutant_cmd, prune_mutant_timeout, verbose)
-                    if r != 0:
-                        print("PRUNING CHECK FAILED WITH RETURN CODE", r)
-                        mutant_ok = False
-            if (save_mutants is not None) and (not mutant_ok):
-                # Don't keep unreachable mutants
-                subprocess.call("rm " + save_mutants + "/*_" + str(mutant_no) + ".*", shell=True)
-            if mutant_ok:
-                print()
-                print("FUZZING/EVALUATING MUTANT...")
-                sys.stdout.flush()
-                start_run = time.time()
-                r = silent_run_with_timeout(fuzzer_cmd, time_per_mutant, verbose, zero_timeout=no_timeout_kills)
-                print("FINISHED IN", round(time.time() - start_run, 2), "SECONDS")
-                analysis_data.append((mutant_name, round(time.time() - start_run, 2), r))
-                if score:
-                    print()
-                    mutants_run += 1
-                    if r != 0:
-                        mutants_killed += 1
-                        if save_mutants is not None:
-                            if save_executables:
-                                os.rename(save_mutants + "/mutant_" + str(mutant_no) + ".exe", save_mutants + "/killed_" + str(mutant_no) + ".exe")
-                            os.rename(save_mutants + "/mutant_" + str(mutant_no) + ".metadata", save_mutants + "/killed_" + str(mutant_no) + ".metadata")
-                        print ("** MUTANT KILLED **")
-                    else:
-                        print ("** MUTANT NOT KILLED **")
-                        if save_mutants is not None:
-                            if save_executables:
-                                os.rename(save_mutants + "/mutant_" + str(mutant_no) + ".exe", save_mutants + "/survived_" + str(mutant_no) + ".exe")
-                            os.rename(save_mutants + "/mutant_" + str(mutant_no) + ".metadata", save_mutants + "/survived_" + str(mutant_no) + ".metadata")
-                    for function in functions:
-                        (kills, total) = function_score[function]
-                        if r == 0:
-                            function_score[function] = (kills, total + 1)
-                        else:
-                            function_score[function] = (kills + 1, total + 1)
-                        (kills, total) = function_score[function]
-                        print(function + ":", str(round((kills / total) * 100.0, 2)) + "% MUTATION SCORE")
-                    print ("RUNNING MUTATION SCORE ON", int(mutants_run), "MUTANTS:",
-                           str(round((mutants_killed / mutants_run) * 100.0, 2)) + "%")
-                analysis_times = list(map(lambda x:x[1], analysis_data))
-                print("RUNNING MEAN TIME FOR MUTANT EVALUATION:", round(sum(analysis_times) / len(analysis_times), 2), "SECONDS")
-
-                if post_mutant_cmd is not None:
-                    restore_executable(executable, executable_code) # Might need original for post
-                    print("RUNNING POST-MUTANT COMMAND")
-                    silent_run_with_timeout(post_mutant_cmd, post_mutant_timeout, verbose)
-                if status_cmd is not None:
-                    restore_executable(executable, executable_code) # Might need for status
-                    print("STATUS:")
-                    subprocess.call(status_cmd, shell=True)
-
-        if (not score) and (fraction_mutant < 1.0):
-            print(datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S'))
-            print(round(time.time() - start_fuzz, 2), "ELAPSED: STARTING FINAL FUZZ")
-            restore_executable(executable, executable_code)
-            silent_run_with_timeout(fuzzer_cmd, budget - (time.time() - start_fuzz), verbose)
-            print("COMPLETED AFTER", round(time.time() - start_fuzz, 2), "SECONDS")
-            if status_cmd is not None:
-                print("FINAL STATUS:")
-                subprocess.call(status_cmd, shell=True)
-
-        if reachability_check_cmd is not None:
-            print()
-            for function, (hits, total) in function_coverage.items():
-                if total > 0:
-                    print(function + ":", str(round((hits / total) * 100.0, 2)) + "% COVERAGE (OUT OF",
-                          str(int(total)) + ")")
-                else:
-                    print(function + ": NO COVERAGE CHECKS")
-            print()
+        if (config.unreach_cache_file is not None) and os.path.exists(config.unreach_cache_file):
+            knowledge.read_unreachable(config.unreach_cache_file)
+
+        store = None
+        if config.save_deltas and (config.save_mutants is not None):
+            store = delta_store.DeltaStore(config.save_mutants)
+            digest = store.add_original(code, os.stat(config.executable).st_mode & 0o7777)
+            print("SAVING MUTANT EXECUTABLES AS PATCHES AGAINST", os.path.join(store.objects, digest))
+
+        if config.save_results is not None:
+            # Resumed campaigns keep the rows written up to their checkpoint
+            self.results.open(config.save_results, append=config.resume)
+
+        cum_weights = None
+        if (config.bias_profile_cmd is not None) or (config.bias_profile_file is not None):
+            counts = branch_bias.get_profile(config.executable, code, jumps, config.bias_profile_cmd,
+                                             config.bias_profile_timeout, config.bias_profile_file)
+            if counts:
+                branch_bias.summarize(counts)
+                cum_weights = branch_bias.cumulative_weights(jumps, counts, config.bias_weight)
+
+        meta = None
+        if config.meta_mutant:
+            meta = meta_executable.Installer(meta_executable.build(code, elf.read_segments(config.executable), jumps),
+                                             self.helpers.workspace.path("meta_executable"), config.executable)
+            print("BUILT META-MUTANT WITH", len(jumps) * meta_executable.VARIANTS, "MUTANTS; EACH MUTANT IS SELECTED BY",
+                  meta_executable.MUTANT_VARIABLE, "INSTEAD OF WRITING AN EXECUTABLE")
+
+        self.analysis = Analysis(code, jumps, function_map, function_reach, control_flow, cum_weights, meta, cache, store)
+
+        if cache is not None:
+            for directory in [config.save_mutants, config.use_saved_mutants]:
+                if (directory is not None) and os.path.isdir(directory):
+                    for (filename, function) in cache.stale_mutants(directory):
+                        print("STALE SAVED MUTANT", os.path.join(directory, filename), "(" + function, "HAS CHANGED)")
+            verdicts = cache.carry_over(jumps, function_reach, knowledge.unreach_cache, knowledge.reach_cache,
+                                        knowledge.visited_mutants, self.results.rows, config.score)
+            for (name, run_time, r) in verdicts:
+                self.results.stats.add(run_time)
+                self.results.write(name, run_time, r, status="carried")
+                if config.score:
+                    knowledge.score.record(incremental.mutant_functions(name) or [], r != 0)
+            self.save_analysis()
+
+        if call_graph is not None:
+            callgraph.exclude_unreachable(call_graph, config.static_reachability, elf.read_data_pointers(config.executable),
+                                          function_map, knowledge.unreach_cache, config.conservative_indirect_calls,
+                                          config.verbose)
+
+        if config.coverage_files:
+            print("SEEDING REACHABILITY FROM COVERAGE DATA")
+            coverage.seed_caches(config.executable, jumps, function_map, function_reach, config.coverage_files,
+                                 knowledge.unreach_cache, knowledge.reach_cache, config.sancov_pcs, config.no_unreach_cache)
+
+        if self.helpers.matrix is not None:
+            self.helpers.matrix.check_original()
 
-        if score:
-            print()
-            for function, (kills, total) in function_score.items():
-                if total > 0:
-                    print(function + ":", str(round((kills / total) * 100.0, 2)) + "% MUTATION SCORE (OUT OF",
-                          str(int(total)) + ")")
+        print()
+        print("INITIAL ANALYSIS OF EXECUTABLE TOOK", round(time.time() - start_analyze, 2), "SECONDS")
+        self.progress.start = time.time()
+
+    def save_analysis(self):
+        analysis = self.analysis
+        if analysis.incremental is not None:
+            knowledge = self.knowledge
+            analysis.incremental.save(analysis.jumps, analysis.function_reach, knowledge.unreach_cache, knowledge.reach_cache,
+                                      knowledge.visited_mutants, self.results.rows, self.config.score)
+
+    def save_checkpoint(self):
+        if self.progress.checkpointer is not None:
+            with self.helpers.lock:
+                state = self.progress.state()
+                state.update(self.knowledge.state())
+                state.update(self.results.state())
+                self.progress.checkpointer.save(state)
+
+    def next_mutant(self):
+        """
+        Write the next mutant (and, with a reachability check, its probes) to disk and return it,
+        or return None if the campaign is out of new mutants and should stop.  With prevalidation
+        running, return the next mutant that already passed its checks instead.
+        """
+        self.analyze()
+        if self.validator is None:
+            return self.make_mutant()
+        while self.mutant_time_left():
+            try:
+                mutant = self.validator.get(1.0)
+            except queue.Empty:
+                continue
+            if mutant is not None:
+                print()
+                print(round(self.progress.elapsed(), 2), "ELAPSED: SWITCHING TO PREVALIDATED MUTANT #" + str(mutant.number))
+            return mutant
+        return None
+
+    def make_mutant(self, staged=None):
+        # Files go in the staged directory, if given, rather than the campaign's single set
+        config = self.config
+        analysis = self.analysis
+        knowledge = self.knowledge
+        progress = self.progress
+        files = self.helpers.files
+        new_filename = files.new if analysis.meta is None else None
+        reachability_filename = files.reach
+        func_reachability_filename = files.func_reach
+        if staged is not None:
+            os.makedirs(staged)
+            new_filename = os.path.join(staged, "executable")
+            if reachability_filename is not None:
+                reachability_filename = os.path.join(staged, "reachability_executable")
+                func_reachability_filename = os.path.join(staged, "func_reachability_executable")
+        progress.mutant_no += 1
+        print()
+        print()
+        print()
+        print("=" * 30,
+              datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S'),
+              "=" * 30)
+        if config.use_saved_mutants is None:
+            print(round(progress.elapsed(), 2), "ELAPSED: GENERATING MUTANT #" + str(progress.mutant_no))
+            # make a new mutant of the executable; rename avoids hitting a busy executable
+            (functions, locs, meta) = mutate.mutate_from(analysis.code, analysis.jumps, analysis.function_reach, new_filename,
+                                                         order=config.order, reachability_filename=reachability_filename,
+                                                         func_reachability_filename=func_reachability_filename,
+                                                         save_mutants=config.save_mutants,
+                                                         save_executables=config.save_executables and (analysis.delta_store is None),
+                                                         save_count=progress.mutant_no,
+                                                         avoid_repeats=config.avoid_repeats, repeat_retries=config.repeat_retries,
+                                                         visited_mutants=knowledge.visited_mutants,
+                                                         unreach_cache=knowledge.unreach_cache, cum_weights=analysis.cum_weights)
+            if analysis.delta_store is not None:
+                analysis.delta_store.save(config.save_mutants + "/mutant_" + str(progress.mutant_no) + delta_store.SUFFIX,
+                                          mutate.metadata_patches(analysis.function_reach, meta))
+            if config.stop_on_repeat and max(knowledge.visited_mutants.values()) > 1:
+                print("FORCED TO REPEAT A MUTANT, STOPPING ANALYSIS")
+                if config.save_mutants is not None:
+                    # Don't keep repeated mutants
+                    remove_saved(config.save_mutants, progress.mutant_no)
+                return None
+        else:
+            print(round(progress.elapsed(), 2), "ELAPSED: APPLYING MUTANT #" + str(progress.mutant_no))
+            plan = progress.replay_plan
+            with self.helpers.lock:
+                if (config.replay_order == "grouped") or config.avoid_repeats:
+                    metadata = plan.next(knowledge.unreach_cache) # round robin
+                    repeated = plan.passes > 0
                 else:
-                    if verbose:
-                        print(function + ": NO MUTANTS EXECUTED")
-            print()
-
+                    metadata = plan.choose(knowledge.unreach_cache)
+                    repeated = (progress.mutant_no - 1) >= (len(plan) + plan.dropped)
+            if plan.dropped > progress.replay_dropped:
+                print("SKIPPED", plan.dropped - progress.replay_dropped, "SAVED MUTANTS KNOWN TO BE UNREACHABLE")
+                progress.replay_dropped = plan.dropped
+            if metadata is None:
+                print("ALL SAVED MUTANTS ARE KNOWN TO BE UNREACHABLE, STOPPING ANALYSIS")
+                return None
+            if config.stop_on_repeat and repeated:
+                print("FORCED TO REPEAT A MUTANT, STOPPING ANALYSIS")
+                return None
+            (functions, locs, meta) = mutate.apply_mutant_metadata(analysis.code, analysis.jumps, analysis.function_reach,
+                                                                   metadata, new_filename, knowledge.visited_mutants,
+                                                                   reachability_filename, func_reachability_filename)
+        if staged is not None:
+            # Staged copies are run where they are, so they need to be executable
+            for filename in [new_filename, reachability_filename, func_reachability_filename]:
+                if (filename is not None) and os.path.exists(filename):
+                    os.chmod(filename, os.stat(config.executable).st_mode)
+        # functions and locs can only be empty if applying saved metadata fails
+        return Mutant(progress.mutant_no, functions, locs, meta, meta.replace("\n", "::"), bool(functions or locs), staged, {})
+
+    def check_reachability(self, mutant):
+        """Check that the corpus reaches the mutated function and jump, updating caches and coverage."""
+        return self.helpers.checks.reachability(mutant)
+
+    def prune(self, mutant):
+        """Put the mutant in place of the executable, then check it with the prune command, if any."""
+        return self.helpers.checks.prune(mutant)
+
+    def calibrate(self):
+        """Time the checks on the original executable, and make their timeouts a multiple of that."""
+        self.analyze()
+        checks = self.helpers.checks
+        cmds = [("reach", self.config.reachability_check_cmd), ("prune", self.config.prune_mutant_cmd)]
+        with self.helpers.lock:
+            self.helpers.calibration.calibrate(self.progress.mutant_no,
+                                               {name: (lambda cap, cmd=cmd: checks.calibration_run(cmd, cap))
+                                                for (name, cmd) in cmds if cmd is not None})
+
+    def mutant_time_left(self):
+        config = self.config
+        return (self.progress.elapsed() - config.initial_budget) < (config.budget * config.fraction_mutant)
+
+    def restore_original(self):
+        """Make the executable behave as the original: with a meta-mutant, just select no mutant."""
+        os.environ.pop(meta_executable.MUTANT_VARIABLE, None)
+        if self.analysis.meta is None:
+            commands.restore_executable(self.config.executable, self.analysis.code)
+
+    def evaluate(self, mutant):
+        """Fuzz (or just check) the mutant put in place by prune(), recording the result; returns the return code."""
+        config = self.config
+        matrix = self.helpers.matrix
         print()
-
-        if reachability_check_cmd is not None:
-            unreach_funcs = 0
-            unreach_branches = 0
-            for u in unreach_cache:
-                if u in function_map:
-                    print("** FUNCTION", u, "WITH", len(function_map[u]), "BRANCHES UNREACHABLE **")
-                    unreach_funcs += 1
-                    unreach_branches += len(function_map[u])
-            print()
-            print("TOTAL OF", unreach_funcs, "FUNCTIONS WITH", unreach_branches, "BRANCHES ARE UNREACHABLE")
+        print("FUZZING/EVALUATING MUTANT...")
+        sys.stdout.flush()
+        start_run = time.time()
+        if matrix is not None:
+            r = 1 if matrix.run_mutant(mutant.name) > 0 else 0
+        else:
+            r = commands.silent_run_with_timeout(config.fuzzer_cmd, config.time_per_mutant, config.verbose,
+                                                 zero_timeout=config.no_timeout_kills, log_filename=self.helpers.files.log)
+        killed_by = commands.last_killed_by() if matrix is None else None
+        run_time = round(time.time() - start_run, 2)
+        print("FINISHED IN", run_time, "SECONDS")
+        self.results.add(mutant.name, run_time, r)
+        self.record_result(mutant, "evaluated", run_time, r, killed_by)
+        if config.score:
             print()
-
-        if reachability_check_cmd is not None:
-            print("FINAL COVERAGE OVER", int(reachability_checks), "MUTANTS:",
-                  str(round((reachability_hits / reachability_checks) * 100.0, 2)) + "%")
-        if score:
-            if mutants_run > 0:
-                print("FINAL MUTATION SCORE OVER", int(mutants_run), "EXECUTED MUTANTS:",
-                        str(round((mutants_killed / mutants_run) * 100.0, 2)) + "%")
+            self.knowledge.record_kill(mutant.functions, r != 0, killed_by)
+            if config.save_mutants is not None:
+                rename_saved(config.save_mutants, mutant.number, "killed" if r != 0 else "survived", config.save_executables,
+                             self.analysis.delta_store is not None)
+            if r == 0:
+                print ("** MUTANT NOT KILLED **")
+            elif (killed_by is not None) and (killed_by != "timeout"):
+                # Resource exhaustion, not a crash: counted as a kill, but reported apart
+                print ("** MUTANT KILLED BY", killed_by.upper().replace("_", " "), "LIMIT **")
+            else:
+                print ("** MUTANT KILLED **")
+            score = self.knowledge.score
+            for function in mutant.functions:
+                print(function + ":", str(score.percent(function)) + "% MUTATION SCORE")
+            print ("RUNNING MUTATION SCORE ON", int(score.total), "MUTANTS:", str(score.percent()) + "%")
+            if self.knowledge.limit_kills:
+                print("KILLS BY RESOURCE LIMITS:", ", ".join(limit.upper().replace("_", " ") + " " + str(count)
+                                                            for (limit, count) in sorted(self.knowledge.limit_kills.items())))
+        print("RUNNING MEAN TIME FOR MUTANT EVALUATION:", round(self.results.stats.mean, 2), "SECONDS")
+        return r
+
+    def record_result(self, mutant, status, run_time=None, r=None, killed_by=None):
+        """Append the mutant's row to the results file (if any) now, with the time each phase took."""
+        self.helpers.tracker.result(mutant.number, mutant.name, status, run_time, r, killed_by, mutant.times)
+        with self.helpers.lock:
+            self.results.write(mutant.name, run_time, r, status, mutant.number, mutant.times.get("reach"),
+                               mutant.times.get("prune"), round(self.progress.elapsed(), 2), killed_by)
+
+    def triage_crashes(self, mutant_name, output=None):
+        """Credit new crashing inputs to the mutant that just ran, replaying them now unless triage is at the end."""
+        triage = self.helpers.triage
+        if triage is None:
+            return
+        triage.collect(mutant_name, output)
+        if not self.config.triage_at_end:
+            self.restore_original()
+            triage.replay()
+
+    def after_mutant(self):
+        config = self.config
+        if self.helpers.corpus_sync is not None:
+            print("SYNCED", self.helpers.corpus_sync.sync(), "NEW CRASHES INTO THE CORPUS")
+        if config.post_mutant_cmd is not None:
+            self.restore_original() # Might need original for post
+            print("RUNNING POST-MUTANT COMMAND")
+            commands.silent_run_with_timeout(config.post_mutant_cmd, config.post_mutant_timeout, config.verbose,
+                                             log_filename=self.helpers.files.log)
+        if config.status_cmd is not None:
+            self.restore_original() # Might need for status
+            print("STATUS:")
+            subprocess.call(config.status_cmd, shell=True)
+
+    def stage(self, mutant):
+        batch = self.progress.batch
+        instance = self.helpers.instances[len(batch)]
+        print("STAGING MUTANT FOR INSTANCE", instance.number)
+        instance.stage(mutate.get_code(self.config.executable), mutant.name)
+        commands.restore_executable(self.config.executable, self.analysis.code)
+        batch.append(instance)
+        if len(batch) == self.config.parallel:
+            self.run_batch()
+
+    def run_batch(self):
+        config = self.config
+        batch = self.progress.batch
+        tracker = self.helpers.tracker
+        tracker.doing("fuzzing " + str(len(batch)) + " mutants")
+        run_parallel_batch(batch, config.fuzzer_cmd, config.time_per_mutant, self.results, config.executable, self.analysis.code,
+                           config.post_mutant_cmd, config.post_mutant_timeout, config.status_cmd, config.verbose)
+        for (name, run_time, r) in self.results.rows[len(self.results.rows) - len(batch):]:
+            tracker.result(None, name, "evaluated", run_time, r)
+        tracker.doing("triage")
+        for instance in batch:
+            self.triage_crashes(instance.mutant_name, instance.output)
+        self.progress.batch = []
+
+    def stop_validator(self):
+        if self.validator is not None:
+            discarded = self.validator.stop()
+            self.validator = None
+            if discarded > 0:
+                print("DISCARDED", discarded, "VALIDATED MUTANTS THERE WAS NO TIME TO FUZZ")
+
+    def status(self, tables=True):
+        """The state of the campaign, for the status endpoint; tables adds per-function coverage and scores."""
+        config = self.config
+        analysis = self.analysis
+        progress = self.progress
+        instances = self.helpers.instances
+        elapsed = progress.elapsed()
+        snapshot = {"phase": progress.phase,
+                    "elapsed": round(elapsed, 2),
+                    "budget": config.budget,
+                    "remaining": round(max(0.0, config.budget - elapsed), 2),
+                    "mutants_made": progress.mutant_no,
+                    "instances": None if instances is None else [{"instance": instance.number, "mutant": instance.mutant_name}
+                                                                 for instance in instances],
+                    "timeouts": self.helpers.calibration.timeouts()}
+        snapshot.update(self.helpers.tracker.summary())
+        snapshot.update(self.results.summary())
+        snapshot.update(self.knowledge.summary())
+        snapshot["caches"].update(jumps=len(analysis.jumps) if analysis is not None else 0,
+                                  functions=len(analysis.function_map) if analysis is not None else 0)
+        if tables and (analysis is not None):
+            snapshot["functions"] = self.knowledge.function_tables(analysis.function_map)
+        return snapshot
+
+    def report(self):
+        # Results were saved as they came
+        self.knowledge.report(self.analysis.function_map, self.results.rows, None, self.config.verbose, self.results.stats)
+        if self.helpers.triage is not None:
+            self.helpers.triage.report()
+        if self.helpers.matrix is not None:
+            self.helpers.matrix.report()
+
+    def run(self):
+        config = self.config
+        helpers = self.helpers
+        progress = self.progress
+        tracker = helpers.tracker
+        print("*" * 80)
+        print("STARTING MUTTFUZZ WITH BUDGET", config.budget, "SECONDS")
+        print()
+        if config.status_endpoint is not None:
+            tracker.serve(config.status_endpoint, self.status)
+        resumed = None
+        if config.resume:
+            if (config.checkpoint is None) or (not os.path.exists(config.checkpoint)):
+                print("NO CHECKPOINT TO RESUME FROM, STARTING A NEW CAMPAIGN")
             else:
-                print("NO MUTANTS EXECUTED!")
-
-        visits = visited_mutants.values()
-        print("MAXIMUM VISITS TO A MUTANT:", max(visits))
-        print("MEAN VISITS TO A MUTANT:", round(sum(visits) / (len(visits) * 1.0), 2))
-        analysis_times = list(map(lambda x:x[1], analysis_data))
-        print("MEAN TIME FOR MUTANT EVALUATION:", round(sum(analysis_times) / len(analysis_times), 2), "SECONDS")
-        if save_results is not None:
-            with open(save_results, 'w') as f:
-                for d in analysis_data:
-                    f.write('"' + d[0] + '",' + str(d[1]) + "," + str(d[2]) + "\n")
-
-    finally:
-        # always restore the original binary!
-        restore_executable(executable, executable_code)
+                resumed = campaign_checkpoint.load_checkpoint(config.checkpoint)
+                campaign_checkpoint.verify_executable(config.executable, resumed, config.checkpoint)
+        tracker.doing("analysis")
+        try:
+            self.analyze()
+            if resumed is not None:
+                progress.restore(resumed)
+                self.knowledge.restore(resumed)
+                self.results.restore(resumed["analysis_data"], resumed.get("results_size")) # not in checkpoints from before sizes
+                random.setstate(resumed["random_state"])
+                print("RESUMED CAMPAIGN FROM", config.checkpoint, "AFTER", round(resumed["elapsed"], 2), "SECONDS AND",
+                      progress.mutant_no, "MUTANTS, IN PHASE", progress.phase.upper())
+            if config.checkpoint is not None:
+                progress.checkpointer = campaign_checkpoint.Checkpointer(config.checkpoint, self.analysis.code,
+                                                                         config.checkpoint_interval)
+            if helpers.instances is not None:
+                print("RUNNING", config.parallel, "FUZZER INSTANCES AT ONCE, IN", config.parallel_dir)
+            if helpers.triage is not None:
+                for instance in (helpers.instances if helpers.instances is not None else [None]):
+                    helpers.triage.collect(None, instance.output if instance is not None else None)
+            if (config.prevalidate > 0) and (progress.phase != "final"):
+                # Starts now, so mutants are checked during any initial fuzzing too
+                self.validator = prevalidation.Validator(
+                    lambda: self.make_mutant(helpers.workspace.path("staged_" + str(progress.mutant_no + 1))),
+                    helpers.checks.staged, lambda mutant: discard_staged(mutant, config.save_mutants),
+                    config.prevalidate, helpers.lock)
+                self.validator.start()
+                print("VALIDATING UP TO", config.prevalidate, "MUTANTS AHEAD IN THE BACKGROUND")
+
+            if (config.initial_fuzz_cmd is not None) and (progress.phase == "initial"):
+                print("=" * 10,
+                      datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S'),
+                      "=" * 10)
+                print("RUNNING INITIAL FUZZING...")
+                tracker.doing("initial fuzzing")
+                commands.silent_run_with_timeout(config.initial_fuzz_cmd, config.initial_budget, config.verbose,
+                                                 log_filename=helpers.files.log)
+                if config.status_cmd is not None:
+                    print("INITIAL STATUS:")
+                    subprocess.call(config.status_cmd, shell=True)
+                if config.post_initial_cmd is not None:
+                    subprocess.call(config.post_initial_cmd, shell=True)
+            if progress.phase == "initial":
+                progress.phase = "mutants"
+                self.save_checkpoint()
+
+            while (progress.phase == "mutants") and self.mutant_time_left():
+                sys.stdout.flush() # Let's see output more regularly
+                if (progress.checkpointer is not None) and progress.checkpointer.due() and (not progress.batch):
+                    self.save_checkpoint()
+
+                if helpers.calibration.due(progress.mutant_no):
+                    # First after any initial fuzzing, then as the corpus grows
+                    tracker.doing("calibration")
+                    self.calibrate()
+                tracker.doing("making mutant")
+                mutant = self.next_mutant()
+                if mutant is None:
+                    break
+                tracker.mutant = mutant
+                mutant_ok = mutant.valid
+                if (config.reachability_check_cmd is not None) and (mutant.staged is None):
+                    tracker.doing("reachability check")
+                    mutant_ok = self.check_reachability(mutant) and mutant_ok
+                if mutant_ok:
+                    tracker.doing("pruning")
+                    mutant_ok = self.prune(mutant)
+                if not mutant_ok:
+                    self.record_result(mutant, mutant_checks.rejection(mutant))
+                if (config.save_mutants is not None) and (not mutant_ok):
+                    # Don't keep unreachable mutants
+                    remove_saved(config.save_mutants, mutant.number)
+                if mutant_ok and (config.parallel > 1):
+                    self.stage(mutant)
+                elif mutant_ok:
+                    tracker.doing("fuzzing mutant")
+                    self.evaluate(mutant)
+                    tracker.doing("triage")
+                    self.triage_crashes(mutant.name)
+                    tracker.doing("after mutant")
+                    self.after_mutant()
+
+            self.stop_validator()
+            if progress.batch:
+                self.run_batch()
+            tracker.mutant = None
+            if helpers.triage is not None:
+                tracker.doing("triage")
+                self.restore_original()
+                helpers.triage.replay()
+            if progress.phase == "mutants":
+                progress.phase = "final"
+                self.save_checkpoint()
+
+            if (not config.score) and (config.fraction_mutant < 1.0):
+                print(datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S'))
+                print(round(progress.elapsed(), 2), "ELAPSED: STARTING FINAL FUZZ")
+                tracker.doing("final fuzzing")
+                self.restore_original()
+                commands.restore_executable(config.executable, self.analysis.code) # the true original, even for a meta-mutant
+                if self.analysis.meta is not None:
+                    self.analysis.meta.replaced()
+                if helpers.instances is not None:
+                    for instance in helpers.instances:
+                        instance.stage(self.analysis.code)
+                    parallel_fuzzing.run_instances(helpers.instances, config.fuzzer_cmd, config.budget - progress.elapsed(),
+                                                   config.verbose, commands.LIMITER)
+                    print("SYNCED", parallel_fuzzing.sync_instances(helpers.instances), "CORPUS ENTRIES BETWEEN INSTANCES")
+                else:
+                    commands.silent_run_with_timeout(config.fuzzer_cmd, config.budget - progress.elapsed(), config.verbose,
+                                                     log_filename=helpers.files.log)
+                print("COMPLETED AFTER", round(progress.elapsed(), 2), "SECONDS")
+                if config.status_cmd is not None:
+                    print("FINAL STATUS:")
+                    subprocess.call(config.status_cmd, shell=True)
+
+            tracker.doing("report")
+            self.report()
+            self.save_analysis()
+            tracker.doing("finished")
+
+        finally:
+            tracker.stop()
+            self.stop_validator()
+            # always restore the original binary!
+            os.environ.pop(meta_executable.MUTANT_VARIABLE, None)
+            if self.analysis is not None:
+                commands.restore_executable(config.executable, self.analysis.code)
+            self.results.close()
+            for helper in [helpers.triage, helpers.matrix]:
+                if helper is not None:
+                    helper.close()
+            helpers.workspace.cleanup()
+
+
+# Every option of a campaign, as given to Campaign() (or fuzz_with_mutants), with lists copied and defaults filled in
+CampaignConfig = namedtuple("CampaignConfig", list(inspect.signature(Campaign.__init__).parameters)[1:])
+
+
+def fuzz_with_mutants(*args, **kwargs):
+    """Carry out a whole campaign; takes the same arguments as Campaign."""
+    Campaign(*args, **kwargs).run()
@@ -0,0 +1,269 @@
+import bisect
+from collections import namedtuple
+import hashlib
+import os
+import pickle
+import struct
+
+from muttfuzz import checkpoint
+from muttfuzz import elf
+from muttfuzz import mutate
+from muttfuzz import targeting
+
+CACHE_VERSION = 2
+
+
+def function_hashes(code, symbols):
+    return {name: hashlib.sha256(code[offset:offset + size]).hexdigest() for (name, (offset, size)) in symbols.items()}
+
+
+def changed_ranges(segments, symbols, unchanged):
+    """File offset ranges of the executable code not covered by an unchanged function."""
+    kept = sorted(symbols[name] for name in unchanged)
+    others = sorted(offset for (name, (offset, _)) in symbols.items() if name not in unchanged)
+
+    def needed(start, stop):
+        # A changed function, or anything big enough to be code without a symbol
+        i = bisect.bisect_left(others, start)
+        return ((i < len(others)) and (others[i] < stop)) or ((stop - start) >= targeting.MIN_GAP)
+
+    ranges = []
+    for (_, offset, filesz, _, flags) in segments:
+        if not flags & elf.PF_X:
+            continue
+        pos = offset
+        end = offset + filesz
+        for (start, size) in kept:
+            if (start + size <= pos) or (start >= end):
+                continue
+            if (start > pos) and needed(pos, start):
+                ranges.append((pos, start))
+            pos = max(pos, start + size)
+        if (end > pos) and needed(pos, end):
+            ranges.append((pos, end))
+    return targeting.limit_ranges(ranges)
+
+
+def mutant_functions(name):
+    """The functions a mutant name (its metadata, joined with "::") changes, or None if it can't be read."""
+    # C++ function names contain "::" too, but end in ">" and are followed by an offset
+    parts = name.split("::")
+    if parts[-1] == "":
+        parts.pop() # metadata ends with a newline
+    functions = []
+    pos = 0
+    try:
+        while pos < len(parts):
+            end = pos
+            while not (parts[end].endswith(">") and parts[end + 1].lstrip("-").isdigit()):
+                end += 1
+            functions.append("::".join(parts[pos:end + 1]))
+            pos = end + 3 + int(parts[end + 2])
+    except (IndexError, ValueError):
+        return None
+    return functions
+
+
+# The executable being analyzed: its layout, and its function symbols with a hash of the bytes of each
+Build = namedtuple("Build", ["executable", "segments", "symbols", "hashes"])
+
+# The function names in the old cache whose symbol's bytes are the same in this build, and those that changed
+Changes = namedtuple("Changes", ["unchanged", "changed"])
+
+
+class AnalysisCache:
+    """
+    Disassembly, reachability and results for an executable, kept by function so that they can
+    be carried over to a rebuild of it: functions whose bytes are unchanged are not disassembled
+    again, and what was learned about them still holds.  A function's bytes change not only
+    when its source does, but also when code it calls or data it addresses moves.
+    """
+
+    def __init__(self, filename, executable, executable_code, filters):
+        self.filename = filename
+        self.filters = filters
+        try:
+            symbols = elf.read_functions(executable)
+        except (struct.error, ValueError, IndexError):
+            symbols = {}
+        self.build = Build(executable, elf.read_segments(executable), symbols, function_hashes(executable_code, symbols))
+        self.old = self.load()
+        self.functions = {}
+        self.has_graph = False
+        self.names = Changes(set(), set())
+        if self.old is not None:
+            for (symbol, entry) in self.old["functions"].items():
+                if self.build.hashes.get(symbol) == entry["hash"]:
+                    self.names.unchanged.update(entry["names"])
+                else:
+                    self.names.changed.update(entry["names"])
+
+    def load(self):
+        if not os.path.exists(self.filename):
+            return None
+        with open(self.filename, 'rb') as f:
+            cache = pickle.load(f)
+        if cache.get("version") != CACHE_VERSION:
+            print("ANALYSIS CACHE", self.filename, "IS FROM ANOTHER VERSION OF MUTTFUZZ, IGNORING IT")
+            return None
+        if cache["filters"] != self.filters:
+            print("ANALYSIS CACHE", self.filename, "USED DIFFERENT FUNCTION/SOURCE FILTERS, IGNORING IT")
+            return None
+        return cache
+
+    def get_jumps(self, graph=None, flow=None):
+        unchanged = []
+        # A cache made without a call graph has no calls to carry over for unchanged functions
+        if (self.old is not None) and ((graph is None) or self.old["graph"]):
+            unchanged = [name for name in self.build.symbols
+                         if (name in self.old["functions"]) and (self.old["functions"][name]["hash"] == self.build.hashes[name])]
+        if not self.build.symbols:
+            print("NO FUNCTION SYMBOLS IN EXECUTABLE, ANALYZING ALL OF IT")
+        if not unchanged:
+            result = targeting.get_jumps(self.build.executable, *self.filters, graph=graph, flow=flow)
+            self.record(result[0], result[2], graph)
+            return result
+        ranges = changed_ranges(self.build.segments, self.build.symbols, unchanged)
+        starts = [start for (start, _) in ranges]
+        carried_jumps = []
+        carried_reach = {}
+        carried = 0
+        for name in unchanged:
+            (offset, size) = self.build.symbols[name]
+            i = bisect.bisect_right(starts, offset + size - 1) - 1
+            if (i >= 0) and (ranges[i][1] > offset):
+                continue # disassembled again anyway
+            carried += 1
+            entry = self.old["functions"][name]
+            for (function_name, rel) in entry["names"].items():
+                carried_reach[function_name] = offset + rel
+            for (rel, opcode, hexdata, function_name, source) in entry["jumps"]:
+                loc = offset + rel
+                carried_jumps.append((loc, opcode, hexdata, function_name,
+                                      loc - elf.offset_to_vaddr(self.build.segments, loc), source))
+            if graph is not None:
+                for (function_name, (rel, graph_entry)) in entry["graph"].items():
+                    graph.carry(function_name, elf.offset_to_vaddr(self.build.segments, offset + rel), graph_entry)
+        print("REUSING ANALYSIS OF", carried, "UNCHANGED FUNCTIONS OF", len(self.build.symbols), "AND DISASSEMBLING",
+              len(ranges), "CHANGED RANGES")
+        if flow is not None:
+            # Jumps in from code not disassembled would go unseen, so no CFGs are built from part of the code
+            print("NO DOMINATOR PROPAGATION OF REACHABILITY FOR A PARTIAL DISASSEMBLY")
+        address_ranges = []
+        for (start, stop) in ranges:
+            address = elf.offset_to_vaddr(self.build.segments, start)
+            address_ranges.append((address, address + (stop - start)))
+        result = mutate.get_jumps(self.build.executable, *self.filters, ranges=address_ranges,
+                                  carried=(carried_jumps, carried_reach), graph=graph)
+        self.record(result[0], result[2], graph)
+        return result
+
+    def record(self, jumps, function_reach, graph=None):
+        # Everything found, by the function symbol it is in, relative to the start of that symbol
+        by_offset = sorted((offset, size, name) for (name, (offset, size)) in self.build.symbols.items())
+        starts = [offset for (offset, _, _) in by_offset]
+
+        def containing(loc):
+            i = bisect.bisect_right(starts, loc) - 1
+            if (i >= 0) and (loc < by_offset[i][0] + by_offset[i][1]):
+                return by_offset[i]
+            return None
+
+        self.functions = {name: {"hash": self.build.hashes[name], "names": {}, "jumps": [], "graph": {}} for name in self.build.symbols}
+        for (function_name, loc) in function_reach.items():
+            symbol = containing(loc)
+            if symbol is not None:
+                self.functions[symbol[2]]["names"][function_name] = loc - symbol[0]
+        for (loc, jump) in jumps.items():
+            symbol = containing(loc)
+            if symbol is not None:
+                self.functions[symbol[2]]["jumps"].append((loc - symbol[0], jump["opcode"], jump["hexdata"],
+                                                           jump["function_name"], jump["source"]))
+        self.has_graph = graph is not None
+        if graph is not None:
+            for (function_name, address) in graph.starts.items():
+                loc = elf.vaddr_to_offset(self.build.segments, address)
+                symbol = containing(loc) if loc is not None else None
+                if symbol is not None:
+                    self.functions[symbol[2]]["graph"][function_name] = (loc - symbol[0], graph.entry(function_name))
+
+    def stale_mutants(self, directory):
+        """Saved mutants in directory that change a function whose code has changed since they were made."""
+        stale = []
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".metadata"):
+                continue
+            with open(os.path.join(directory, filename), 'r') as f:
+                functions = mutant_functions(f.read().strip().replace("\n", "::"))
+            for function in functions or []:
+                if function in self.names.changed:
+                    stale.append((filename, function))
+                    break
+        return stale
+
+    def carry_over(self, jumps, function_reach, unreach_cache, reach_cache, visited_mutants, analysis_data, score):
+        """Fill in caches and results for unchanged functions from the old analysis; returns the carried verdicts."""
+        if self.old is None:
+            return []
+        state = self.old["state"]
+
+        def loc_of(function_name, rel):
+            if (function_name not in self.names.unchanged) or (function_name not in function_reach):
+                return None
+            loc = function_reach[function_name] + rel
+            return loc if loc in jumps else None
+
+        for function in state["unreach_functions"]:
+            if function in self.names.unchanged:
+                unreach_cache[function] = True
+        for (function_name, rel) in state["unreach_locs"]:
+            loc = loc_of(function_name, rel)
+            if loc is not None:
+                unreach_cache[loc] = True
+        for functions in state["reach_functions"]:
+            if all(function in self.names.unchanged for function in functions):
+                reach_cache[functions] = True
+        for entries in state["reach_locs"]:
+            locs = tuple(loc_of(function_name, rel) for (function_name, rel) in entries)
+            if None not in locs:
+                reach_cache[locs] = True
+        visited = 0
+        for (function_name, rel, changed, _) in state["visited"]:
+            loc = loc_of(function_name, rel)
+            if (loc is not None) and ((loc, changed) not in visited_mutants):
+                # Seen once, however often before, so that --stop_on_repeat still stops on a new repeat
+                visited_mutants[(loc, changed)] = 1
+                visited += 1
+        verdicts = []
+        if state["score"] == score:
+            for verdict in state["verdicts"]:
+                functions = mutant_functions(verdict[0])
+                if functions and all(function in self.names.unchanged for function in functions):
+                    verdicts.append(verdict)
+            analysis_data.extend(verdicts)
+        print("CARRIED OVER", len([k for k in unreach_cache if isinstance(k, str)]), "UNREACHABLE FUNCTIONS,",
+              len(reach_cache), "REACHABILITY RESULTS,", visited, "VISITED MUTANTS AND", len(verdicts), "RESULTS FOR",
+              len(self.names.unchanged), "UNCHANGED FUNCTIONS")
+        return verdicts
+
+    def save(self, jumps, function_reach, unreach_cache, reach_cache, visited_mutants, analysis_data, score):
+        def relative(loc):
+            function_name = jumps[loc]["function_name"]
+            return (function_name, loc - function_reach[function_name])
+
+        state = {"unreach_functions": [k for k in unreach_cache if isinstance(k, str)],
+                 "unreach_locs": [relative(k) for k in unreach_cache if (not isinstance(k, str)) and (k in jumps)],
+                 "reach_functions": [k for k in reach_cache if k and isinstance(k[0], str)],
+                 "reach_locs": [tuple(relative(loc) for loc in k) for k in reach_cache
+                                if k and (not isinstance(k[0], str)) and all(loc in jumps for loc in k)],
+                 "visited": [relative(loc) + (changed, count) for ((loc, changed), count) in visited_mutants.items()
+                             if loc in jumps],
+                 "verdicts": list(analysis_data),
+                 "score": score}
+        cache = {"version": CACHE_VERSION,
+                 "filters": self.filters,
+                 "graph": self.has_graph,
+                 "functions": self.functions,
+                 "state": state}
+        checkpoint.atomic_write(self.filename, pickle.dumps(cache, protocol=pickle.HIGHEST_PROTOCOL))
+        print("SAVED ANALYSIS CACHE FOR", len(self.functions), "FUNCTIONS TO", self.filename)
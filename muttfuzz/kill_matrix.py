@@ -0,0 +1,149 @@
+import json
+import os
+import signal
+import subprocess
+from collections import namedtuple
+
+from muttfuzz import callpool
+from muttfuzz import checkpoint
+from muttfuzz import parallel
+
+
+def run_input(cmd, timeout):
+    # Runs in a pool worker; returns the return code, or None if the input timed out
+    proc = subprocess.Popen(cmd, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        return proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+        return None
+
+
+def bit_count(bits):
+    return bin(bits).count("1")
+
+
+def greedy_cover(columns, universe):
+    """Greedy set cover: indices of columns (bitsets) that together cover universe, biggest first."""
+    chosen = []
+    uncovered = universe
+    while uncovered:
+        best = max(range(len(columns)), key=lambda i: bit_count(columns[i] & uncovered))
+        if (columns[best] & uncovered) == 0:
+            break
+        chosen.append(best)
+        uncovered &= ~columns[best]
+    return chosen
+
+
+# How corpus inputs are run against each mutant, with the pool of processes running them, kept for the whole matrix
+Runs = namedtuple("Runs", ["cmd", "timeout", "pool", "early_stop", "timeout_kills"])
+
+
+class KillMatrix:
+    """
+    Which corpus inputs kill which mutants.  Each mutant is a row of two bitsets over the
+    inputs: those that were run, and those that killed it (a non-zero return code, or a
+    timeout unless timeouts don't count as kills).  Inputs run in parallel, in batches of
+    jobs when stopping at the first kill.  Saved (as hex bitsets) after every mutant.
+    """
+
+    def __init__(self, corpus, cmd, filename="kill_matrix.json", timeout=10.0, jobs=None, early_stop=False,
+                 timeout_kills=True):
+        if "{input}" not in cmd:
+            raise ValueError("kill matrix command must use {input} for the corpus input")
+        self.inputs = sorted(os.path.join(corpus, f) for f in os.listdir(corpus) if os.path.isfile(os.path.join(corpus, f)))
+        self.filename = filename
+        # Workers are only forked when inputs are first run
+        self.runs = Runs(cmd, timeout, callpool.CallPool(jobs if jobs is not None else len(os.sched_getaffinity(0))),
+                         early_stop, timeout_kills)
+        self.valid = (1 << len(self.inputs)) - 1
+        self.mutants = []
+        self.ran = []
+        self.killed = []
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                saved = json.load(f)
+            if saved["inputs"] == self.inputs:
+                self.mutants = saved["mutants"]
+                self.ran = [int(bits, 16) for bits in saved["ran"]]
+                self.killed = [int(bits, 16) for bits in saved["killed"]]
+                print("READ KILL MATRIX FOR", len(self.mutants), "MUTANTS FROM", filename)
+
+    def run_inputs(self, indices):
+        runs = self.runs
+        calls = [(run_input, (parallel.expand_cmd(runs.cmd, input=self.inputs[i]), runs.timeout)) for i in indices]
+        outcomes = runs.pool.run_many(calls, runs.timeout + 60)
+        kills = 0
+        for (i, (status, rc)) in zip(indices, outcomes):
+            if (status != "ok") or (rc is None and runs.timeout_kills) or (rc not in [None, 0]):
+                kills |= 1 << i
+        return kills
+
+    def check_original(self):
+        """Leave out inputs that already fail on the original executable, since they'd kill every mutant."""
+        failing = self.run_inputs(range(len(self.inputs)))
+        self.valid &= ~failing
+        for (i, filename) in enumerate(self.inputs):
+            if failing & (1 << i):
+                print("CORPUS INPUT", filename, "FAILS ON THE ORIGINAL EXECUTABLE, LEAVING IT OUT")
+        print("KILL MATRIX OVER", bit_count(self.valid), "CORPUS INPUTS")
+
+    def run_mutant(self, mutant_name):
+        """Run the inputs against the mutant now in place of the executable; returns how many killed it."""
+        order = [i for i in range(len(self.inputs)) if self.valid & (1 << i)]
+        batch_size = self.runs.pool.processes if self.runs.early_stop else max(1, len(order))
+        ran = 0
+        killed = 0
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            killed |= self.run_inputs(batch)
+            for i in batch:
+                ran |= 1 << i
+            if self.runs.early_stop and killed:
+                break
+        self.mutants.append(mutant_name)
+        self.ran.append(ran)
+        self.killed.append(killed)
+        self.save()
+        print("KILLED BY", bit_count(killed), "OF", bit_count(ran), "INPUTS RUN")
+        return bit_count(killed)
+
+    def save(self):
+        checkpoint.atomic_write(self.filename, json.dumps({"inputs": self.inputs,
+                                                           "mutants": self.mutants,
+                                                           "ran": [format(bits, "x") for bits in self.ran],
+                                                           "killed": [format(bits, "x") for bits in self.killed]}).encode("utf-8"))
+
+    def close(self):
+        self.runs.pool.close()
+
+    def minimal_subset(self):
+        """A (greedy) smallest set of inputs that kills every mutant any input kills."""
+        columns = [0] * len(self.inputs)
+        for (m, killed) in enumerate(self.killed):
+            for i in range(len(self.inputs)):
+                if killed & (1 << i):
+                    columns[i] |= 1 << m
+        universe = 0
+        for (m, killed) in enumerate(self.killed):
+            if killed:
+                universe |= 1 << m
+        return [self.inputs[i] for i in greedy_cover(columns, universe)]
+
+    def report(self):
+        killable = len([killed for killed in self.killed if killed])
+        pairs = sum(bit_count(ran) for ran in self.ran)
+        print()
+        print("KILL MATRIX OF", len(self.mutants), "MUTANTS BY", len(self.inputs), "INPUTS IN", self.filename + ":",
+              killable, "MUTANTS KILLED, AFTER RUNNING", pairs, "MUTANT/INPUT PAIRS")
+        subset = self.minimal_subset()
+        with open(self.filename + ".subset", 'w') as f:
+            for filename in subset:
+                f.write(filename + "\n")
+        print("GREEDY MINIMAL KILLING SUBSET OF", len(subset), "INPUTS (IN", self.filename + ".subset) KILLS ALL",
+              killable, "KILLED MUTANTS")
+        if self.runs.early_stop:
+            print("(WITH EARLY STOPPING, A LATER INPUT MIGHT HAVE KILLED A MUTANT TOO, SO THE SUBSET MAY NOT BE MINIMAL)")
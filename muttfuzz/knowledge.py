@@ -0,0 +1,213 @@
+from muttfuzz import results as mutant_results
+
+
+class Tally:
+    """Hits out of total, overall and for each function: coverage of reachability checks, or kills of executed mutants."""
+
+    def __init__(self):
+        self.functions = {}
+        self.hits = 0.0
+        self.total = 0.0
+
+    def track(self, functions):
+        for function in functions:
+            self.functions[function] = (0.0, 0.0)
+
+    def record(self, functions, hit):
+        # Functions not being tracked (e.g., from an older build) only count toward the overall total
+        self.total += 1.0
+        if hit:
+            self.hits += 1.0
+        for function in functions:
+            if function in self.functions:
+                (hits, total) = self.functions[function]
+                self.functions[function] = (hits + (1.0 if hit else 0.0), total + 1.0)
+
+    def percent(self, function=None):
+        (hits, total) = self.functions[function] if function is not None else (self.hits, self.total)
+        return round((hits / total) * 100.0, 2)
+
+
+class Knowledge:
+    """
+    What a campaign has learned about its mutants: how often each was visited, which functions
+    and jumps are known to be reached or unreachable, and, if tracked, coverage and mutation
+    score tallies.  Checkpoints and the analysis cache save all of it.
+    """
+
+    def __init__(self, coverage=False, score=False):
+        self.visited_mutants = {}
+        self.unreach_cache = {}
+        self.reach_cache = {} # Can only use effectively for order 1 mutants
+        self.coverage = Tally() if coverage else None
+        self.score = Tally() if score else None
+        self.limit_kills = {}
+
+    def track(self, functions):
+        for tally in [self.coverage, self.score]:
+            if tally is not None:
+                tally.track(functions)
+
+    def mark_unreachable(self, function, cache_file=None):
+        self.unreach_cache[function] = True
+        if cache_file is not None:
+            with open(cache_file, 'a') as f:
+                f.write(function + "\n")
+
+    def read_unreachable(self, cache_file):
+        print("READING UNREACHABLE FUNCTION CACHE")
+        with open(cache_file, 'r') as f:
+            for line in f:
+                self.unreach_cache[line.split("\n")[0]] = True
+        print("READ", len(self.unreach_cache), "UNREACHABLE FUNCTIONS")
+
+    def propagate(self, control_flow, function_map, mutant, reached):
+        """Cache the verdict on the mutant's jumps for every jump it implies, by dominance, has the same one."""
+        implied = set()
+        for (function, loc) in zip(mutant.functions, mutant.locs):
+            implied.update(control_flow.implied(function, function_map[function], loc, reached))
+        new = 0
+        for loc in implied:
+            if reached and ((loc,) not in self.reach_cache):
+                self.reach_cache[(loc,)] = True
+                new += 1
+            elif (not reached) and (loc not in self.unreach_cache):
+                self.unreach_cache[loc] = True
+                new += 1
+        if new > 0:
+            print("DOMINATORS IMPLY", new, "MORE", "REACHED" if reached else "UNREACHABLE", "JUMPS")
+
+    def record_kill(self, functions, killed, killed_by=None):
+        """Score an executed mutant; a kill by a resource limit (not a crash) is also counted apart."""
+        self.score.record(functions, killed)
+        if killed and (killed_by is not None) and (killed_by != "timeout"):
+            self.limit_kills[killed_by] = self.limit_kills.get(killed_by, 0) + 1
+
+    def state(self):
+        return {"visited_mutants": self.visited_mutants,
+                "unreach_cache": self.unreach_cache,
+                "reach_cache": self.reach_cache,
+                "reachability_checks": self.coverage.total if self.coverage is not None else 0.0,
+                "reachability_hits": self.coverage.hits if self.coverage is not None else 0.0,
+                "function_coverage": self.coverage.functions if self.coverage is not None else None,
+                "function_score": self.score.functions if self.score is not None else None,
+                "mutants_run": self.score.total if self.score is not None else 0.0,
+                "mutants_killed": self.score.hits if self.score is not None else 0.0,
+                "limit_kills": self.limit_kills}
+
+    def restore(self, resumed):
+        self.visited_mutants = resumed["visited_mutants"]
+        self.unreach_cache = resumed["unreach_cache"]
+        self.reach_cache = resumed["reach_cache"]
+        if self.coverage is not None:
+            self.coverage.total = resumed["reachability_checks"]
+            self.coverage.hits = resumed["reachability_hits"]
+            self.coverage.functions.update(resumed["function_coverage"])
+        if self.score is not None:
+            self.score.functions.update(resumed["function_score"])
+            self.score.total = resumed["mutants_run"]
+            self.score.hits = resumed["mutants_killed"]
+            self.limit_kills = resumed.get("limit_kills", {}) # not in checkpoints from before limits
+
+    def summary(self):
+        """Overall coverage, score and cache sizes, for the status endpoint."""
+        snapshot = {"coverage": None, "score": None,
+                    "caches": {"reach": len(self.reach_cache), "unreach": len(self.unreach_cache),
+                               "visited": len(self.visited_mutants)}}
+        if (self.coverage is not None) and (self.coverage.total > 0):
+            snapshot["coverage"] = {"checks": int(self.coverage.total), "hits": int(self.coverage.hits),
+                                    "percent": self.coverage.percent()}
+        if (self.score is not None) and (self.score.total > 0):
+            snapshot["score"] = {"run": int(self.score.total), "killed": int(self.score.hits),
+                                 "percent": self.score.percent(), "limit_kills": dict(self.limit_kills)}
+        return snapshot
+
+    def function_tables(self, function_map):
+        """Jumps, reachability, coverage and score of each function, for the status endpoint."""
+        # Copies, since the campaign goes on changing these while the snapshot is taken
+        coverage_table = dict(self.coverage.functions) if self.coverage is not None else {}
+        score_table = dict(self.score.functions) if self.score is not None else {}
+        unreach = dict(self.unreach_cache)
+        tables = {}
+        for (function, function_jumps) in list(function_map.items()):
+            table = {"jumps": len(function_jumps), "unreachable": function in unreach}
+            if function in coverage_table:
+                (hits, total) = coverage_table[function]
+                table["coverage"] = {"checks": int(total), "hits": int(hits)}
+            if function in score_table:
+                (kills, total) = score_table[function]
+                table["score"] = {"run": int(total), "killed": int(kills)}
+            tables[function] = table
+        return tables
+
+    def report(self, function_map, analysis_data, save_results=None, verbose=False, eval_stats=None):
+        final_report(function_map, self.unreach_cache, self.visited_mutants, analysis_data,
+                     self.coverage.functions if self.coverage is not None else None,
+                     self.coverage.total if self.coverage is not None else 0,
+                     self.coverage.hits if self.coverage is not None else 0,
+                     self.score.functions if self.score is not None else None,
+                     self.score.total if self.score is not None else 0,
+                     self.score.hits if self.score is not None else 0,
+                     save_results, verbose, eval_stats)
+
+
+def final_report(function_map, unreach_cache, visited_mutants, analysis_data,
+                 function_coverage=None, reachability_checks=0, reachability_hits=0,
+                 function_score=None, mutants_run=0, mutants_killed=0,
+                 save_results=None, verbose=False, eval_stats=None):
+    if function_coverage is not None:
+        print()
+        for function, (hits, total) in function_coverage.items():
+            if total > 0:
+                print(function + ":", str(round((hits / total) * 100.0, 2)) + "% COVERAGE (OUT OF",
+                      str(int(total)) + ")")
+            else:
+                print(function + ": NO COVERAGE CHECKS")
+        print()
+
+    if function_score is not None:
+        print()
+        for function, (kills, total) in function_score.items():
+            if total > 0:
+                print(function + ":", str(round((kills / total) * 100.0, 2)) + "% MUTATION SCORE (OUT OF",
+                      str(int(total)) + ")")
+            else:
+                if verbose:
+                    print(function + ": NO MUTANTS EXECUTED")
+        print()
+
+    print()
+
+    if function_coverage is not None:
+        unreach_funcs = 0
+        unreach_branches = 0
+        for u in unreach_cache:
+            if u in function_map:
+                print("** FUNCTION", u, "WITH", len(function_map[u]), "BRANCHES UNREACHABLE **")
+                unreach_funcs += 1
+                unreach_branches += len(function_map[u])
+        print()
+        print("TOTAL OF", unreach_funcs, "FUNCTIONS WITH", unreach_branches, "BRANCHES ARE UNREACHABLE")
+        print()
+
+        if reachability_checks > 0:
+            print("FINAL COVERAGE OVER", int(reachability_checks), "MUTANTS:",
+                  str(round((reachability_hits / reachability_checks) * 100.0, 2)) + "%")
+    if function_score is not None:
+        if mutants_run > 0:
+            print("FINAL MUTATION SCORE OVER", int(mutants_run), "EXECUTED MUTANTS:",
+                    str(round((mutants_killed / mutants_run) * 100.0, 2)) + "%")
+        else:
+            print("NO MUTANTS EXECUTED!")
+
+    visits = visited_mutants.values()
+    if visits:
+        print("MAXIMUM VISITS TO A MUTANT:", max(visits))
+        print("MEAN VISITS TO A MUTANT:", round(sum(visits) / (len(visits) * 1.0), 2))
+    if eval_stats is None:
+        eval_stats = mutant_results.RunningStats(d[1] for d in analysis_data)
+    if eval_stats.count > 0:
+        print("MEAN TIME FOR MUTANT EVALUATION:", round(eval_stats.mean, 2), "SECONDS (STANDARD DEVIATION",
+              str(round(eval_stats.stddev(), 2)) + ", RANGE", round(eval_stats.min, 2), "-", str(round(eval_stats.max, 2)) + ")")
+    if save_results is not None:
+        mutant_results.write_results(save_results, analysis_data)
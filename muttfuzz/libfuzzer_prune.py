@@ -1,33 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import glob
 import os
+import shlex
 import shutil
 import signal
 import subprocess
 import sys
+import tempfile
 import time
 
 # Simpler version than in main muttfuzz
 def silent_run_with_timeout(cmd, timeout):
     start_P = time.time()
-    try:
-        with open("cmd_out.txt", 'w') as cmd_out:
+    P = None
+    with tempfile.TemporaryFile(mode='w+') as cmd_out:
+        try:
             P = subprocess.Popen(cmd, shell=True, preexec_fn=os.setsid,
                                  stdout=cmd_out, stderr=cmd_out)
-            while (P.poll() is None) and ((time.time() - start_P) < timeout):
-                time.sleep(min(0.5, timeout / 10.0)) # Allow for small timeouts
-            if P.poll() is None:
+            try:
+                # Bisection makes many short runs, so wait on the process rather than polling
+                P.wait(timeout=max(0.0, timeout - (time.time() - start_P)))
+            except subprocess.TimeoutExpired:
                 os.killpg(os.getpgid(P.pid), signal.SIGTERM)
-        with open("cmd_out.txt", 'r') as cmd_out:
+                P.wait()
+            cmd_out.seek(0)
             try:
-                cmd_out = cmd_out.read()
+                output = cmd_out.read()
             except: #pylint: disable=W0702
-                cmd_out = "ERROR READING OUTPUT"
-    finally:
-        if P.poll() is None:
-            print("KILLING SUBPROCESS DUE TO TIMEOUT")
-            os.killpg(os.getpgid(P.pid), signal.SIGTERM)
+                output = "ERROR READING OUTPUT"
+        finally:
+            if (P is not None) and (P.poll() is None):
+                print("KILLING SUBPROCESS DUE TO TIMEOUT")
+                os.killpg(os.getpgid(P.pid), signal.SIGTERM)
+                P.wait()
+
+    return (output, P.returncode)
+
+
+def link_corpus(files, new_corpus_dir):
+    # Hardlinks cost no data copying; fall back to a copy across filesystems
+    new_files = []
+    for f in files:
+        new_f = os.path.join(new_corpus_dir, os.path.basename(f))
+        if os.path.lexists(new_f):
+            os.remove(new_f)
+        try:
+            os.link(f, new_f)
+        except OSError:
+            shutil.copy(f, new_f)
+        new_files.append(new_f)
+    return new_files
+
+
+def last_running(output):
+    last_run = None
+    for line in output.split("\n"):
+        if "Running" in line:
+            last_run = line.split()[1]
+    return last_run
 
-    return (cmd_out, P.returncode)
+
+def find_failing(fuzz_cmd, timeout, files, jobs, max_failing):
+    """
+    Find the inputs in files that fail, by running shards of the corpus in parallel and
+    bisecting any shard that fails.  Returns None if more than max_failing inputs fail.
+    """
+    # Beside the corpus, so the shards can be hardlinked
+    shard_parent = os.path.dirname(os.path.dirname(os.path.abspath(files[0]))) if files else "."
+
+    def run(inputs):
+        # Each shard is hardlinked into its own directory and passed as a glob, as the whole corpus
+        # used to be; the names themselves in one sh -c string can exceed the argument size limit
+        shard_dir = tempfile.mkdtemp(prefix=".shard_", dir=shard_parent)
+        try:
+            originals = dict(zip(link_corpus(inputs, shard_dir), inputs))
+            start = time.time()
+            (output, r) = silent_run_with_timeout(fuzz_cmd + " " + shlex.quote(shard_dir) + "/*", timeout)
+            run_time = time.time() - start
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+        return (inputs, originals.get(last_running(output)), r, run_time)
+
+    failing = []
+    runs = 0
+    splits = {} # for each half of a bisected shard, the record of the shard it came from
+    shard_size = max(1, -(-len(files) // jobs))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = set(executor.submit(run, files[i:i + shard_size]) for i in range(0, len(files), shard_size))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                (inputs, last_run, r, run_time) = future.result()
+                runs += 1
+                split = splits.pop(future, None)
+                if r == 0:
+                    if split is not None:
+                        split["passed"] += 1
+                        if split["passed"] == 2:
+                            # The halves pass on their own, so the failure depends on running them together
+                            culprit = split["last_run"]
+                            if culprit not in split["inputs"]:
+                                culprit = split["inputs"][-1]
+                            print("FAILURE ONLY WHEN RUN WITH OTHER INPUTS, REMOVING", culprit)
+                            failing.append(culprit)
+                elif len(inputs) == 1:
+                    print("FOUND FAILING INPUT", inputs[0], "(" + str(round(run_time, 2)), "SECONDS)")
+                    failing.append(inputs[0])
+                else:
+                    mid = len(inputs) // 2
+                    split = {"inputs": inputs, "last_run": last_run, "passed": 0}
+                    for half in (inputs[:mid], inputs[mid:]):
+                        half_future = executor.submit(run, half)
+                        splits[half_future] = split
+                        pending.add(half_future)
+                if len(failing) > max_failing:
+                    for p in pending:
+                        p.cancel()
+                    return None
+    print("BISECTION USED", runs, "RUNS")
+    return failing
 
 
 def main():
@@ -38,9 +129,10 @@ def main():
         new_corpus_dir = sys.argv[4]
         min_pruned = int(sys.argv[5])
         max_pruned = int(sys.argv[6])
+        jobs = int(sys.argv[7]) if len(sys.argv) > 7 else os.cpu_count()
     except IndexError:
         print("This tool takes a libfuzzer harness and a corpus, and produces a subset of that corpus that does not fail.")
-        print("USAGE: libfuzzer_prune <fuzz_cmd> <timeout> <initial_corpus_dir> <target_corpus_dir> <min_failing> <max_failing>")
+        print("USAGE: libfuzzer_prune <fuzz_cmd> <timeout> <initial_corpus_dir> <target_corpus_dir> <min_failing> <max_failing> [<jobs>]")
         sys.exit(1)
 
     if not os.path.exists(new_corpus_dir):
@@ -49,7 +141,7 @@ def main():
     with open(os.path.join(new_corpus_dir, "test"), 'w') as f:
         f.write("0")
 
-    (output, r) = silent_run_with_timeout(fuzz_cmd + " " + os.path.join(new_corpus_dir, "test"), timeout)
+    (_, r) = silent_run_with_timeout(fuzz_cmd + " " + os.path.join(new_corpus_dir, "test"), timeout)
     os.remove(os.path.join(new_corpus_dir, "test"))
     if r != 0:
         print("MUTANT KILLED WITH TEST INPUT")
@@ -57,31 +149,27 @@ def main():
 
     pruned = 0
 
-    files = glob.glob(corpus_dir + "/*")
-    print("SUBSETTING CORPUS WITH", len(files), "FILES...")
+    files = sorted(glob.glob(corpus_dir + "/*"))
+    print("SUBSETTING CORPUS WITH", len(files), "FILES USING", jobs, "JOBS...")
 
-    for f in files:
-        shutil.copy(f, os.path.join(new_corpus_dir, os.path.basename(f)))
+    remaining = link_corpus(files, new_corpus_dir)
 
-    while True:
+    while remaining:
         start = time.time()
-        (output, r) = silent_run_with_timeout(fuzz_cmd + " " + new_corpus_dir + "/*", timeout)
-        finish = time.time()
-        print("TESTS EXECUTED IN", round(finish - start, 2), "SECONDS")
-        if r == 0:
-            print("TESTS PASS!")
-            break
-        last_run = None
-        for line in output.split("\n"):
-            if "Running" in line:
-                last_run = line.split()[1]
-        print("REMOVING", last_run)
-        pruned += 1
-        if pruned > max_pruned:
+        failing = find_failing(fuzz_cmd, timeout, remaining, jobs, max_pruned - pruned)
+        print("TESTS EXECUTED IN", round(time.time() - start, 2), "SECONDS")
+        if failing is None:
             print("TOO MANY INPUTS FAIL")
             sys.exit(2)
-        if last_run is not None:
-            os.remove(last_run)
+        if not failing:
+            print("TESTS PASS!")
+            break
+        for f in failing:
+            print("REMOVING", f)
+            os.remove(f)
+        pruned += len(failing)
+        failing = set(failing)
+        remaining = [f for f in remaining if f not in failing]
 
     if pruned < min_pruned:
         print("TOO FEW INPUTS FAIL")
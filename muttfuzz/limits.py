@@ -0,0 +1,222 @@
+import atexit
+from collections import namedtuple
+import itertools
+import os
+import resource
+import signal
+import time
+
+# Limits on one run of a command (and everything it starts); None means no limit
+Limits = namedtuple("Limits", ["memory", "cpu", "pids", "file_size"])
+
+SIZE_SUFFIXES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+# What a command killed by a limit (rather than a crash or a timeout) is reported as
+MEMORY = "memory"
+CPU = "cpu"
+PIDS = "pids"
+FILE_SIZE = "file_size"
+
+# Without a cgroup, running out of memory or processes is only visible in what the command says
+MEMORY_MESSAGES = ["out of memory", "out-of-memory", "bad_alloc", "cannot allocate memory", "memoryerror"]
+PIDS_MESSAGES = ["cannot fork", "fork: retry", "fork: resource temporarily unavailable"]
+
+
+def parse_size(text):
+    """Bytes, for a size like 512M or 2G (or a plain number of bytes); None for None."""
+    if text is None:
+        return None
+    text = text.strip().upper().rstrip("B")
+    if text and (text[-1] in SIZE_SUFFIXES):
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def cgroup2_mount():
+    # Where the unified hierarchy is mounted (/sys/fs/cgroup, or /sys/fs/cgroup/unified on hybrid systems)
+    try:
+        with open("/proc/self/mountinfo", 'r') as f:
+            for line in f:
+                fields = line.split()
+                if fields[fields.index("-") + 1] == "cgroup2":
+                    return fields[4]
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def own_cgroup():
+    try:
+        with open("/proc/self/cgroup", 'r') as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return None
+
+
+def signalled(returncode, signum):
+    # Directly, or reported by the shell running the command as 128 + signal
+    return returncode in [-signum, 128 + signum]
+
+
+class Limiter:
+    """
+    Applies Limits to each run of a command.  Memory and process limits use a cgroup v2
+    sub-tree (one child cgroup per run, so they cover everything the command starts) when
+    the unified hierarchy is writable and has the memory and pids controllers; otherwise
+    they fall back to RLIMIT_AS and RLIMIT_NPROC on each process.  CPU time and file size
+    always use RLIMIT_CPU and RLIMIT_FSIZE.  After a run, killed_by() says which limit
+    (if any) it hit.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.runs = itertools.count()
+        self.base = None
+        if (limits.memory is not None) or (limits.pids is not None):
+            self.base = self.make_cgroup()
+            if self.base is not None:
+                atexit.register(self.cleanup)
+
+    def describe(self):
+        parts = []
+        if self.limits.memory is not None:
+            parts.append("MEMORY " + str(self.limits.memory // (1 << 20)) + "MB")
+        if self.limits.cpu is not None:
+            parts.append("CPU " + str(self.limits.cpu) + "s")
+        if self.limits.pids is not None:
+            parts.append("PIDS " + str(self.limits.pids))
+        if self.limits.file_size is not None:
+            parts.append("FILE SIZE " + str(self.limits.file_size // (1 << 20)) + "MB")
+        return ", ".join(parts) + (" (CGROUP " + self.base + ")" if self.base is not None else " (RLIMITS)")
+
+    def make_cgroup(self):
+        mount = cgroup2_mount()
+        path = own_cgroup()
+        if (mount is None) or (path is None):
+            return None
+        parent = os.path.join(mount, path.lstrip("/"))
+        needed = [controller for (controller, limit) in [("memory", self.limits.memory), ("pids", self.limits.pids)]
+                  if limit is not None]
+        base = os.path.join(parent, "muttfuzz_" + str(os.getpid()))
+        try:
+            with open(os.path.join(parent, "cgroup.controllers"), 'r') as f:
+                if not all(controller in f.read().split() for controller in needed):
+                    return None
+            with open(os.path.join(parent, "cgroup.subtree_control"), 'r') as f:
+                enabled = f.read().split()
+            missing = [controller for controller in needed if controller not in enabled]
+            if missing:
+                # Only allowed if the parent has no processes of its own (or is the root)
+                with open(os.path.join(parent, "cgroup.subtree_control"), 'w') as f:
+                    f.write(" ".join("+" + controller for controller in missing))
+            os.mkdir(base)
+            with open(os.path.join(base, "cgroup.subtree_control"), 'w') as f:
+                f.write(" ".join("+" + controller for controller in needed))
+        except OSError:
+            if os.path.isdir(base):
+                os.rmdir(base)
+            return None
+        return base
+
+    def start(self):
+        """Make what a new run needs; returns it, to pass to preexec() and killed_by()."""
+        if self.base is None:
+            return None
+        run = os.path.join(self.base, "run_" + str(next(self.runs)))
+        os.mkdir(run)
+        if self.limits.memory is not None:
+            write_value(os.path.join(run, "memory.max"), self.limits.memory)
+            if os.path.exists(os.path.join(run, "memory.swap.max")):
+                write_value(os.path.join(run, "memory.swap.max"), 0)
+        if self.limits.pids is not None:
+            write_value(os.path.join(run, "pids.max"), self.limits.pids)
+        return run
+
+    def preexec(self, run, setup=os.setsid):
+        """A preexec_fn for subprocess.Popen that runs setup, then puts the new process under the limits."""
+        limits = self.limits
+
+        def apply():
+            setup()
+            if run is not None:
+                with open(os.path.join(run, "cgroup.procs"), 'w') as f:
+                    f.write(str(os.getpid()))
+            else:
+                if limits.memory is not None:
+                    resource.setrlimit(resource.RLIMIT_AS, (limits.memory, limits.memory))
+                if limits.pids is not None:
+                    resource.setrlimit(resource.RLIMIT_NPROC, (limits.pids, limits.pids))
+            if limits.cpu is not None:
+                # SIGXCPU at the soft limit; the hard limit is a SIGKILL for commands that ignore it
+                resource.setrlimit(resource.RLIMIT_CPU, (int(limits.cpu), int(limits.cpu) + 5))
+            if limits.file_size is not None:
+                resource.setrlimit(resource.RLIMIT_FSIZE, (limits.file_size, limits.file_size))
+
+        return apply
+
+    def killed_by(self, run, returncode, errors=""):
+        """Which limit the run hit, or None; also removes the run's cgroup."""
+        limit = None
+        if run is not None:
+            if (self.limits.memory is not None) and (read_event(os.path.join(run, "memory.events"), "oom_kill") > 0):
+                limit = MEMORY
+            elif (self.limits.pids is not None) and (read_event(os.path.join(run, "pids.events"), "max") > 0):
+                limit = PIDS
+            remove_cgroup(run)
+        elif (self.limits.memory is not None) and any(m in errors.lower() for m in MEMORY_MESSAGES):
+            limit = MEMORY
+        elif (self.limits.pids is not None) and any(m in errors.lower() for m in PIDS_MESSAGES):
+            limit = PIDS
+        if limit is None:
+            if (self.limits.cpu is not None) and signalled(returncode, signal.SIGXCPU):
+                limit = CPU
+            elif (self.limits.file_size is not None) and signalled(returncode, signal.SIGXFSZ):
+                limit = FILE_SIZE
+        return limit
+
+    def cleanup(self):
+        if (self.base is not None) and os.path.isdir(self.base):
+            for run in os.listdir(self.base):
+                if os.path.isdir(os.path.join(self.base, run)):
+                    remove_cgroup(os.path.join(self.base, run))
+            try:
+                os.rmdir(self.base)
+            except OSError:
+                pass
+
+
+def write_value(filename, value):
+    with open(filename, 'w') as f:
+        f.write(str(value))
+
+
+def read_event(filename, name):
+    try:
+        with open(filename, 'r') as f:
+            for line in f:
+                (key, value) = line.split()
+                if key == name:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def remove_cgroup(run):
+    # Anything still in it (e.g., a forked child that outlived the command) is killed first
+    if os.path.exists(os.path.join(run, "cgroup.kill")):
+        try:
+            write_value(os.path.join(run, "cgroup.kill"), 1)
+        except OSError:
+            pass
+    for _ in range(20):
+        try:
+            os.rmdir(run)
+            return
+        except FileNotFoundError:
+            return
+        except OSError:
+            time.sleep(0.05) # left for cleanup() to retry
@@ -0,0 +1,290 @@
+import argparse
+from collections import namedtuple
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+
+from muttfuzz import elf
+from muttfuzz import commands
+from muttfuzz import fuzzutil
+from muttfuzz import mutate
+from muttfuzz import targeting
+
+MUTANT_VARIABLE = "MUTTFUZZ_MUTANT"
+
+# Every jump has the same number of variants, so a mutant id is just jump * VARIANTS + variant
+VARIANTS = 7
+MAX_VARIANT = 6
+ENTRY_SIZE = 64
+HEADER_SIZE = 32
+
+# Runs before the original entry point: finds MUTTFUZZ_MUTANT=id[,id...] in the environment on
+# the initial stack, and for each id copies the variant's bytes over its jump (mprotecting
+# the page writable, then back), then jumps to the original entry point with rdx and rsp as
+# the kernel (or dynamic linker) left them.  The header and table of jumps follow the code:
+#   header: u64 link address of stub, u64 original entry, u64 number of jumps, u64 unused
+#   entry:  u64 link address of jump, u8[7] variant lengths, u8 unused, u8[7][6] variant bytes, padding to 64
+STUB_ASM = """
+        .text
+        .globl stub
+stub:
+        mov %rdx, %r15
+        lea stub(%rip), %r12
+        lea header(%rip), %r13
+        sub (%r13), %r12
+        mov (%rsp), %rax
+        lea 16(%rsp,%rax,8), %rbx
+env_loop:
+        mov (%rbx), %rsi
+        test %rsi, %rsi
+        jz done
+        add $8, %rbx
+        lea name(%rip), %rdi
+        mov $16, %ecx
+cmp_loop:
+        mov (%rdi), %al
+        cmp (%rsi), %al
+        jne env_loop
+        inc %rdi
+        inc %rsi
+        dec %ecx
+        jnz cmp_loop
+parse:
+        xor %ebp, %ebp
+        xor %r8d, %r8d
+digit_loop:
+        movzbl (%rsi), %eax
+        inc %rsi
+        cmp $0x30, %al
+        jb not_digit
+        cmp $0x39, %al
+        ja not_digit
+        imul $10, %rbp, %rbp
+        sub $0x30, %eax
+        add %rax, %rbp
+        mov $1, %r8d
+        jmp digit_loop
+not_digit:
+        mov %rax, %r9
+        test %r8d, %r8d
+        jz after_apply
+        call apply
+after_apply:
+        cmp $0x2c, %r9b
+        je parse
+done:
+        mov %r15, %rdx
+        mov 8(%r13), %rax
+        add %r12, %rax
+        jmp *%rax
+apply:
+        push %rsi
+        mov %rbp, %rax
+        xor %edx, %edx
+        mov $7, %ecx
+        div %rcx
+        cmp 16(%r13), %rax
+        jae apply_done
+        shl $6, %rax
+        lea 32(%r13,%rax), %rbx
+        movzbl 8(%rbx,%rdx), %r14d
+        test %r14d, %r14d
+        jz apply_done
+        lea (%rdx,%rdx,2), %rdx
+        lea 16(%rbx,%rdx,2), %r8
+        mov (%rbx), %r10
+        add %r12, %r10
+        mov %r10, %rdi
+        and $-4096, %rdi
+        lea -1(%r10,%r14), %rsi
+        and $-4096, %rsi
+        add $4096, %rsi
+        sub %rdi, %rsi
+        mov $3, %edx
+        mov $10, %eax
+        syscall
+        xor %ecx, %ecx
+copy_loop:
+        mov (%r8,%rcx), %al
+        mov %al, (%r10,%rcx)
+        inc %ecx
+        cmp %r14d, %ecx
+        jb copy_loop
+        mov $5, %edx
+        mov $10, %eax
+        syscall
+apply_done:
+        pop %rsi
+        ret
+        .p2align 3
+name:
+        .ascii "MUTTFUZZ_MUTANT="
+header:
+"""
+
+
+def assemble_stub():
+    # as, ld and objcopy come with binutils, like the objdump MuttFuzz already needs
+    with tempfile.TemporaryDirectory() as d:
+        with open(os.path.join(d, "stub.s"), 'w') as f:
+            f.write(STUB_ASM)
+        subprocess.check_call(["as", "-o", os.path.join(d, "stub.o"), os.path.join(d, "stub.s")])
+        subprocess.check_call(["ld", "-o", os.path.join(d, "stub.elf"), "-Ttext=0", "-e", "stub", os.path.join(d, "stub.o")])
+        subprocess.check_call(["objcopy", "-O", "binary", "-j", ".text", os.path.join(d, "stub.elf"), os.path.join(d, "stub.bin")])
+        with open(os.path.join(d, "stub.bin"), 'rb') as f:
+            return f.read()
+
+
+def variants(hexdata):
+    """Every replacement different_jump can make for a jump, in a fixed order."""
+    if hexdata[0] == 15: # NEAR JUMP
+        return [j for j in mutate.NEAR_JUMPS if j[1] != hexdata[1]] + [mutate.NOP * len(hexdata)]
+    return [j for j in mutate.SHORT_JUMPS if j[0] != hexdata[0]] + [mutate.NOP * len(hexdata)]
+
+
+def mutant_id(jumps, loc, new_data):
+    return (jumps.find(loc) * VARIANTS) + variants(jumps[loc]["hexdata"]).index(bytes(new_data))
+
+
+def mutant_ids(jumps, function_reach, metadata):
+    """The MUTTFUZZ_MUTANT value for a (possibly higher-order) mutant, from its metadata."""
+    ids = []
+    fields = metadata.split("\n")
+    pos = 0
+    while (pos + 3) < len(fields):
+        loc = int(fields[pos + 1]) + function_reach[fields[pos]]
+        data_len = int(fields[pos + 2])
+        new_data = bytes(int(field) for field in fields[pos + 3:pos + 3 + data_len])
+        ids.append(str(mutant_id(jumps, loc, new_data)))
+        pos += 3 + data_len
+    return ",".join(ids)
+
+
+def align(n, alignment=4096):
+    return (n + alignment - 1) & ~(alignment - 1)
+
+
+def build(code, segments, jumps):
+    """
+    The code of a meta-mutant: the executable, plus a new loadable segment holding the stub
+    and a table of every variant of every jump, with the entry point moved to the stub.
+    The program header for the new segment replaces a PT_NOTE, which nothing needs to run.
+    """
+    code = bytearray(code)
+    (entry, phoff) = struct.unpack_from("<QQ", code, 0x18)
+    (phentsize, phnum) = struct.unpack_from("<HH", code, 0x36)
+    phdrs = [bytes(code[phoff + (i * phentsize):phoff + ((i + 1) * phentsize)]) for i in range(phnum)]
+    types = [struct.unpack_from("<I", p, 0)[0] for p in phdrs]
+    if elf.PT_NOTE not in types:
+        raise ValueError("executable has no PT_NOTE program header to replace with the meta-mutant segment")
+
+    offset = align(len(code))
+    vaddr = align(max(v + memsz for (v, _, _, memsz, _) in segments))
+    stub = assemble_stub()
+    table = bytearray(struct.pack("<QQQQ", vaddr, entry, len(jumps), 0))
+    for (loc, jump) in jumps.items():
+        jump_variants = variants(jump["hexdata"])
+        table += struct.pack("<Q", elf.offset_to_vaddr(segments, loc))
+        table += bytes(len(v) for v in jump_variants) + b"\0"
+        table += b"".join(v.ljust(MAX_VARIANT, b"\0") for v in jump_variants)
+        table += b"\0" * (ENTRY_SIZE - 16 - (VARIANTS * MAX_VARIANT))
+    segment = stub + bytes(table)
+
+    # Keep the PT_LOADs in address order, with the new one last
+    note = len(types) - 1 - types[::-1].index(elf.PT_NOTE)
+    del phdrs[note]
+    del types[note]
+    last_load = len(types) - 1 - types[::-1].index(elf.PT_LOAD)
+    phdrs.insert(last_load + 1, struct.pack("<IIQQQQQQ", elf.PT_LOAD, elf.PF_R | elf.PF_X, offset, vaddr, vaddr,
+                                            len(segment), len(segment), 4096))
+    code[phoff:phoff + (phnum * phentsize)] = b"".join(phdrs)
+    struct.pack_into("<Q", code, 0x18, vaddr)
+    code += b"\0" * (offset - len(code))
+    code += segment
+    return code
+
+
+class Installer:
+    """Puts a meta-mutant in place of the executable, writing it again only after something else replaced it."""
+
+    def __init__(self, code, filename, executable):
+        self.code = code
+        self.filename = filename
+        self.executable = executable
+        self.installed = False
+
+    def install(self):
+        if not self.installed:
+            with open(self.filename, 'wb') as f:
+                f.write(self.code)
+            os.chmod(self.filename, os.stat(self.executable).st_mode)
+            commands.install_executable(self.filename, self.executable)
+            self.installed = True
+
+    def replaced(self):
+        self.installed = False
+
+
+def write_manifest(filename, jumps, function_reach):
+    # One line per mutant id: the id, then the mutant's name (its metadata, joined with "::")
+    with open(filename, 'w') as f:
+        for (index, (loc, jump)) in enumerate(jumps.items()):
+            function = jump["function_name"]
+            for (variant, new_data) in enumerate(variants(jump["hexdata"])):
+                f.write(str((index * VARIANTS) + variant) + " " + function + "::" + str(loc - function_reach[function]) +
+                        "::" + str(len(new_data)) + "::" + "::".join(str(b) for b in new_data) + "::\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('executable', metavar='filename', type=str, default=None,
+                        help='executable to build a meta-mutant of')
+    parser.add_argument('meta_executable', metavar='filename', type=str, default=None,
+                        help='meta-mutant executable name (mutant ids are listed in <name>.mutants)')
+    parser.add_argument('--only_mutate', type=str, default=None,
+                        help='string with comma delimited list of patterns for functions to mutate')
+    parser.add_argument('--avoid_mutating', type=str, default=None,
+                        help='string with comma delimited list of patterns for functions to avoid mutating')
+    parser.add_argument('--skip_default_avoid', action='store_true',
+                        help='do not avoid mutating the functions fuzz_with_mutants avoids by default')
+
+    parsed_args = parser.parse_args(sys.argv[1:])
+    return (parsed_args, parser)
+
+
+def make_config(pargs):
+    """
+    Process the raw arguments, returning a namedtuple object holding the
+    entire configuration, if everything parses correctly.
+    """
+    pdict = pargs.__dict__
+    # create a namedtuple object for fast attribute lookup
+    key_list = list(pdict.keys())
+    arg_list = [pdict[k] for k in key_list]
+    Config = namedtuple('Config', key_list)
+    nt_config = Config(*arg_list)
+    return nt_config
+
+
+def main():
+    parsed_args, _ = parse_args()
+    config = make_config(parsed_args)
+    avoid_mutating = config.avoid_mutating.split(",") if config.avoid_mutating else []
+    if not config.skip_default_avoid:
+        avoid_mutating.extend(fuzzutil.DEFAULT_AVOID_MUTATING)
+    (jumps, _, function_reach) = targeting.get_jumps(config.executable,
+                                                     config.only_mutate.split(",") if config.only_mutate else None,
+                                                     avoid_mutating)
+    code = build(mutate.get_code(config.executable), elf.read_segments(config.executable), jumps)
+    with open(config.meta_executable, 'wb') as f:
+        f.write(code)
+    os.chmod(config.meta_executable, os.stat(config.executable).st_mode)
+    write_manifest(config.meta_executable + ".mutants", jumps, function_reach)
+    print("BUILT META-MUTANT", config.meta_executable, "WITH", len(jumps) * VARIANTS, "MUTANTS OF", len(jumps), "JUMPS;",
+          "RUN IT WITH", MUTANT_VARIABLE + "=<id> (IDS ARE IN", config.meta_executable + ".mutants)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
+from array import array
+import bisect
 import random
+import re
 import subprocess
 
 JUMP_OPCODES = ["je", "jne", "jl", "jle", "jg", "jge"]
@@ -20,6 +23,9 @@ HALT_OP = HALT[0]
 INSTRUMENTATION_SET = ["__afl", "__asan", "__ubsan", "__sanitizer", "__lsan", "__sancov", "AFL_"]
 INSTRUMENTATION_SET.extend(["DeepState", "deepstate"])
 
+# objdump labels code in the middle of a function as "<function+0x10>"
+CONTINUED_FUNCTION = re.compile(r"\+0x[0-9a-f]+>$")
+
 def sans_arguments(s):
     pos = len(s) - 1
     lcount = 0
@@ -34,8 +40,170 @@ def sans_arguments(s):
         pos -= 1
     return s
 
+class Jump:
+    """A read-only, dict-like view of one row of a JumpTable."""
+
+    __slots__ = ["table", "index"]
+
+    FIELDS = ["opcode", "hexdata", "function_name", "source", "code"]
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        if key == "opcode":
+            return JUMP_OPCODES[self.table.opcodes[self.index]]
+        if key == "hexdata":
+            start = self.table.hex_offsets[self.index]
+            return bytes(self.table.hexdata[start:start + self.table.lengths[self.index]])
+        if key == "function_name":
+            return self.table.function_names[self.table.functions[self.index]]
+        if key == "source":
+            return self.table.source_names[self.table.sources[self.index]]
+        if key == "code":
+            return self.table.code(self.index)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.FIELDS)
+
+    def items(self):
+        return [(key, self[key]) for key in self.FIELDS]
+
+
+# One attribute per column and string table is the point of the class
+class JumpTable: #pylint: disable=too-many-instance-attributes
+    """
+    All the mutable jumps of an executable, keyed by file offset, stored as parallel array columns
+    with interned function and source names, so that binaries with millions of jumps stay small.
+    Behaves like the dict of dicts get_jumps used to return; the text of a jump ("code") is only
+    made, from the stored bytes of the original, when asked for.
+    """
+
+    def __init__(self):
+        self.locs = array('q')
+        self.opcodes = array('B')
+        self.lengths = array('B')
+        self.functions = array('l')
+        self.sources = array('l')
+        self.hex_offsets = array('Q')
+        self.hexdata = bytearray()
+        self.function_names = []
+        self.function_deltas = array('q') # file offset - address, to show a jump's address
+        self.source_names = []
+        self.function_index = {}
+        self.source_index = {}
+
+    def add_function(self, function_name, delta):
+        if (function_name, delta) not in self.function_index:
+            self.function_index[(function_name, delta)] = len(self.function_names)
+            self.function_names.append(function_name)
+            self.function_deltas.append(delta)
+        return self.function_index[(function_name, delta)]
+
+    def add_source(self, source):
+        if source not in self.source_index:
+            self.source_index[source] = len(self.source_names)
+            self.source_names.append(source)
+        return self.source_index[source]
+
+    def add(self, loc, opcode, hexdata, function, source):
+        self.locs.append(loc)
+        self.opcodes.append(JUMP_OPCODES.index(opcode))
+        self.lengths.append(len(hexdata))
+        self.functions.append(function)
+        self.sources.append(source)
+        self.hex_offsets.append(len(self.hexdata))
+        self.hexdata.extend(hexdata)
+
+    def finish(self):
+        # objdump output is nearly always in file order already; otherwise sort so lookups can bisect
+        if any(self.locs[i] >= self.locs[i + 1] for i in range(len(self.locs) - 1)):
+            order = sorted(range(len(self.locs)), key=lambda i: self.locs[i])
+            for column in ["locs", "opcodes", "lengths", "functions", "sources", "hex_offsets"]:
+                old = getattr(self, column)
+                setattr(self, column, array(old.typecode, (old[i] for i in order)))
+        self.function_index = None
+        self.source_index = None
+
+    def find(self, loc):
+        i = bisect.bisect_left(self.locs, loc)
+        if (i < len(self.locs)) and (self.locs[i] == loc):
+            return i
+        return None
+
+    def code(self, index):
+        # As objdump shows the original jump; the executable on disk may be a mutant by now
+        address = self.locs[index] - self.function_deltas[self.functions[index]]
+        hexdata = Jump(self, index)["hexdata"]
+        if (len(hexdata) >= 6) and (hexdata[-6] == 0x0F):
+            rel = int.from_bytes(hexdata[-4:], "little", signed=True)
+        else:
+            rel = int.from_bytes(hexdata[-1:], "little", signed=True)
+        return (format(address, "8x") + ":\t" + hexdata.hex(" ").ljust(21) + "\t" +
+                Jump(self, index)["opcode"].ljust(6) + " " + format(address + len(hexdata) + rel, "x"))
+
+    def __len__(self):
+        return len(self.locs)
+
+    def __contains__(self, loc):
+        return self.find(loc) is not None
+
+    def __getitem__(self, loc):
+        i = self.find(loc)
+        if i is None:
+            raise KeyError(loc)
+        return Jump(self, i)
+
+    def __iter__(self):
+        return iter(self.locs)
+
+    def keys(self):
+        return self.locs
+
+    def items(self):
+        return ((loc, Jump(self, i)) for (i, loc) in enumerate(self.locs))
+
+    def get(self, loc, default=None):
+        i = self.find(loc)
+        return Jump(self, i) if i is not None else default
+
+
+def function_avoided(function_name, only_mutate, avoid_mutating, mutate_standard_libraries):
+    """Whether the filters rule out mutating a function, by its objdump label (e.g., "<foo(int)>")."""
+    just_name = sans_arguments(function_name)
+    just_name = just_name[1:]
+    if not mutate_standard_libraries:
+        if "std::" in just_name:
+            return True
+        if "boost::" in just_name:
+            return True
+    for s in avoid_mutating:
+        if s in just_name:
+            return True
+    if only_mutate != []:
+        for s in only_mutate:
+            if s in just_name:
+                return False
+        return True
+    return False
+
 def get_jumps(filename, only_mutate=None, avoid_mutating=None, source_only_mutate=None, source_avoid_mutating=None,
-              mutate_standard_libraries=False):
+              mutate_standard_libraries=False, ranges=None, carried=None, graph=None, flow=None):
+    """
+    Find the mutable jumps; ranges limits the disassembly to a list of (start, stop) addresses,
+    and carried is a (jumps, function_reach) pair of already-known (loc, opcode, hexdata,
+    function name, file offset - address, source) jumps and function entries, for code outside those ranges.
+    If graph (a callgraph.CallGraph) is given, the calls of every function disassembled are added to it,
+    and if flow (a cfg.ControlFlow) is, their control transfers.
+    """
     if only_mutate is None:
         only_mutate = []
     if avoid_mutating is None:
@@ -45,25 +213,57 @@ def get_jumps(filename, only_mutate=None, avoid_mutating=None, source_only_mutat
     if source_avoid_mutating is None:
         source_avoid_mutating = []
 
-    jumps = {}
+    jumps = JumpTable()
     function_map = {}
     function_reach = {}
 
-    proc = subprocess.Popen(["objdump", "-d", "-C", "-l", "--file-offsets", filename],
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, _ = proc.communicate()
-    output = str(out, encoding="utf-8")
+    if ranges is None:
+        commands = [["objdump", "-d", "-C", "-l", "--file-offsets", filename]]
+    else:
+        commands = [["objdump", "-d", "-C", "-l", "--file-offsets", "--start-address=" + hex(start),
+                     "--stop-address=" + hex(stop), filename] for (start, stop) in ranges]
+
+    for cmd in commands:
+        read_jumps(cmd, jumps, function_map, function_reach, only_mutate, avoid_mutating, source_only_mutate,
+                   source_avoid_mutating, mutate_standard_libraries, graph, flow)
+
+    if carried is not None:
+        (carried_jumps, carried_reach) = carried
+        function_reach.update(carried_reach)
+        for (loc, opcode, hexdata, function_name, delta, source) in carried_jumps:
+            jumps.add(loc, opcode, hexdata, jumps.add_function(function_name, delta), jumps.add_source(source))
+            if function_name not in function_map:
+                function_map[function_name] = array('q', [loc])
+            else:
+                function_map[function_name].append(loc)
+        for locs in function_map.values():
+            locs[:] = array('q', sorted(locs))
+    jumps.finish()
+    if flow is not None:
+        flow.finish()
+
+    return (jumps, function_map, function_reach)
+
 
-    avoid = False
+def read_jumps(cmd, jumps, function_map, function_reach, only_mutate, avoid_mutating, source_only_mutate,
+               source_avoid_mutating, mutate_standard_libraries, graph=None, flow=None):
+    # Stream the disassembly; for large binaries it is far too big to hold in memory
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, encoding="utf-8", errors="replace")
+
+    # A range may start before any function header, so nothing is taken until one is seen
+    avoid = True
     first_inst = False
 
     last_source = ""
+    source_index = jumps.add_source(last_source)
     source_avoid = False
 
-    for line in output.split("\n"):
+    for line in proc.stdout:
+        line = line.rstrip("\n")
         try:
             if line[0] == "/" and ":" in line: # hit a line number
                 last_source = line
+                source_index = None
                 source_avoid = False
 
                 for s in source_avoid_mutating:
@@ -82,30 +282,34 @@ def get_jumps(filename, only_mutate=None, avoid_mutating=None, source_only_mutat
             if "File Offset" in line and line[-1] == ":":
                 avoid = False
                 function_name = line.split(" ", 1)[1].split(" (File Offset", 1)[0]
-                just_name = sans_arguments(function_name)
-                just_name = just_name[1:]
-                if not mutate_standard_libraries:
-                    if "std::" in just_name:
-                        avoid = True
-                    if "boost::" in just_name:
-                        avoid = True
-                for s in avoid_mutating:
-                    if s in just_name:
-                        avoid = True
-                        break
-                if only_mutate != []:
-                    found = False
-                    for s in only_mutate:
-                        if s in just_name:
-                            found = True
-                            break
-                    if not found:
-                        avoid = True
+                if CONTINUED_FUNCTION.search(function_name):
+                    # A range starting inside a function (e.g., its padding), not a new function
+                    avoid = True
+                    if graph is not None:
+                        graph.enter(None, None)
+                    if flow is not None:
+                        flow.enter(None, None, None)
+                    continue
+                if graph is not None:
+                    # Calls are collected from every function, including those not mutated
+                    graph.enter(function_name, int(line.split()[0], 16))
+                avoid = function_avoided(function_name, only_mutate, avoid_mutating, mutate_standard_libraries)
                 base = int(line.split()[0], 16)
                 offset_hex = line.split("File Offset:")[1].split(")")[0]
                 offset = int(offset_hex, 16) - base
+                if flow is not None:
+                    # Jumps into a function from another are its entries too, so every function counts
+                    flow.enter(function_name, base, offset)
+                function_index = None
                 first_inst = True
                 continue
+            if (graph is not None) or (flow is not None):
+                fields = line.split("\t")
+                if len(fields) > 2:
+                    if graph is not None:
+                        graph.add_instruction(fields[2])
+                    if flow is not None:
+                        flow.add_instruction(int(fields[0].split(":")[0], 16), fields[1], fields[2])
             if avoid:
                 continue
 
@@ -134,20 +338,19 @@ def get_jumps(filename, only_mutate=None, avoid_mutating=None, source_only_mutat
                 if opcode in JUMP_OPCODES:
                     loc_bytes = fields[0].split(":")[0]
                     loc = int(loc_bytes, 16) + offset
-                    jumps[loc] = {"opcode": opcode,
-                                  "hexdata": bytes.fromhex(fields[1]),
-                                  "function_name": function_name,
-                                  "source": last_source,
-                                  "code": line}
+                    if function_index is None:
+                        function_index = jumps.add_function(function_name, offset)
+                    if source_index is None:
+                        source_index = jumps.add_source(last_source)
+                    jumps.add(loc, opcode, bytes.fromhex(fields[1]), function_index, source_index)
                     if function_name not in function_map:
-                        function_map[function_name] = [loc]
+                        function_map[function_name] = array('q', [loc])
                     else:
                         function_map[function_name].append(loc)
         # If we can't parse the line, just ignore it
         except: #pylint: disable=W0702
             pass
-
-    return (jumps, function_map, function_reach)
+    proc.wait()
 
 def different_jump(hexdata):
     P_FLIP = 0.70
@@ -169,11 +372,13 @@ def different_jump(hexdata):
         return SHORT_JUMPS[-1]
     return random.choice(list(filter(lambda j: j[0] != hexdata[0], SHORT_JUMPS[:-1])))
 
-def pick_and_change(jumps, avoid_repeats=False, repeat_retries=20, visited_mutants=None, unreach_cache=None):
+def pick_and_change(jumps, avoid_repeats=False, repeat_retries=20, visited_mutants=None, unreach_cache=None, cum_weights=None):
     if visited_mutants is None:
         visited_mutants = {}
     if unreach_cache is None:
         unreach_cache = {}
+    # Index the locations once, not on every try
+    locs = jumps.keys() if isinstance(jumps, JumpTable) else list(jumps.keys())
     done = False
     tries = 0
     while not done:
@@ -187,7 +392,10 @@ def pick_and_change(jumps, avoid_repeats=False, repeat_retries=20, visited_mutan
             if rtries > (len(jumps) * 10):
                 print("SOMETHING IS WRONG, NEEDED MORE THAN", rtries, "ATTEMPTS TO FIND REACHABLE JUMP")
                 raise RuntimeError("Unable to find reachable jump!")
-            loc = random.choice(list(jumps.keys()))
+            if cum_weights is not None: # e.g., favoring jumps that always go the same way
+                loc = random.choices(locs, cum_weights=cum_weights)[0]
+            else:
+                loc = random.choice(locs)
             jump = jumps[loc]
             # Could know function is unreachable or specific jump is unreachable
             if jump["function_name"] in unreach_cache:
@@ -227,39 +435,53 @@ def get_code(filename):
     with open(filename, "rb") as f:
         return bytearray(f.read())
 
-def mutant_from(code, jumps, function_reach, order=1, avoid_repeats=False, repeat_retries=20, visited_mutants=None,
-                unreach_cache=None):
+def select_mutant(jumps, function_reach, order=1, avoid_repeats=False, repeat_retries=20, visited_mutants=None,
+                  unreach_cache=None, cum_weights=None):
     full_mutant_data = ""
     if visited_mutants is None:
         visited_mutants = {}
     if unreach_cache is None:
         unreach_cache = {}
-    functions = []
-    locs = []
-    new_code = bytearray(code)
-    reach_code = bytearray(code)
-    func_reach_code = bytearray(code)
+    changes = []
     for _ in range(order): # allows higher-order mutants, though can undo mutations
-        (function, loc, new_data) = pick_and_change(jumps, avoid_repeats, repeat_retries, visited_mutants, unreach_cache)
+        (function, loc, new_data) = pick_and_change(jumps, avoid_repeats, repeat_retries, visited_mutants, unreach_cache,
+                                                    cum_weights)
         full_mutant_data += function + "\n"
         full_mutant_data += str(loc - function_reach[function]) + "\n"
         full_mutant_data += str(len(new_data)) + "\n"
-        functions.append(function)
-        locs.append(loc)
+        for data in new_data:
+            full_mutant_data += str(int(data)) + "\n"
+        changes.append((function, loc, new_data))
+    return (changes, full_mutant_data)
+
+def mutant_code(code, function_reach, changes):
+    new_code = bytearray(code)
+    reach_code = bytearray(code)
+    func_reach_code = bytearray(code)
+    for (function, loc, new_data) in changes:
         func_reach_code[function_reach[function]] = HALT_OP
         for offset, data in enumerate(new_data):
-            full_mutant_data += str(int(data)) + "\n"
             if offset == 0:
                 reach_code[loc + offset] = HALT_OP
             else:
                 reach_code[loc + offset] = NOP_OP
             new_code[loc + offset] = data
+    return (new_code, reach_code, func_reach_code)
+
+def mutant_from(code, jumps, function_reach, order=1, avoid_repeats=False, repeat_retries=20, visited_mutants=None,
+                unreach_cache=None, cum_weights=None):
+    (changes, full_mutant_data) = select_mutant(jumps, function_reach, order, avoid_repeats, repeat_retries,
+                                                visited_mutants, unreach_cache, cum_weights)
+    (new_code, reach_code, func_reach_code) = mutant_code(code, function_reach, changes)
+    functions = [function for (function, _, _) in changes]
+    locs = [loc for (_, loc, _) in changes]
     return (functions, locs, new_code, full_mutant_data, reach_code, func_reach_code)
 
 def write_files(mutant, full_mutant_data, reach, func_reach, new_filename, reachability_filename=None, func_reachability_filename=None,
                 save_mutants=None, save_executables=False, save_count=0):
-    with open(new_filename, "wb") as f:
-        f.write(mutant)
+    if new_filename is not None: # None when the mutant is selected at run time, by a meta-mutant
+        with open(new_filename, "wb") as f:
+            f.write(mutant)
     if save_mutants is not None:
         if save_executables:
             with open(save_mutants + "/mutant_" + str(save_count) + ".exe", "wb") as f:
@@ -276,7 +498,7 @@ def write_files(mutant, full_mutant_data, reach, func_reach, new_filename, reach
 def mutate_from(code, jumps, function_reach, new_filename, order=1, reachability_filename=None,
                 func_reachability_filename=None, save_mutants=None, save_executables=False, save_count=0,
                 avoid_repeats=False, repeat_retries=20,
-                visited_mutants=None, unreach_cache=None):
+                visited_mutants=None, unreach_cache=None, cum_weights=None):
     if visited_mutants is None:
         visited_mutants = {}
     if unreach_cache is None:
@@ -285,30 +507,31 @@ def mutate_from(code, jumps, function_reach, new_filename, order=1, reachability
                                                                                              avoid_repeats=avoid_repeats,
                                                                                              repeat_retries=repeat_retries,
                                                                                              visited_mutants=visited_mutants,
-                                                                                             unreach_cache=unreach_cache)
+                                                                                             unreach_cache=unreach_cache,
+                                                                                             cum_weights=cum_weights)
     write_files(new_mutant, full_mutant_data, new_reach, new_func_reach, new_filename, reachability_filename, func_reachability_filename,
                 save_mutants, save_executables, save_count)
     return (functions, locs, full_mutant_data)
 
-def apply_mutant_metadata(code, jumps, function_reach, metadata, new_executable, visited_mutants=None):
+def metadata_changes(jumps, function_reach, metadata, visited_mutants=None):
+    """
+    Decode function-relative mutant metadata into (function, loc, new_data) changes for this
+    executable, or None if the mutant does not apply to it.
+    """
     if visited_mutants is None:
         visited_mutants = {}
-    functions = []
-    locs = []
+    changes = []
     fields = metadata.split("\n")
     pos = 0
-    new_code = bytearray(code)
     while (pos + 3) < len(fields):
         function = fields[pos]
-        functions.append(function)
         if function not in function_reach:
             print("MUTANT IS INVALID:", function, "IS NOT PRESENT IN EXECUTABLE")
-            return ([], [], metadata)
+            return None
         loc = int(fields[pos + 1]) + function_reach[function]
-        locs.append(loc)
         if loc not in jumps:
             print("MUTANT IN", function, "IS INVALID: NOT AT A JUMP LOCATION")
-            return([], [], metadata)
+            return None
         print("MUTATING JUMP IN", function, "WITH ORIGINAL OPCODE", jumps[loc]["opcode"])
         print("ORIGINAL CODE:", jumps[loc]["code"])
         data_len = int(fields[pos + 2])
@@ -330,8 +553,30 @@ def apply_mutant_metadata(code, jumps, function_reach, metadata, new_executable,
             print("CHANGING TO", NEAR_NAMES[changed])
         else:
             print("CHANGING TO NOPS")
-        for offset, data in enumerate(changed):
-            new_code[loc + offset] = data
-    with open(new_executable, 'wb') as f:
-        f.write(new_code)
+        changes.append((function, loc, changed))
+    return changes
+
+def metadata_patches(function_reach, metadata):
+    """The (file offset, new bytes) patches that make metadata's mutant, in order, without checking or reporting them."""
+    patches = []
+    fields = metadata.split("\n")
+    pos = 0
+    while (pos + 3) < len(fields):
+        loc = int(fields[pos + 1]) + function_reach[fields[pos]]
+        data_len = int(fields[pos + 2])
+        patches.append((loc, bytes(int(data) for data in fields[pos + 3:pos + 3 + data_len])))
+        pos += 3 + data_len
+    return patches
+
+def apply_mutant_metadata(code, jumps, function_reach, metadata, new_executable, visited_mutants=None,
+                          reachability_filename=None, func_reachability_filename=None):
+    changes = metadata_changes(jumps, function_reach, metadata, visited_mutants)
+    if changes is None:
+        return ([], [], metadata)
+    if (new_executable is not None) or (reachability_filename is not None) or (func_reachability_filename is not None):
+        (new_code, reach_code, func_reach_code) = mutant_code(code, function_reach, changes)
+        write_files(new_code, metadata, reach_code, func_reach_code, new_executable, reachability_filename,
+                    func_reachability_filename)
+    functions = [function for (function, _, _) in changes]
+    locs = [loc for (_, loc, _) in changes]
     return (functions, locs, metadata)
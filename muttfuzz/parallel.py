@@ -0,0 +1,116 @@
+import os
+import signal
+import stat
+import subprocess
+import time
+
+from muttfuzz import corpus_sync
+
+
+def expand_cmd(cmd, **fields):
+    # Commands are shell strings, so only replace the known {field} placeholders rather than using format()
+    if callable(cmd):
+        return cmd
+    for (field, value) in fields.items():
+        cmd = cmd.replace("{" + field + "}", str(value))
+    return cmd
+
+
+class Instance:
+    """
+    One of several fuzzer instances running side by side, each with its own staged
+    executable, output directory, and (optionally) CPU.
+    """
+
+    def __init__(self, number, parallel_dir, executable, cpu=None, sync_layout="auto", sync_artifacts=None):
+        self.number = number
+        directory = os.path.join(parallel_dir, "instance_" + str(number))
+        self.executable = os.path.join(directory, os.path.basename(executable))
+        self.output = os.path.join(directory, "output")
+        self.log = os.path.join(directory, "cmd_errors.txt")
+        self.cpu = cpu
+        self.mutant_name = None
+        os.makedirs(self.output, exist_ok=True)
+        self.corpus = corpus_sync.CorpusSync(self.output, sync_layout,
+                                             expand_cmd(sync_artifacts, output=self.output) if sync_artifacts is not None else None)
+
+    def stage(self, code, mutant_name=None):
+        # rename avoids hitting an executable a previous fuzzer may still be holding
+        with open(self.executable + ".new", 'wb') as f:
+            f.write(code)
+        os.chmod(self.executable + ".new", os.stat(self.executable + ".new").st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        os.rename(self.executable + ".new", self.executable)
+        self.mutant_name = mutant_name
+
+    def command(self, cmd):
+        return expand_cmd(cmd, executable=self.executable, output=self.output, instance=self.number,
+                                   cpu=self.cpu if self.cpu is not None else "")
+
+
+def make_instances(n, parallel_dir, executable, pin_cpus=False, sync_layout="auto", sync_artifacts=None):
+    cpus = sorted(os.sched_getaffinity(0))
+    return [Instance(i, parallel_dir, executable, cpus[i % len(cpus)] if pin_cpus else None, sync_layout, sync_artifacts)
+            for i in range(n)]
+
+
+def run_instances(instances, cmd, timeout, verbose, limiter=None):
+    """
+    Run cmd for every instance at once, for at most timeout seconds, each under the
+    limiter's resource limits (if any); returns a list of (return code, elapsed seconds,
+    the limit that killed it or None), one per instance.
+    """
+    procs = []
+    runs = []
+    start_P = time.time()
+    for instance in instances:
+        instance_cmd = instance.command(cmd)
+        if verbose:
+            print("EXECUTING", instance_cmd, "ON CPU" if instance.cpu is not None else "", instance.cpu if instance.cpu is not None else "")
+
+        def setup(cpu=instance.cpu):
+            os.setsid()
+            if cpu is not None:
+                os.sched_setaffinity(0, {cpu})
+
+        if limiter is not None:
+            runs.append(limiter.start())
+            setup = limiter.preexec(runs[-1], setup)
+        with open(os.devnull, 'w') as dnull, open(instance.log, 'w') as cmd_errors:
+            procs.append(subprocess.Popen(instance_cmd, shell=True, preexec_fn=setup, stdout=dnull, stderr=cmd_errors))
+
+    finished = [None] * len(procs)
+    try:
+        while (None in finished) and ((time.time() - start_P) < timeout):
+            for i, P in enumerate(procs):
+                if (finished[i] is None) and (P.poll() is not None):
+                    finished[i] = time.time() - start_P
+            time.sleep(min(0.5, timeout / 10.0)) # Allow for small timeouts
+    finally:
+        for i, P in enumerate(procs):
+            if P.poll() is None:
+                if verbose:
+                    print("STOPPING INSTANCE", instances[i].number)
+                os.killpg(os.getpgid(P.pid), signal.SIGTERM)
+                P.wait()
+            if finished[i] is None:
+                finished[i] = time.time() - start_P
+    killed_by = [None] * len(procs)
+    if limiter is not None:
+        for (i, P) in enumerate(procs):
+            with open(instances[i].log, 'r', errors="replace") as f:
+                killed_by[i] = limiter.killed_by(runs[i], P.returncode, f.read())
+    return [(P.returncode, round(t, 2), k) for (P, t, k) in zip(procs, finished, killed_by)]
+
+
+def sync_instances(instances):
+    """
+    Merge every instance's queue into every other instance's queue, and demote crashes (which
+    may only crash a mutant) into all the queues, using hardlinks, skipping any input a queue
+    already has the contents of.  Returns the number of new links.
+    """
+    linked = 0
+    for instance in instances:
+        sources = [(other.corpus, "sync_" + str(other.number) + "_", "crash_" + str(other.number) + "_")
+                   for other in instances if other is not instance]
+        linked += instance.corpus.sync(sources, "crash_" + str(instance.number) + "_")
+    return linked
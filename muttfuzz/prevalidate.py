@@ -0,0 +1,85 @@
+from collections import namedtuple
+import queue
+import threading
+import traceback
+
+
+# The campaign's functions that make a staged mutant, check it, and clean up after one that won't run
+Steps = namedtuple("Steps", ["generate", "validate", "discard"])
+
+
+class Validator:
+    """
+    Generates and checks mutants in a background thread while the current mutant is fuzzed,
+    keeping up to depth mutants that passed their checks ready to run.  generate() makes the
+    next mutant (staged in its own files) or returns None when there are no more, validate()
+    checks it, and discard() cleans up after a mutant that will never run.  The lock guards
+    the campaign state generate() and validate() change: generate() runs holding it, while
+    validate() must take it around its own changes.  Hold it to read that state safely.
+    """
+
+    def __init__(self, generate, validate, discard, depth=2, lock=None):
+        self.steps = Steps(generate, validate, discard)
+        self.ready = queue.Queue(maxsize=depth)
+        self.lock = lock if lock is not None else threading.RLock()
+        self.stopping = threading.Event()
+        self.error = None
+        self.finished = False
+        self.thread = threading.Thread(target=self.work, name="muttfuzz-validator", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def work(self):
+        try:
+            while not self.stopping.is_set():
+                with self.lock:
+                    mutant = self.steps.generate()
+                if mutant is None:
+                    break
+                # Checks run subprocesses, so validate() takes the lock itself, just around the campaign state it changes
+                ok = self.steps.validate(mutant)
+                if ok:
+                    self.put(mutant)
+                else:
+                    self.steps.discard(mutant)
+        except Exception as e: #pylint: disable=W0703
+            traceback.print_exc()
+            self.error = e
+        self.put(None)
+
+    def put(self, mutant):
+        while not self.stopping.is_set():
+            try:
+                self.ready.put(mutant, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+        if mutant is not None:
+            self.steps.discard(mutant)
+
+    def get(self, timeout):
+        """The next validated mutant, or None when there are no more; raises queue.Empty after timeout."""
+        if self.finished:
+            return None
+        mutant = self.ready.get(timeout=timeout)
+        if mutant is None:
+            self.finished = True
+            if self.error is not None:
+                raise RuntimeError("background mutant validation failed") from self.error
+        return mutant
+
+    def stop(self):
+        """Stop validating and discard the mutants that were ready but will never run; returns how many."""
+        self.stopping.set()
+        self.thread.join()
+        discarded = 0
+        while True:
+            try:
+                mutant = self.ready.get_nowait()
+            except queue.Empty:
+                break
+            if mutant is not None:
+                self.steps.discard(mutant)
+                discarded += 1
+        return discarded
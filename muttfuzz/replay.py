@@ -0,0 +1,96 @@
+from collections import namedtuple
+import random
+
+ORDERS = ["grouped", "random"]
+
+# A saved mutant: its metadata, and the functions and (absolute) jump locations it changes
+Saved = namedtuple("Saved", ["metadata", "functions", "locs"])
+
+
+def metadata_key(metadata):
+    """What makes two saved mutants the same mutant: the (function, offset, bytes) of each change, in order."""
+    key = []
+    fields = metadata.split("\n")
+    pos = 0
+    while (pos + 3) < len(fields):
+        data_len = int(fields[pos + 2])
+        key.append((fields[pos], int(fields[pos + 1]), tuple(int(data) for data in fields[pos + 3:pos + 3 + data_len])))
+        pos += 3 + data_len
+    return tuple(key)
+
+
+class ReplayPlan:
+    """
+    The order in which saved mutants (from --use_saved_mutants) are applied.  Identical mutants
+    are only kept once.  In grouped order, mutants of the same functions run back to back (the
+    groups themselves in random order, and the mutants of a group by jump location), so the
+    reachability caches hit; random order is a shuffle, for unbiased score estimates.  Mutants
+    whose functions or jumps are all known to be unreachable are dropped as they come up, before
+    they are applied.
+    """
+
+    def __init__(self, metadatas, function_reach, order="grouped"):
+        self.order = order
+        self.duplicates = 0
+        seen = set()
+        mutants = []
+        for metadata in metadatas:
+            key = metadata_key(metadata)
+            if key in seen:
+                self.duplicates += 1
+                continue
+            seen.add(key)
+            functions = [function for (function, _, _) in key]
+            # A function not in this executable makes an invalid mutant, reported when it is applied
+            locs = [offset + function_reach[function] if function in function_reach else None
+                    for (function, offset, _) in key]
+            mutants.append(Saved(metadata, functions, locs))
+        random.shuffle(mutants)
+        if order == "grouped":
+            groups = {}
+            for mutant in mutants:
+                groups.setdefault(tuple(mutant.functions), []).append(mutant)
+            mutants = []
+            for group in groups.values(): # in the (shuffled) order each group first appeared
+                mutants.extend(sorted(group, key=lambda m: [loc if loc is not None else -1 for loc in m.locs]))
+        self.groups = len(set(tuple(mutant.functions) for mutant in mutants))
+        self.mutants = mutants
+        self.position = 0
+        self.passes = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.mutants)
+
+    def unreachable(self, mutant, unreach_cache):
+        return (all(function in unreach_cache for function in mutant.functions) or
+                all((loc is not None) and (loc in unreach_cache) for loc in mutant.locs))
+
+    def drop(self, index):
+        del self.mutants[index]
+        self.dropped += 1
+        if index < self.position:
+            self.position -= 1
+
+    def next(self, unreach_cache):
+        """The metadata of the next mutant in order, starting over after the last; None if none are left."""
+        while self.mutants:
+            if self.position >= len(self.mutants):
+                self.position = 0
+                self.passes += 1
+            if self.unreachable(self.mutants[self.position], unreach_cache):
+                self.drop(self.position)
+                continue
+            self.position += 1
+            return self.mutants[self.position - 1].metadata
+        return None
+
+    def choose(self, unreach_cache):
+        """The metadata of a mutant chosen at random (so possibly repeated); None if none are left."""
+        while self.mutants:
+            index = random.randrange(len(self.mutants))
+            if self.unreachable(self.mutants[index], unreach_cache):
+                self.drop(index)
+                continue
+            return self.mutants[index].metadata
+        return None
@@ -0,0 +1,155 @@
+import csv
+import json
+import math
+import os
+import time
+
+# The first three columns are what --save_results always held, so old files still read
+FIELDS = ["mutant", "time", "returncode", "status", "number", "reach_time", "prune_time", "elapsed", "killed_by"]
+
+# Rows with a fuzzing result; the others record mutants that never ran (unreachable, pruned, invalid)
+EVALUATED = ["evaluated", "carried"]
+
+SYNC_INTERVAL = 10.0
+
+
+class RunningStats:
+    """Count, mean, variance (Welford's method), min and max, in constant space."""
+
+    def __init__(self, values=()):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def stddev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class ResultsWriter:
+    """
+    Appends one row per mutant to a results file as soon as it is known, as CSV, or as JSON
+    lines if the file name ends in .jsonl.  Every row is flushed, and fsynced at most every
+    sync_interval seconds (and on close), so a crash loses at most the last few rows.
+    """
+
+    def __init__(self, filename, append=False, sync_interval=SYNC_INTERVAL):
+        self.filename = filename
+        self.jsonl = filename.endswith(".jsonl")
+        self.sync_interval = sync_interval
+        self.f = open(filename, 'a' if append else 'w', newline="") #pylint: disable=R1732
+        self.writer = None if self.jsonl else csv.writer(self.f)
+        self.last_sync = time.time()
+
+    def write(self, mutant, run_time, returncode, status="evaluated", number=None, reach_time=None, prune_time=None,
+              elapsed=None, killed_by=None):
+        row = [mutant, run_time, returncode, status, number, reach_time, prune_time, elapsed, killed_by]
+        if self.jsonl:
+            self.f.write(json.dumps(dict(zip(FIELDS, row))) + "\n")
+        else:
+            self.writer.writerow(["" if value is None else value for value in row])
+        self.f.flush()
+        if time.time() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.f.fileno())
+        self.last_sync = time.time()
+
+    def size(self):
+        # Every row is flushed as it is written, so this is where the next row starts
+        return os.fstat(self.f.fileno()).st_size
+
+    def truncate(self, size):
+        """Drop every row written after the file was size bytes long."""
+        self.f.flush()
+        if size < self.size():
+            os.ftruncate(self.f.fileno(), size)
+
+    def close(self):
+        if not self.f.closed:
+            self.sync()
+            self.f.close()
+
+
+class Results:
+    """
+    The (mutant, time, return code) of every evaluated mutant, in order, with running statistics
+    of the times, and the results file (if any) that every mutant's row is written to.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.stats = RunningStats()
+        self.writer = None
+
+    def open(self, filename, append=False):
+        self.writer = ResultsWriter(filename, append=append)
+
+    def add(self, mutant, run_time, returncode):
+        self.rows.append((mutant, run_time, returncode))
+        self.stats.add(run_time)
+
+    def write(self, *row, **fields):
+        if self.writer is not None:
+            self.writer.write(*row, **fields)
+
+    def state(self):
+        return {"analysis_data": self.rows,
+                "results_size": self.writer.size() if self.writer is not None else None}
+
+    def restore(self, rows, size=None):
+        """
+        Go back to the rows of a checkpoint.  Rows written to the results file after it (size is
+        how long the file was then) are dropped, since their mutants will be evaluated again.
+        """
+        self.rows = rows
+        self.stats = RunningStats(d[1] for d in rows)
+        if (self.writer is not None) and (size is not None):
+            self.writer.truncate(size)
+
+    def summary(self):
+        return {"mutants_evaluated": self.stats.count,
+                "mean_evaluation_time": round(self.stats.mean, 2) if self.stats.count > 0 else None}
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def write_results(filename, analysis_data):
+    """Write (mutant, time, return code) results all at once."""
+    writer = ResultsWriter(filename)
+    try:
+        for (mutant, run_time, returncode) in analysis_data:
+            writer.write(mutant, run_time, returncode)
+    finally:
+        writer.close()
+
+
+def read_results(filename):
+    """Yield every row of a results file as a dict; rows from before the status column count as evaluated."""
+    with open(filename, newline="") as f:
+        if filename.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        for row in csv.reader(f):
+            values = dict(zip(FIELDS, row))
+            values["time"] = float(values["time"]) if values["time"] != "" else None
+            values["returncode"] = int(values["returncode"]) if values["returncode"] != "" else None
+            if not values.get("status"):
+                values["status"] = "evaluated"
+            yield values
@@ -0,0 +1,127 @@
+from collections import deque
+import http.server
+import json
+import os
+import socketserver
+import threading
+import time
+
+# How many of the latest mutant results the status endpoint shows
+RECENT_RESULTS = 20
+
+
+def parse_endpoint(endpoint):
+    """("unix", path) for unix:PATH (or anything with a /), else ("tcp", (host, port)) for [HOST:]PORT."""
+    if endpoint.startswith("unix:"):
+        return ("unix", endpoint[len("unix:"):])
+    if "/" in endpoint:
+        return ("unix", endpoint)
+    if ":" in endpoint:
+        (host, port) = endpoint.rsplit(":", 1)
+        return ("tcp", (host, int(port)))
+    return ("tcp", ("127.0.0.1", int(endpoint)))
+
+
+class StatusHandler(http.server.BaseHTTPRequestHandler):
+    """GET /status (everything) or /summary (everything but the per-function tables), as JSON."""
+
+    def do_GET(self): #pylint: disable=C0103
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path not in ["", "/status", "/summary"]:
+            self.send_error(404, "try /status or /summary")
+            return
+        try:
+            body = json.dumps(self.server.snapshot(path != "/summary"), default=str).encode("utf-8")
+        except Exception as e: #pylint: disable=W0703
+            self.send_error(500, str(e))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): #pylint: disable=W0622
+        pass # requests would interleave with the campaign's output
+
+
+class UnixStatusServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """A threading HTTP server on a Unix socket."""
+
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        (request, _) = super().get_request()
+        return (request, ("local", 0))
+
+
+class StatusServer:
+    """
+    Serves snapshot(tables), a JSON-able dict of the state of a campaign, over HTTP on a TCP
+    port or a Unix socket, from a background thread, so a dashboard can poll a running
+    campaign without it starting any processes.
+    """
+
+    def __init__(self, endpoint, snapshot):
+        (self.kind, self.address) = parse_endpoint(endpoint)
+        if self.kind == "unix":
+            if os.path.exists(self.address):
+                os.unlink(self.address) # left by a campaign that didn't exit cleanly
+            self.server = UnixStatusServer(self.address, StatusHandler)
+        else:
+            self.server = http.server.ThreadingHTTPServer(self.address, StatusHandler)
+            self.server.daemon_threads = True
+        self.server.snapshot = snapshot
+        self.thread = None
+
+    def url(self):
+        if self.kind == "unix":
+            return "unix:" + self.address + " /status"
+        (host, port) = self.server.server_address[:2]
+        return "http://" + host + ":" + str(port) + "/status"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print("SERVING CAMPAIGN STATUS AT", self.url())
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if (self.kind == "unix") and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+class Tracker:
+    """What a campaign is doing now, the mutant it is on, and its latest results, served by a StatusServer."""
+
+    def __init__(self, recent=RECENT_RESULTS):
+        self.activity = ("starting", time.time())
+        self.mutant = None
+        self.recent = deque(maxlen=recent)
+        self.server = None
+
+    def doing(self, activity):
+        self.activity = (activity, time.time())
+
+    def result(self, number, mutant, status, run_time=None, returncode=None, killed_by=None, times=None):
+        self.recent.append({"number": number, "mutant": mutant, "status": status, "run_time": run_time,
+                            "return_code": returncode, "killed_by": killed_by, "times": dict(times or {})})
+
+    def summary(self):
+        mutant = self.mutant
+        return {"activity": self.activity[0],
+                "activity_seconds": round(time.time() - self.activity[1], 2),
+                "mutant": None if mutant is None else {"number": mutant.number, "mutant": mutant.name,
+                                                       "functions": list(mutant.functions)},
+                "recent": list(self.recent)}
+
+    def serve(self, endpoint, snapshot):
+        self.server = StatusServer(endpoint, snapshot)
+        self.server.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
@@ -0,0 +1,133 @@
+import bisect
+import struct
+import subprocess
+
+from muttfuzz import dwarf
+from muttfuzz import elf
+from muttfuzz import mutate
+
+# Functions closer together than this are disassembled in one range (the gap is padding, or tiny)
+MIN_GAP = 64
+
+# More ranges than this and the closest ones are merged, disassembling what lies between
+MAX_RANGES = 32
+
+
+def limit_ranges(ranges, limit=MAX_RANGES):
+    """Merge the closest of sorted, disjoint (start, stop) ranges until there are at most limit of them."""
+    if len(ranges) <= limit:
+        return ranges
+    gaps = sorted(range(len(ranges) - 1), key=lambda i: ranges[i + 1][0] - ranges[i][1], reverse=True)
+    splits = sorted(gaps[:limit - 1])
+    merged = []
+    first = 0
+    for i in splits + [len(ranges) - 1]:
+        merged.append((ranges[first][0], ranges[i][1]))
+        first = i + 1
+    return merged
+
+
+def demangle(names):
+    """The names as objdump -C shows them, or None if they can't be demangled."""
+    mangled = [name for name in names if name.startswith("_Z")]
+    if not mangled:
+        return names
+    try:
+        output = subprocess.run(["c++filt"], input="\n".join(mangled) + "\n", stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, encoding="utf-8", errors="replace", check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    demangled = dict(zip(mangled, output.split("\n")))
+    return [demangled.get(name, name) for name in names]
+
+
+def source_matches(path, source_only_mutate):
+    # objdump -l shows "path:line", and a filter may include part of the line number
+    return (path is None) or any(s.split(":")[0] in path for s in source_only_mutate)
+
+
+def candidate_ranges(filename, only_mutate, avoid_mutating, source_only_mutate, mutate_standard_libraries):
+    """
+    The address ranges holding every function that can survive the name filters (by the
+    symbol table) and may have code from a source file source_only_mutate selects (by the
+    DWARF line tables), the number of such functions, and {objdump label: address} for every
+    function the name filters keep; None if the executable has no symbols, or no line tables
+    to apply source filters with, so all of it must be disassembled.
+    """
+    symbols = elf.function_symbols(filename)
+    if not symbols:
+        return None
+    names = demangle([name for (name, _, _) in symbols])
+    if names is None:
+        return None
+    entries = {}
+    selected = []
+    # In address order, so where labels clash the last one wins, as it does in a full disassembly
+    for ((_, address, size), name) in sorted(zip(symbols, names), key=lambda s: s[0][1]):
+        label = "<" + name + ">"
+        if not mutate.function_avoided(label, only_mutate, avoid_mutating, mutate_standard_libraries):
+            entries[label] = address
+            selected.append((address, address + size))
+    if source_only_mutate:
+        try:
+            units = dwarf.unit_ranges(filename)
+        except (ValueError, IndexError, struct.error):
+            units = None # e.g., compressed debug sections
+        if units is None:
+            return None
+        # objdump -l can show a line of one file of a compilation unit as another's, so a whole unit matches or not
+        matching = sorted((start, stop) for ranges in units if any(source_matches(path, source_only_mutate)
+                                                                   for (_, _, path) in ranges)
+                          for (start, stop, _) in ranges)
+        starts = [start for (start, _) in matching]
+        furthest = []
+        for (_, stop) in matching:
+            furthest.append(max(stop, furthest[-1]) if furthest else stop)
+
+        def overlaps(start, stop):
+            i = bisect.bisect_left(starts, stop) - 1
+            return (i >= 0) and (furthest[i] > start)
+
+        selected = [(start, stop) for (start, stop) in selected if overlaps(start, stop)]
+    ranges = []
+    for (start, stop) in sorted(set(selected)):
+        if ranges and (start - ranges[-1][1] < MIN_GAP):
+            ranges[-1] = (ranges[-1][0], max(stop, ranges[-1][1]))
+        else:
+            ranges.append((start, stop))
+    return (limit_ranges(ranges), len(set(selected)), entries)
+
+
+def get_jumps(filename, only_mutate=None, avoid_mutating=None, source_only_mutate=None, source_avoid_mutating=None,
+              mutate_standard_libraries=False, graph=None, flow=None):
+    """
+    mutate.get_jumps, but when only_mutate or source_only_mutate select part of the executable,
+    only the functions that can survive the filters are disassembled (and line-annotated).  A
+    call graph or control flow needs all of the code, so either means disassembling everything.
+    """
+    targeted = None
+    if only_mutate or source_only_mutate:
+        if graph is not None:
+            print("DISASSEMBLING ALL OF THE EXECUTABLE FOR THE STATIC CALL GRAPH")
+        elif flow is not None:
+            print("DISASSEMBLING ALL OF THE EXECUTABLE FOR DOMINATOR PROPAGATION",
+                  "(--no_dominator_propagation TO DISASSEMBLE ONLY SELECTED FUNCTIONS)")
+        else:
+            targeted = candidate_ranges(filename, only_mutate, avoid_mutating or [], source_only_mutate or [],
+                                        mutate_standard_libraries)
+            if targeted is None:
+                print("NO SYMBOLS OR LINE TABLES TO SELECT FUNCTIONS BY, DISASSEMBLING ALL OF THE EXECUTABLE")
+    if targeted is None:
+        return mutate.get_jumps(filename, only_mutate, avoid_mutating, source_only_mutate, source_avoid_mutating,
+                                mutate_standard_libraries, graph=graph, flow=flow)
+    (ranges, count, entries) = targeted
+    print("DISASSEMBLING ONLY", count, "SELECTED FUNCTIONS, IN", len(ranges), "RANGES")
+    (jumps, function_map, function_reach) = mutate.get_jumps(filename, only_mutate, avoid_mutating, source_only_mutate,
+                                                             source_avoid_mutating, mutate_standard_libraries, ranges=ranges)
+    # Entries of functions the source filters rule out (or that share a label with one), as a full disassembly sees them
+    segments = elf.read_segments(filename)
+    for (label, address) in entries.items():
+        offset = elf.vaddr_to_offset(segments, address)
+        if offset is not None:
+            function_reach[label] = offset
+    return (jumps, function_map, function_reach)
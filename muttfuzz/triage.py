@@ -0,0 +1,206 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+from collections import namedtuple
+
+from muttfuzz import callpool
+from muttfuzz import checkpoint
+from muttfuzz import parallel
+
+STACK_FRAME = re.compile(r"^\s*#(\d+) 0x[0-9a-fA-F]+(?: in (\S+))?\s*(.*)$")
+SANITIZER_ERROR = re.compile(r"ERROR: (\w+): ([\w\-]+)")
+RUNTIME_ERROR = re.compile(r"^(\S+:\d+):\d+: runtime error: ")
+
+# Frames of the sanitizer runtime itself, which say nothing about where the bug is
+IGNORED_FRAMES = ["__asan", "__lsan", "__msan", "__tsan", "__ubsan", "__sanitizer", "__interceptor", "__interception",
+                  "__libc_start", "_start", "raise", "abort", "__assert_fail", "__GI_"]
+
+STACK_DEPTH = 3
+
+# Enough of a report to find the first stack, without keeping huge ones around
+MAX_OUTPUT = 65536
+
+
+def replay_input(cmd, timeout):
+    # Runs in a pool worker; the command gets its own process group so a hang can be killed whole
+    proc = subprocess.Popen(cmd, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, start_new_session=True)
+    try:
+        (_, err) = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.communicate()
+        return (None, "")
+    return (proc.returncode, err[:MAX_OUTPUT].decode("utf-8", errors="replace"))
+
+
+def stack_frames(output):
+    """The top frames of the first stack in a sanitizer report, as function and file:line (no column)."""
+    frames = []
+    in_stack = False
+    for line in output.split("\n"):
+        m = STACK_FRAME.match(line)
+        if m is None:
+            if in_stack:
+                break
+            continue
+        in_stack = True
+        function = m.group(2)
+        if (function is None) or any(function.startswith(ignored) for ignored in IGNORED_FRAMES):
+            continue
+        location = m.group(3) or ""
+        if location.startswith("("):
+            location = "" # module+offset changes with every build
+        else:
+            location = re.sub(r":\d+$", "", location) if location.count(":") > 1 else location
+        frames.append(function + " " + location if location else function)
+        if len(frames) == STACK_DEPTH:
+            break
+    return frames
+
+
+def crash_signature(rc, output):
+    """(kind, frames) identifying a crash; the bucket is a hash of these."""
+    frames = stack_frames(output)
+    m = SANITIZER_ERROR.search(output)
+    if m is not None:
+        return (m.group(1) + " " + m.group(2), frames)
+    for line in output.split("\n"):
+        m = RUNTIME_ERROR.match(line)
+        if m is not None:
+            return ("runtime error", frames if frames else [m.group(1)])
+    if rc < 0:
+        return ("signal " + str(-rc), frames)
+    if 128 < rc <= 128 + 64:
+        return ("signal " + str(rc - 128), frames) # as reported by the shell
+    return ("exit status " + str(rc), frames)
+
+
+def bucket_of(kind, frames):
+    return hashlib.sha1("\n".join([kind] + frames).encode("utf-8")).hexdigest()[:16]
+
+
+# Where triage keeps its copies of the inputs, the crash buckets, and triage.json
+Paths = namedtuple("Paths", ["triage_dir", "inputs", "buckets", "results"])
+
+# How inputs are replayed: the command, its timeout, and the pool of processes running it, kept for the whole campaign
+Replayer = namedtuple("Replayer", ["cmd", "timeout", "pool"])
+
+
+class Triage:
+    """
+    Crashing inputs found while fuzzing mutants, replayed against the original executable.
+    Inputs are collected (copied, deduplicated by content) after each mutant, so it is known
+    which mutant found each; inputs that also crash the original are bucketed by the kind of
+    crash and the top of its sanitizer stack.  All results are kept in triage_dir/triage.json.
+    """
+
+    def __init__(self, cmd, patterns, triage_dir="muttfuzz_triage", timeout=10.0, jobs=None):
+        if "{input}" not in cmd:
+            raise ValueError("triage command must use {input} for the crashing input")
+        self.patterns = patterns
+        self.paths = Paths(triage_dir, os.path.join(triage_dir, "inputs"), os.path.join(triage_dir, "buckets"),
+                           os.path.join(triage_dir, "triage.json"))
+        # Workers are only forked when inputs are first replayed
+        self.replayer = Replayer(cmd, timeout, callpool.CallPool(jobs if jobs is not None else len(os.sched_getaffinity(0))))
+        os.makedirs(self.paths.inputs, exist_ok=True)
+        os.makedirs(self.paths.buckets, exist_ok=True)
+        self.inputs = {}
+        self.buckets = {}
+        if os.path.exists(self.paths.results):
+            with open(self.paths.results, 'r') as f:
+                results = json.load(f)
+            self.inputs = results["inputs"]
+            self.buckets = results["buckets"]
+        self.pending = [digest for (digest, entry) in self.inputs.items() if entry["status"] is None]
+        self.seen_paths = set()
+
+    def collect(self, mutant_name, output=None):
+        """
+        Take in any new files matching the crash patterns, found by mutant_name; with no mutant,
+        just note the files already there, so they aren't credited to the next mutant.
+        """
+        new = 0
+        for pattern in self.patterns:
+            if output is not None:
+                pattern = parallel.expand_cmd(pattern, output=output)
+            for filename in sorted(glob.glob(pattern)):
+                if (filename in self.seen_paths) or (not os.path.isfile(filename)):
+                    continue
+                self.seen_paths.add(filename)
+                if (mutant_name is None) or (os.path.basename(filename) == "README.txt"):
+                    continue
+                with open(filename, 'rb') as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+                if digest in self.inputs:
+                    continue
+                shutil.copyfile(filename, os.path.join(self.paths.inputs, digest))
+                self.inputs[digest] = {"mutant": mutant_name, "source": filename, "status": None, "bucket": None}
+                self.pending.append(digest)
+                new += 1
+        if new > 0:
+            print("COLLECTED", new, "NEW CRASHING INPUTS FROM MUTANT", mutant_name)
+        return new
+
+    def replay(self):
+        """Replay all not yet replayed inputs against the (restored!) original executable."""
+        if not self.pending:
+            return
+        replayer = self.replayer
+        print("REPLAYING", len(self.pending), "CRASHING INPUTS AGAINST THE ORIGINAL EXECUTABLE WITH", replayer.pool.processes, "JOBS")
+        calls = [(replay_input, (parallel.expand_cmd(replayer.cmd, input=os.path.join(self.paths.inputs, digest)), replayer.timeout))
+                 for digest in self.pending]
+        outcomes = replayer.pool.run_many(calls, replayer.timeout + 60)
+        new_buckets = 0
+        for (digest, (status, value)) in zip(self.pending, outcomes):
+            entry = self.inputs[digest]
+            if status != "ok":
+                entry["status"] = "error"
+                continue
+            (rc, output) = value
+            if rc is None:
+                entry["status"] = "timeout"
+            elif rc == 0:
+                entry["status"] = "mutant_only"
+            else:
+                entry["status"] = "crash"
+                (kind, frames) = crash_signature(rc, output)
+                bucket = bucket_of(kind, frames)
+                entry["bucket"] = bucket
+                if bucket not in self.buckets:
+                    new_buckets += 1
+                    self.buckets[bucket] = {"kind": kind, "frames": frames, "first_mutant": entry["mutant"],
+                                            "first_input": digest, "inputs": 0}
+                    bucket_dir = os.path.join(self.paths.buckets, bucket)
+                    os.makedirs(bucket_dir, exist_ok=True)
+                    shutil.copyfile(os.path.join(self.paths.inputs, digest), os.path.join(bucket_dir, "input"))
+                    with open(os.path.join(bucket_dir, "report.txt"), 'w') as f:
+                        f.write(output)
+                    print("NEW CRASH BUCKET", bucket + ":", kind, "AT", frames[0] if frames else "UNKNOWN LOCATION",
+                          "FIRST FOUND BY MUTANT", entry["mutant"])
+                self.buckets[bucket]["inputs"] += 1
+        self.pending = []
+        self.save()
+        print("TRIAGE FOUND", new_buckets, "NEW CRASH BUCKETS")
+
+    def save(self):
+        checkpoint.atomic_write(self.paths.results,
+                                json.dumps({"inputs": self.inputs, "buckets": self.buckets}, indent=1).encode("utf-8"))
+
+    def close(self):
+        self.replayer.pool.close()
+
+    def report(self):
+        statuses = [entry["status"] for entry in self.inputs.values()]
+        print()
+        print("TRIAGE OF", len(statuses), "CRASHING INPUTS FROM MUTANTS:", statuses.count("crash"), "ALSO CRASH THE ORIGINAL,",
+              statuses.count("mutant_only"), "ONLY CRASH MUTANTS,", statuses.count("timeout"), "TIMED OUT")
+        for (bucket, info) in sorted(self.buckets.items(), key=lambda b: -b[1]["inputs"]):
+            print("BUCKET", bucket + ":", info["kind"], "AT", info["frames"][0] if info["frames"] else "UNKNOWN LOCATION",
+                  "(" + str(info["inputs"]), "INPUTS, FIRST FROM MUTANT", info["first_mutant"] + ")")
+        print("CRASH BUCKETS (WITH AN INPUT AND REPORT EACH) ARE IN", self.paths.buckets)
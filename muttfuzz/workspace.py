@@ -0,0 +1,92 @@
+import atexit
+import fcntl
+import glob
+import os
+import shutil
+import socket
+import tempfile
+import time
+
+LOCK_NAME = "muttfuzz.lock"
+
+# Output directories are named muttfuzz_*, too (muttfuzz_triage, muttfuzz_parallel), so workspaces get their own prefix
+PREFIX = "muttfuzz_workspace_"
+
+
+def lock_owner(directory):
+    # The lock file records who made the workspace, for humans and for stale checks
+    try:
+        with open(os.path.join(directory, LOCK_NAME), 'r') as f:
+            (host, pid, started) = f.read().split()
+        return (host, int(pid), float(started))
+    except (OSError, ValueError):
+        return None
+
+
+def is_stale(directory):
+    """
+    A workspace is stale if its lock file names who made it and nothing holds the lock: the
+    kernel drops an flock when its owner dies, however it dies.  A directory with no lock file,
+    or one not yet filled in, was not made (or not finished) by a Workspace, and is left alone.
+    """
+    if lock_owner(directory) is None:
+        return False
+    try:
+        fd = os.open(os.path.join(directory, LOCK_NAME), os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+    return True
+
+
+def clean_stale(root, prefix=PREFIX):
+    """Remove workspaces under root left behind by campaigns that were killed; returns how many."""
+    removed = 0
+    for directory in glob.glob(os.path.join(root, prefix + "*")):
+        if os.path.isdir(directory) and is_stale(directory):
+            owner = lock_owner(directory)
+            print("REMOVING STALE WORKSPACE", directory, "(LEFT BY PID " + str(owner[1]) + " ON " + owner[0] + ")")
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+class Workspace:
+    """
+    A private, locked directory for one campaign's staged executables, probes, logs and
+    temporary files, so that any number of campaigns can share a host (and /tmp).  Put it
+    on a tmpfs such as /dev/shm to make writing mutants cheap.  Removed at exit unless keep is set.
+    """
+
+    def __init__(self, root=None, prefix=PREFIX, keep=False):
+        if root is None:
+            root = tempfile.gettempdir()
+        os.makedirs(root, exist_ok=True)
+        clean_stale(root, prefix)
+        self.directory = tempfile.mkdtemp(prefix=prefix, dir=root)
+        self.keep = keep
+        self.lock_fd = os.open(os.path.join(self.directory, LOCK_NAME), os.O_WRONLY | os.O_CREAT, 0o644)
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.write(self.lock_fd, (socket.gethostname() + " " + str(os.getpid()) + " " + str(time.time()) + "\n").encode("utf-8"))
+        self.pid = os.getpid()
+        atexit.register(self.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def cleanup(self):
+        # Forked children (e.g., callable workers) inherit the atexit hook, but don't own the workspace
+        if (self.lock_fd is None) or (os.getpid() != self.pid):
+            return
+        if not self.keep:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        else:
+            # Without its lock file a kept workspace is unmarked, so later campaigns won't clean it up
+            os.remove(os.path.join(self.directory, LOCK_NAME))
+        os.close(self.lock_fd)
+        self.lock_fd = None
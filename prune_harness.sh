@@ -0,0 +1 @@
+for f in "$@"; do echo "Running: $f"; if grep -q bad "$f"; then exit 1; fi; done
@@ -18,6 +18,10 @@ setup(
     apply_mutant = muttfuzz.apply_mutant:main
     libfuzzer_prune = muttfuzz.libfuzzer_prune:main
     analyze_results = muttfuzz.analyze_results:main
+    muttfuzz_coordinator = muttfuzz.distributed:coordinator_main
+    muttfuzz_worker = muttfuzz.distributed:worker_main
+    meta_mutant = muttfuzz.meta_mutant:main
+    muttfuzz_export = muttfuzz.delta_store:main
     """,
     keywords='fuzzing mutation',
     classifiers=[
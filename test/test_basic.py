@@ -1,4 +1,29 @@
+import json
+import os
+import signal
+import socket
+import socketserver
 import subprocess
+import tempfile
+import threading
+import time
+
+from muttfuzz import calibrate
+from muttfuzz import callgraph
+from muttfuzz import cfg
+from muttfuzz import corpus_sync
+from muttfuzz import coverage
+from muttfuzz import delta_store
+from muttfuzz import distributed
+from muttfuzz import elf
+from muttfuzz import incremental
+from muttfuzz import limits
+from muttfuzz import meta_mutant
+from muttfuzz import mutate
+from muttfuzz import replay
+from muttfuzz import results
+from muttfuzz import status
+from muttfuzz import workspace
 
 def test_record_replay():
     r = subprocess.call(["gcc -o toy test/toy.c"], shell=True)
@@ -19,3 +44,470 @@ def test_record_replay():
     print(contents)
     assert r == 0
     assert "FINAL MUTATION SCORE OVER 14 EXECUTED MUTANTS: 57.14%" in contents
+
+def test_libfuzzer_prune():
+    r = subprocess.call(["rm -rf prune_corpus pruned_corpus; mkdir prune_corpus; for i in $(seq 1 40); do echo ok > prune_corpus/in$i; done; echo bad > prune_corpus/in7; echo bad > prune_corpus/in23"], shell=True)
+    assert r == 0
+    with open("prune_harness.sh", 'w') as f:
+        f.write('for f in "$@"; do echo "Running: $f"; if grep -q bad "$f"; then exit 1; fi; done\n')
+
+    with open("out3.txt", 'w') as f:
+        r = subprocess.call(["libfuzzer_prune \"sh prune_harness.sh\" 10 prune_corpus pruned_corpus 1 5 4"], shell=True, stdout=f, stderr=f)
+    with open("out3.txt", 'r') as f:
+        contents = f.read()
+    print(contents)
+    assert r == 0
+    assert "COMPLETED PRUNING, REMOVED 2 TESTS" in contents
+
+    r = subprocess.call(["libfuzzer_prune \"sh prune_harness.sh\" 10 prune_corpus pruned_corpus 1 1 4"], shell=True)
+    assert r == 2
+
+def test_distributed():
+    r = subprocess.call(["gcc -o toy test/toy.c; rm -rf worker1 worker2 coordinator_port; mkdir worker1 worker2; cp toy worker1/; cp toy worker2/"], shell=True)
+    assert r == 0
+
+    with open("out4.txt", 'w') as f:
+        coordinator = subprocess.Popen(["muttfuzz_coordinator toy --score --avoid_repeats --stop_on_repeat --repeat_retries 2000 --port_file coordinator_port"],
+                                       shell=True, stdout=f, stderr=f)
+        while not os.path.exists("coordinator_port"):
+            time.sleep(0.1)
+        with open("coordinator_port", 'r') as pf:
+            address = "127.0.0.1:" + pf.read().strip()
+        workers = [subprocess.Popen(["muttfuzz_worker " + address + " ./toy toy"], shell=True, cwd=d,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                   for d in ["worker1", "worker2"]]
+        for w in workers:
+            assert w.wait() == 0
+        r = coordinator.wait()
+    with open("out4.txt", 'r') as f:
+        contents = f.read()
+    print(contents)
+    assert r == 0
+    assert "FINAL MUTATION SCORE OVER 14 EXECUTED MUTANTS: 57.14%" in contents
+
+def test_checkpoint_resume():
+    r = subprocess.call(["gcc -o toy test/toy.c; rm -f toy_checkpoint* toy_resume.csv"], shell=True)
+    assert r == 0
+
+    # Preempt the campaign partway through, leaving a mutant in place of toy, and results written since the last checkpoint
+    subprocess.call(["timeout -s KILL 4 muttfuzz \"sleep 0.3; ./toy\" toy --score --avoid_repeats --stop_on_repeat --repeat_retries 2000 --checkpoint toy_checkpoint --checkpoint_interval 1.5 --save_results toy_resume.csv"],
+                    shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    assert os.path.exists("toy_checkpoint")
+
+    with open("out5.txt", 'w') as f:
+        r = subprocess.call(["muttfuzz \"sleep 0.3; ./toy\" toy --score --avoid_repeats --stop_on_repeat --repeat_retries 2000 --checkpoint toy_checkpoint --checkpoint_interval 1.5 --save_results toy_resume.csv --resume"],
+                            shell=True, stdout=f, stderr=f)
+    with open("out5.txt", 'r') as f:
+        contents = f.read()
+    print(contents)
+    assert r == 0
+    assert "RESUMED CAMPAIGN FROM toy_checkpoint" in contents
+    assert "FINAL MUTATION SCORE OVER 14 EXECUTED MUTANTS: 57.14%" in contents
+    # Rows after the checkpoint were dropped on resuming, not written twice
+    mutants = [row["mutant"] for row in results.read_results("toy_resume.csv")]
+    assert len(mutants) == len(set(mutants)) == 14
+
+def test_coverage_seeding():
+    r = subprocess.call(["gcc -g -o toy_cov test/toy.c"], shell=True)
+    assert r == 0
+    (jumps, function_map, function_reach) = mutate.get_jumps("toy_cov", only_mutate=["main"])
+    (first, second) = function_map["<main>"]
+    # The first if is taken on every run, the second never is
+    with open("toy_cov.info", 'w') as f:
+        f.write("SF:" + os.path.abspath("test/toy.c") + "\nDA:7,5\nDA:10,0\nend_of_record\n")
+    unreach_cache = {}
+    reach_cache = {}
+    coverage.seed_caches("toy_cov", jumps, function_map, function_reach, ["toy_cov.info"], unreach_cache, reach_cache)
+    assert ("<main>",) in reach_cache
+    assert (first,) in reach_cache
+    assert second in unreach_cache
+    assert "<main>" not in unreach_cache
+
+    # SanitizerCoverage PCs: a covered PC in main reaches it
+    main_address = [address for (name, address, _) in elf.function_symbols("toy_cov") if name == "main"][0]
+    with open("toy_cov.pcs", 'w') as f:
+        f.write(hex(main_address) + "\n")
+    reach_cache = {}
+    coverage.seed_caches("toy_cov", jumps, function_map, function_reach, ["toy_cov.pcs"], {}, reach_cache)
+    assert ("<main>",) in reach_cache
+
+def test_clean_stale_workspaces():
+    root = tempfile.mkdtemp()
+    # Output directories, old and unlocked, are never workspaces
+    for output in ["muttfuzz_triage", "muttfuzz_parallel"]:
+        os.mkdir(os.path.join(root, output))
+        os.utime(os.path.join(root, output), (0, 0))
+    # A workspace-named directory that no Workspace marked is left alone, too
+    os.mkdir(os.path.join(root, workspace.PREFIX + "unmarked"))
+    kept = workspace.Workspace(root, keep=True)
+    kept.cleanup()
+    live = workspace.Workspace(root)
+    killed = workspace.Workspace(root)
+    os.close(killed.lock_fd) # drops the lock without cleaning up, as if its campaign had been killed
+    killed.lock_fd = None
+    assert workspace.clean_stale(root) == 1
+    assert sorted(os.listdir(root)) == sorted(["muttfuzz_triage", "muttfuzz_parallel", workspace.PREFIX + "unmarked",
+                                               os.path.basename(live.directory), os.path.basename(kept.directory)])
+    live.cleanup()
+    assert not os.path.exists(live.directory)
+
+def build_clamp(extra):
+    # clamp has no calls or data, so a change to main leaves its bytes alone
+    with open("toy_inc.c", 'w') as f:
+        f.write("int clamp(int x) {\n  if (x > 3) {\n    return 3;\n  }\n  return x;\n}\n\n" +
+                "int main(int argc, char **argv) {\n  return clamp(argc)" + extra + ";\n}\n")
+    r = subprocess.call(["gcc -O0 -o toy_inc toy_inc.c"], shell=True)
+    assert r == 0
+    with open("toy_inc", 'rb') as f:
+        return f.read()
+
+def test_analysis_cache_rebuild():
+    if os.path.exists("toy_inc.cache"):
+        os.remove("toy_inc.cache")
+    filters = (["clamp", "main"], [], [], [], False)
+    cache = incremental.AnalysisCache("toy_inc.cache", "toy_inc", build_clamp(""), filters)
+    (jumps, function_map, function_reach) = cache.get_jumps()
+    (jump,) = function_map["<clamp>"]
+    verdict = ("<clamp>::" + str(jump - function_reach["<clamp>"]) + "::1::127\n", 1.0, 0)
+    cache.save(jumps, function_reach, {}, {("<clamp>",): True, (jump,): True}, {(jump, 1): 2}, [verdict], True)
+
+    cache = incremental.AnalysisCache("toy_inc.cache", "toy_inc", build_clamp(" + (argc > 7)"), filters)
+    assert "<clamp>" in cache.names.unchanged
+    assert "<main>" in cache.names.changed
+    (jumps, function_map, function_reach) = cache.get_jumps()
+    (jump,) = function_map["<clamp>"]
+    (unreach_cache, reach_cache, visited_mutants, analysis_data) = ({}, {}, {}, [])
+    assert cache.carry_over(jumps, function_reach, unreach_cache, reach_cache, visited_mutants, analysis_data, True) == [verdict]
+    assert reach_cache == {("<clamp>",): True, (jump,): True}
+    assert visited_mutants == {(jump, 1): 1}
+    assert analysis_data == [verdict]
+    # Results from a campaign scoring mutants differently are not carried over
+    assert not cache.carry_over(jumps, function_reach, {}, {}, {}, [], False)
+
+def test_mutant_functions():
+    assert incremental.mutant_functions("<main>::65::1::127\n") == ["<main>"]
+    # C++ names contain "::" themselves
+    name = "<ns::Parser<int>::parse(char const*)>::12::2::116::117::<main>::65::1::127\n"
+    assert incremental.mutant_functions(name) == ["<ns::Parser<int>::parse(char const*)>", "<main>"]
+    assert incremental.mutant_functions("not a mutant") is None
+
+def test_meta_mutant():
+    r = subprocess.call(["gcc -o toy test/toy.c && python -m muttfuzz.meta_mutant toy toy_meta --only_mutate main"], shell=True)
+    assert r == 0
+    # Unset, the meta-mutant runs as the original
+    env = dict(os.environ)
+    env.pop(meta_mutant.MUTANT_VARIABLE, None)
+    assert subprocess.call(["./toy_meta"], env=env) == 0
+    with open("toy_meta.mutants", 'r') as f:
+        manifest = [line.split() for line in f]
+    assert len(manifest) == 2 * meta_mutant.VARIANTS
+    # NOPing out either jump over an assert(0) aborts
+    nops = [mutant_id for (mutant_id, name) in manifest if name.startswith("<main>::") and name.endswith("::2::144::144::")]
+    assert len(nops) == 2
+    for mutant_id in nops:
+        env[meta_mutant.MUTANT_VARIABLE] = mutant_id
+        assert subprocess.call(["./toy_meta"], env=env, stderr=subprocess.DEVNULL) == -signal.SIGABRT
+
+def test_results_stream():
+    for filename in ["toy_results.csv", "toy_results.jsonl"]:
+        stream = results.Results()
+        stream.open(filename)
+        stream.add("<main>::19::1::116::", 0.5, 1)
+        stream.write("<main>::19::1::116::", 0.5, 1, "evaluated", 1, 0.1, None, 1.25, None)
+        stream.write("<main>::65::1::116::", None, None, "unreachable", 2)
+        stream.close()
+        # Reopened to append, as on --resume
+        stream = results.Results()
+        stream.open(filename, append=True)
+        stream.write("<main>::65::1::117::", 2.0, -9, "evaluated", 3, killed_by="memory")
+        stream.close()
+        rows = list(results.read_results(filename))
+        assert [row["mutant"] for row in rows] == ["<main>::19::1::116::", "<main>::65::1::116::", "<main>::65::1::117::"]
+        assert [row["status"] for row in rows] == ["evaluated", "unreachable", "evaluated"]
+        assert (rows[0]["time"], rows[0]["returncode"]) == (0.5, 1)
+        assert (rows[1]["time"], rows[1]["returncode"]) == (None, None)
+        assert (rows[2]["returncode"], rows[2]["killed_by"]) == (-9, "memory")
+    assert stream.summary() == {"mutants_evaluated": 0, "mean_evaluation_time": None}
+
+    # Files from before the status column hold only evaluated mutants
+    with open("toy_results_old.csv", 'w') as f:
+        f.write("<main>::19::1::116::,0.5,1\n<main>::65::1::116::,1.5,0\n")
+    rows = list(results.read_results("toy_results_old.csv"))
+    assert [row["status"] for row in rows] == ["evaluated", "evaluated"]
+    stream = results.Results()
+    stream.restore([(row["mutant"], row["time"], row["returncode"]) for row in rows])
+    assert stream.summary() == {"mutants_evaluated": 2, "mean_evaluation_time": 1.0}
+
+def test_delta_store():
+    r = subprocess.call(["gcc -o toy_delta test/toy.c"], shell=True)
+    assert r == 0
+    with open("toy_delta", 'rb') as f:
+        code = f.read()
+    (jumps, function_map, _) = mutate.get_jumps("toy_delta", only_mutate=["main"])
+    (first, second) = function_map["<main>"]
+    store_dir = tempfile.mkdtemp()
+    store = delta_store.DeltaStore(store_dir)
+    digest = store.add_original(code, 0o755)
+    assert os.path.exists(os.path.join(store_dir, delta_store.OBJECTS, digest))
+    # A second-order mutant: both jumps NOPed out
+    patches = [(loc, mutate.NOP * len(jumps[loc]["hexdata"])) for loc in [first, second]]
+    record = os.path.join(store_dir, "mutant_1" + delta_store.SUFFIX)
+    store.save(record, patches)
+    expected = bytearray(code)
+    for (loc, data) in patches:
+        expected[loc:loc + len(data)] = data
+    assert delta_store.materialize(record) == expected
+    delta_store.export(record, "toy_delta_mutant")
+    with open("toy_delta_mutant", 'rb') as f:
+        assert f.read() == expected
+    assert os.stat("toy_delta_mutant").st_mode & 0o777 == 0o755
+    # NOPing the jump over the first assert(0) makes it abort
+    assert subprocess.call(["./toy_delta_mutant"], stderr=subprocess.DEVNULL) == -signal.SIGABRT
+
+    # A patch is only ever applied to the original it was made against
+    with open(os.path.join(store_dir, delta_store.OBJECTS, digest), 'rb') as f:
+        assert f.read() == code
+    os.chmod(os.path.join(store_dir, delta_store.OBJECTS, digest), 0o644)
+    with open(os.path.join(store_dir, delta_store.OBJECTS, digest), 'r+b') as f:
+        f.seek(first)
+        f.write(b"\xcc")
+    try:
+        delta_store.materialize(record)
+        assert False, "patch applied to a changed original"
+    except ValueError:
+        pass
+
+def write_input(filename, contents):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as f:
+        f.write(contents)
+
+def test_corpus_sync():
+    # AFL++: output/default/queue and output/default/crashes
+    root = tempfile.mkdtemp()
+    afl = os.path.join(root, "afl")
+    write_input(os.path.join(afl, "default", "queue", "id:000000"), "seed")
+    write_input(os.path.join(afl, "default", "crashes", "README.txt"), "not an input")
+    write_input(os.path.join(afl, "default", "crashes", "id:000000,sig:06"), "boom")
+    write_input(os.path.join(afl, "default", "crashes", "id:000001,sig:11"), "seed") # already in the queue
+    sync = corpus_sync.CorpusSync(afl)
+    assert sync.layout().name == "afl"
+    assert sync.sync() == 1
+    queue = os.path.join(afl, "default", "queue")
+    assert sorted(os.listdir(queue)) == ["crash_id:000000,sig:06", "id:000000"]
+    assert os.path.samefile(os.path.join(queue, "crash_id:000000,sig:06"), os.path.join(afl, "default", "crashes", "id:000000,sig:06"))
+    assert sync.sync() == 0
+    write_input(os.path.join(afl, "default", "crashes", "id:000002,sig:06"), "bang")
+    assert sync.sync() == 1
+
+    # libFuzzer: the corpus directory, with artifacts elsewhere; also bring in the AFL queue
+    corpus = os.path.join(root, "corpus")
+    artifacts = os.path.join(root, "artifacts")
+    write_input(os.path.join(corpus, "0123abcd"), "seed")
+    write_input(os.path.join(artifacts, "crash-4567"), "crash")
+    write_input(os.path.join(artifacts, "slow-unit-89ab"), "slow") # not a crash artifact
+    sync = corpus_sync.CorpusSync(corpus, "auto", artifacts)
+    assert sync.layout().name == "libfuzzer"
+    # The AFL queue's seed is already in the corpus, and its synced crashes are taken from where they came from
+    assert sync.sync([(corpus_sync.CorpusSync(afl), "afl_", "afl_crash_")]) == 3
+    assert sorted(os.listdir(corpus)) == ["0123abcd", "afl_crash_id:000000,sig:06", "afl_crash_id:000002,sig:06",
+                                          "crash_crash-4567"]
+    assert os.path.samefile(os.path.join(corpus, "crash_crash-4567"), os.path.join(artifacts, "crash-4567"))
+
+def test_grouped_replay():
+    function_reach = {"<f>": 1000, "<g>": 2000}
+    metadatas = ["<f>\n" + str(offset) + "\n1\n116\n" for offset in [30, 10, 20]]
+    metadatas += ["<g>\n" + str(offset) + "\n1\n117\n" for offset in [5, 1]]
+    metadatas += ["<f>\n10\n1\n116\n<g>\n1\n1\n117\n", "<f>\n20\n1\n116\n"] # a second-order mutant, and a duplicate
+    plan = replay.ReplayPlan(metadatas, function_reach, "grouped")
+    assert (len(plan), plan.groups, plan.duplicates) == (6, 3, 1)
+    order = [plan.next({}) for _ in range(len(plan))]
+    assert sorted(order) == sorted(set(metadatas))
+    # Each function's mutants run back to back, by jump location
+    keys = [replay.metadata_key(metadata) for metadata in order]
+    groups = [tuple(function for (function, _, _) in key) for key in keys]
+    runs = [group for (i, group) in enumerate(groups) if (i == 0) or (groups[i - 1] != group)]
+    assert sorted(runs) == sorted(set(groups))
+    assert [key[0][1] for (key, group) in zip(keys, groups) if group == ("<f>",)] == [10, 20, 30]
+    assert [key[0][1] for (key, group) in zip(keys, groups) if group == ("<g>",)] == [1, 5]
+
+    # Starting over, mutants of functions known to be unreachable are dropped as they come up
+    rest = [plan.next({"<g>": True}) for _ in range(8)]
+    assert plan.passes >= 2
+    assert (len(plan), plan.dropped) == (4, 2)
+    assert all(not m.startswith("<g>") for m in rest)
+
+def sleep_check(seconds):
+    # A calibration run of a check that takes seconds, and never hangs
+    return lambda cap: time.sleep(seconds) or False
+
+def test_timeout_calibration():
+    calibration = calibrate.Calibration(2.0, 2.0, multiplier=5.0, enabled=True, runs=3, every=2)
+    assert calibration.due(0)
+    calibration.calibrate(0, {"reach": sleep_check(0.1)})
+    # The timeout is a multiple of the measured time, and only the calibrated check's changes
+    assert 0.5 <= calibration.timeout("reach") < 1.5
+    assert calibration.timeout("prune") == 2.0
+    assert not calibration.due(1)
+    assert calibration.due(2)
+
+    # As checks get slower, recalibrating scales the timeout up with them
+    calibration.calibrate(2, {"reach": sleep_check(0.4)})
+    assert 2.0 <= calibration.timeout("reach") < 3.0
+    assert not calibration.due(3)
+    calibration.timers["reach"].observe(0.8)
+    assert calibration.timeout("reach") == 4.0
+
+def test_hung_reachability_checks():
+    r = subprocess.call(["gcc -o toy test/toy.c"], shell=True)
+    assert r == 0
+    with open("out6.txt", 'w') as f:
+        r = subprocess.call(["muttfuzz ./toy toy --score --budget 3 --reachability_check_cmd \"sleep 5\" --reachability_check_timeout 0.3"],
+                            shell=True, stdout=f, stderr=f)
+    with open("out6.txt", 'r') as f:
+        contents = f.read()
+    print(contents)
+    assert r == 0
+    # Hung checks keep the mutant, but count toward no coverage estimate
+    assert "FUNCTION REACHABILITY CHECK HUNG" in contents
+    assert "COVERAGE ESTIMATE" not in contents
+
+def test_dominators():
+    with open("toy_cfg.c", 'w') as f:
+        f.write("int classify(int x) {\n  int s = 0;\n  if (x > 3) {\n    s = 1;\n  } else {\n    if (x < -5) {\n      s = 3;\n" +
+                "    } else {\n      s = 2;\n    }\n  }\n  for (int i = 0; i < x; i++) {\n    s += i;\n  }\n  return s;\n}\n\n" +
+                "int main(int argc, char **argv) {\n  return classify(argc);\n}\n")
+    r = subprocess.call(["gcc -O0 -o toy_cfg toy_cfg.c"], shell=True)
+    assert r == 0
+    flow = cfg.ControlFlow()
+    (_, function_map, _) = mutate.get_jumps("toy_cfg", only_mutate=["classify"], flow=flow)
+    # The if, the if in its else branch, and the loop condition, in address order at -O0
+    (if_jump, else_jump, loop_jump) = locs = sorted(function_map["<classify>"])
+    # Reaching either later jump means the if was reached; the else branch doesn't dominate the loop after it
+    assert flow.implied("<classify>", locs, else_jump, True) == [if_jump]
+    assert flow.implied("<classify>", locs, loop_jump, True) == [if_jump]
+    assert flow.implied("<classify>", locs, if_jump, True) == []
+    assert flow.implied("<classify>", locs, if_jump, False) == [else_jump, loop_jump]
+    assert flow.implied("<classify>", locs, else_jump, False) == []
+
+    # 0: if, 1/2: then/else, 3: loop condition, 4: loop body, 5: return, and 6, a landing pad nothing jumps to
+    function_cfg = cfg.FunctionCFG(list(range(0, 70, 10)), [[1, 2], [3], [3], [4, 5], [3], [], [5]], [0])
+    assert [function_cfg.idom[block] for block in range(5)] == [function_cfg.root, 0, 0, 0, 3]
+    assert sorted(function_cfg.dominated(0)) == [1, 2, 3, 4]
+    # The return can be reached from the landing pad, without the loop condition
+    assert function_cfg.dominators(4) == [4, 3, 0]
+    assert function_cfg.dominators(5) == [5]
+    assert function_cfg.dominators(6) == [6]
+
+def test_static_reachability():
+    with open("toy_calls.c", 'w') as f:
+        # never is never called, and pointed only through a function pointer in data
+        for (name, bound, value) in [("never", 2, 1), ("pointed", 5, 2), ("direct", 1, 3)]:
+            f.write("int " + name + "(int x) {\n  if (x > " + str(bound) + ") {\n    return " + str(value) + ";\n  }\n  return 0;\n}\n\n")
+        f.write("int (*table[])(int) = {pointed};\n\nint dispatch(int i, int x) {\n  return table[i](x);\n}\n\n" +
+                "int main(int argc, char **argv) {\n  if (argc > 9) {\n    return direct(argc);\n  }\n  return dispatch(0, argc);\n}\n")
+    r = subprocess.call(["gcc -O0 -o toy_calls toy_calls.c"], shell=True)
+    assert r == 0
+    for (conservative, unreachable) in [(False, ["<never>", "<pointed>"]), (True, ["<never>"])]:
+        graph = callgraph.CallGraph()
+        (_, function_map, _) = mutate.get_jumps("toy_calls", only_mutate=["never", "pointed", "direct", "main"], graph=graph)
+        assert sorted(function_map) == ["<direct>", "<main>", "<never>", "<pointed>"]
+        unreach_cache = {}
+        callgraph.exclude_unreachable(graph, callgraph.DEFAULT_ENTRIES, elf.read_data_pointers("toy_calls"), function_map,
+                                      unreach_cache, conservative)
+        # An indirect call might reach any function whose address is in data, if we're being conservative
+        assert sorted(unreach_cache) == unreachable
+
+def test_resource_limits():
+    assert limits.parse_size(None) is None
+    assert limits.parse_size("4096") == 4096
+    assert limits.parse_size("512M") == 512 << 20
+    assert limits.parse_size("2g") == 2 << 30
+    assert limits.parse_size("1.5KB") == 1536
+    # Killed directly, or reported by the shell running the command as 128 + the signal
+    assert limits.signalled(-signal.SIGXCPU, signal.SIGXCPU)
+    assert limits.signalled(128 + signal.SIGXCPU, signal.SIGXCPU)
+    assert not limits.signalled(signal.SIGXCPU, signal.SIGXCPU)
+    assert not limits.signalled(None, signal.SIGXCPU)
+
+    # CPU time is always limited by an rlimit; the busy loop is run by a shell inside the fuzzing command's shell
+    r = subprocess.call(["gcc -o toy test/toy.c; rm -f toy_limits.csv"], shell=True)
+    assert r == 0
+    with open("out7.txt", 'w') as f:
+        r = subprocess.call(["muttfuzz \"sh -c 'while true; do :; done'; exit \\$?\" toy --score --cpu_limit 1 --time_per_mutant 20 --budget 2 --save_results toy_limits.csv"],
+                            shell=True, stdout=f, stderr=f)
+    with open("out7.txt", 'r') as f:
+        contents = f.read()
+    print(contents)
+    assert r == 0
+    assert "LIMITING EVERY RUN TO CPU 1s (RLIMITS)" in contents
+    rows = list(results.read_results("toy_limits.csv"))
+    assert rows
+    for row in rows:
+        assert row["returncode"] == 128 + signal.SIGXCPU
+        assert row["killed_by"] == limits.CPU
+
+def http_get(address, path):
+    # A bare HTTP/1.0 request, over TCP to a (host, port) or to a Unix socket's path; returns the status code and body
+    with socket.socket(socket.AF_UNIX if isinstance(address, str) else socket.AF_INET) as s:
+        s.connect(address)
+        s.sendall(("GET " + path + " HTTP/1.0\r\n\r\n").encode("utf-8"))
+        response = b""
+        chunk = s.recv(4096)
+        while chunk:
+            response += chunk
+            chunk = s.recv(4096)
+    (head, body) = response.split(b"\r\n\r\n", 1)
+    return (int(head.split()[1]), body)
+
+def test_status_endpoint():
+    tracker = status.Tracker()
+    tracker.doing("reachability check")
+    tracker.result(1, "<main>::65::1::127::", "evaluated", 0.5, 1, None, {"reach": 0.1})
+    # Like a campaign's status: the tracker's summary, and with tables, per-function ones
+    snapshot = lambda tables: dict(tracker.summary(), **({"functions": {"<main>": {"coverage": 100.0}}} if tables else {}))
+    sock = os.path.join(tempfile.mkdtemp(), "status.sock")
+    for endpoint in ["127.0.0.1:0", "unix:" + sock]:
+        tracker.serve(endpoint, snapshot)
+        server = tracker.server
+        address = server.address if server.kind == "unix" else server.server.server_address[:2]
+        (code, body) = http_get(address, "/status")
+        assert code == 200
+        full = json.loads(body)
+        assert sorted(full) == ["activity", "activity_seconds", "functions", "mutant", "recent"]
+        assert full["activity"] == "reachability check"
+        assert [row["status"] for row in full["recent"]] == ["evaluated"]
+        (code, body) = http_get(address, "/summary")
+        assert code == 200
+        assert sorted(json.loads(body)) == ["activity", "activity_seconds", "mutant", "recent"]
+        assert http_get(address, "/other")[0] == 404
+        tracker.stop()
+    assert not os.path.exists(sock)
+
+def test_lost_lease():
+    r = subprocess.call(["gcc -o toy test/toy.c; rm -rf worker3; mkdir worker3; cp toy worker3/"], shell=True)
+    assert r == 0
+    (jumps, function_map, function_reach) = mutate.get_jumps("toy")
+    coordinator = distributed.Coordinator("toy", 2, jumps, function_map, function_reach, lease_time=1.0, score=True)
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), distributed.CoordinatorHandler)
+    server.daemon_threads = True
+    server.coordinator = coordinator
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    start = time.time()
+    # Only the first mutant's run takes long enough to lose its lease
+    worker = subprocess.Popen(["muttfuzz_worker 127.0.0.1:" + str(server.server_address[1]) +
+                               " \"test -e started || (touch started; sleep 30)\" toy --time_per_mutant 60"],
+                              shell=True, cwd="worker3", stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    while not coordinator.leases.active:
+        time.sleep(0.1)
+    # As if the lease had run out and the mutant gone to another worker
+    with coordinator.lock:
+        coordinator.leases.active.clear()
+    (output, _) = worker.communicate()
+    server.shutdown()
+    server.server_close()
+    print(output.decode("utf-8"))
+    assert worker.returncode == 0
+    assert time.time() - start < 20
+    assert b"LEASE ON MUTANT #1 WAS LOST, DROPPING ITS RESULT" in output
+    assert 1 not in coordinator.leases.completed
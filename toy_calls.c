@@ -0,0 +1,33 @@
+int never(int x) {
+  if (x > 2) {
+    return 1;
+  }
+  return 0;
+}
+
+int pointed(int x) {
+  if (x > 5) {
+    return 2;
+  }
+  return 0;
+}
+
+int direct(int x) {
+  if (x > 1) {
+    return 3;
+  }
+  return 0;
+}
+
+int (*table[])(int) = {pointed};
+
+int dispatch(int i, int x) {
+  return table[i](x);
+}
+
+int main(int argc, char **argv) {
+  if (argc > 9) {
+    return direct(argc);
+  }
+  return dispatch(0, argc);
+}
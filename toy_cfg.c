@@ -0,0 +1,20 @@
+int classify(int x) {
+  int s = 0;
+  if (x > 3) {
+    s = 1;
+  } else {
+    if (x < -5) {
+      s = 3;
+    } else {
+      s = 2;
+    }
+  }
+  for (int i = 0; i < x; i++) {
+    s += i;
+  }
+  return s;
+}
+
+int main(int argc, char **argv) {
+  return classify(argc);
+}
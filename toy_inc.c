@@ -0,0 +1,10 @@
+int clamp(int x) {
+  if (x > 3) {
+    return 3;
+  }
+  return x;
+}
+
+int main(int argc, char **argv) {
+  return clamp(argc) + (argc > 7);
+}